@@ -2,4 +2,6 @@
 set -e
 
 python3 src/main.py
-cd docs && python3 -m http.server 8888 --bind ::
\ No newline at end of file
+python3 src/main.py --watch &
+trap 'kill $!' EXIT
+cd docs && python3 -m http.server 8888 --bind ::
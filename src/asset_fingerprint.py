@@ -0,0 +1,118 @@
+import json
+import os
+
+from build_manifest import hash_file, hash_text
+from output_tree import write_if_changed
+
+ASSET_MANIFEST_FILENAME = "asset-manifest.json"
+HEADERS_FILENAME = "_headers"
+FINGERPRINT_STATE_FILENAME = "fingerprints.json"
+FINGERPRINT_LENGTH = 12
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def fingerprinted_name(rel_path: str, digest: str) -> str:
+    """
+    Insert a content hash before the file extension.
+
+    Example:
+        fingerprinted_name("images/logo.png", "3f2a...") -> "images/logo.3f2a1b9c0d4e.png"
+    """
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+class AssetManifest:
+    """
+    Mapping of static files to their content-hashed names.
+
+    files maps paths relative to the static directory to the fingerprinted
+    relative path; resolve() maps root-relative URLs ("/index.css") the same
+    way and leaves every other URL alone. digest identifies the whole mapping,
+    so caches of rendered HTML can tell when asset URLs changed.
+    """
+
+    def __init__(self, files: dict[str, str]):
+        self.files = files
+        self.urls = {
+            "/" + rel_path.replace(os.sep, "/"): "/" + name.replace(os.sep, "/")
+            for rel_path, name in files.items()
+        }
+        self.digest = hash_text(json.dumps(self.urls, sort_keys=True))
+
+    def resolve(self, url: str) -> str:
+        return self.urls.get(url, url)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __repr__(self):
+        return f"AssetManifest({len(self.files)} files, {self.digest[:FINGERPRINT_LENGTH]})"
+
+
+def _load_state(state_path: str) -> dict:
+    if state_path is None:
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def fingerprint_assets(static_dir: str, state_path: str = None) -> AssetManifest:
+    """
+    Hash every file under static_dir. With state_path, digests are remembered
+    by (mtime, size) so unchanged files are not read again.
+    """
+    previous = _load_state(state_path)
+    state = {}
+    files = {}
+    for dirpath, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(path, static_dir)
+            st = os.stat(path)
+            stamp = [st.st_mtime_ns, st.st_size]
+            entry = previous.get(rel_path)
+            if entry is not None and entry[:2] == stamp:
+                digest = entry[2]
+            else:
+                digest = hash_file(path)
+            state[rel_path] = stamp + [digest]
+            files[rel_path] = fingerprinted_name(rel_path, digest)
+
+    if state_path is not None and state != previous:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, state_path)
+    return AssetManifest(dict(sorted(files.items())))
+
+
+def write_asset_files(dest_dir: str, assets: AssetManifest) -> None:
+    """
+    Write the asset manifest (original URL -> fingerprinted URL) and a _headers
+    file, in the format understood by Netlify and Cloudflare Pages, marking
+    every fingerprinted file as immutable.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    write_if_changed(
+        os.path.join(dest_dir, ASSET_MANIFEST_FILENAME),
+        json.dumps(assets.urls, indent=2, sort_keys=True) + "\n",
+    )
+    rules = [f"{url}\n  Cache-Control: {IMMUTABLE_CACHE_CONTROL}\n" for url in assets.urls.values()]
+    write_if_changed(os.path.join(dest_dir, HEADERS_FILENAME), "".join(rules))
+
+
+def remove_asset_files(dest_dir: str, static_dir: str) -> None:
+    """
+    Delete the files written by write_asset_files (after fingerprinting is
+    turned off), unless static_dir provides a file of the same name.
+    """
+    for filename in (ASSET_MANIFEST_FILENAME, HEADERS_FILENAME):
+        path = os.path.join(dest_dir, filename)
+        if os.path.isfile(path) and not os.path.exists(os.path.join(static_dir, filename)):
+            os.remove(path)
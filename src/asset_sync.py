@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from build_manifest import hash_file
+from output_tree import remove_empty_dirs
+
+ASSET_STATE_FILENAME = "assets.json"
+
+# Files at least this large are copied with os.copy_file_range where available,
+# letting the kernel (or a reflink-capable filesystem) move the data.
+LARGE_FILE_BYTES = 1024 * 1024
+
+# Copies run in a thread pool once a sync has at least this many files to copy.
+THREAD_POOL_MIN_FILES = 16
+DEFAULT_COPY_THREADS = 8
+
+
+class SyncStats:
+    def __init__(self):
+        self.copied = 0
+        self.linked = 0
+        self.skipped = 0
+        self.removed = 0
+
+    def summary(self) -> str:
+        return (
+            f"assets: {self.copied} copied, {self.linked} linked, "
+            f"{self.skipped} unchanged, {self.removed} stale removed"
+        )
+
+    def __repr__(self):
+        return (
+            f"SyncStats(copied={self.copied}, linked={self.linked}, "
+            f"skipped={self.skipped}, removed={self.removed})"
+        )
+
+
+def _list_files(root: str) -> dict[str, os.stat_result]:
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if not os.path.isfile(path):
+                raise Exception(f"Unsupported file type: {path}")
+            files[os.path.relpath(path, root)] = os.stat(path)
+    return files
+
+
+def _is_up_to_date(
+    src_path: str, src_stat: os.stat_result, dest_path: str, check_hash: bool
+) -> bool:
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if (dest_stat.st_dev, dest_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        return True
+    if dest_stat.st_size != src_stat.st_size:
+        return False
+    if dest_stat.st_mtime_ns == src_stat.st_mtime_ns:
+        return True
+    if check_hash and hash_file(src_path) == hash_file(dest_path):
+        shutil.copystat(src_path, dest_path)
+        return True
+    return False
+
+
+def _copy_large_file(src_path: str, dest_path: str, size: int) -> None:
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        offset = 0
+        while offset < size:
+            sent = os.copy_file_range(src.fileno(), dest.fileno(), size - offset, offset, offset)
+            if sent == 0:
+                break
+            offset += sent
+    if offset != size:
+        shutil.copyfile(src_path, dest_path)
+
+
+def _copy_file(src_path: str, dest_path: str, size: int, link: bool) -> bool:
+    """
+    Copy (or hardlink) one file, replacing any existing destination.
+
+    Returns:
+        True if the file was hardlinked, False if it was copied.
+    """
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+    if link:
+        try:
+            os.link(src_path, dest_path)
+            return True
+        except OSError:
+            pass
+
+    if size >= LARGE_FILE_BYTES and hasattr(os, "copy_file_range"):
+        try:
+            _copy_large_file(src_path, dest_path, size)
+        except OSError:
+            shutil.copyfile(src_path, dest_path)
+    else:
+        # shutil.copyfile already uses sendfile on Linux.
+        shutil.copyfile(src_path, dest_path)
+    shutil.copystat(src_path, dest_path)
+    return False
+
+
+def _load_state(state_path: str) -> list[str]:
+    if state_path is None:
+        return []
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("assets", [])
+    except (OSError, ValueError):
+        return []
+
+
+def _save_state(state_path: str, assets: list[str]) -> None:
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"assets": assets}, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def sync_directory(
+    src_dir: str,
+    dest_dir: str,
+    state_path: str = None,
+    check_hash: bool = False,
+    link: bool = False,
+    threads: int = DEFAULT_COPY_THREADS,
+    extra_names: dict[str, str] = None,
+) -> SyncStats:
+    """
+    Make dest_dir contain an up-to-date copy of every file in src_dir without
+    touching anything else in it (such as generated pages).
+
+    A file is copied only when the destination is missing or differs in size or
+    mtime; with check_hash, a size match with a different mtime is settled by
+    comparing content hashes instead. Copies keep the source mtime, so the next
+    sync sees them as unchanged. With link, files are hardlinked when the two
+    directories share a filesystem.
+
+    extra_names maps source paths (relative to src_dir) to a second
+    destination name each file is also written under, such as a fingerprinted
+    copy.
+
+    state_path records which files the last sync produced, so files deleted
+    from src_dir (and extra names that changed) are removed from dest_dir as
+    well.
+    """
+    stats = SyncStats()
+    src_files = _list_files(src_dir)
+    os.makedirs(dest_dir, exist_ok=True)
+
+    outputs = {rel_path: rel_path for rel_path in src_files}
+    for rel_path, name in (extra_names or {}).items():
+        if rel_path in src_files:
+            outputs[name] = rel_path
+
+    to_copy = []
+    for dest_rel_path, rel_path in sorted(outputs.items()):
+        src_path = os.path.join(src_dir, rel_path)
+        dest_path = os.path.join(dest_dir, dest_rel_path)
+        if _is_up_to_date(src_path, src_files[rel_path], dest_path, check_hash):
+            stats.skipped += 1
+            continue
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        to_copy.append((src_path, dest_path, src_files[rel_path].st_size))
+
+    def copy(job):
+        return _copy_file(*job, link)
+
+    if threads > 1 and len(to_copy) >= THREAD_POOL_MIN_FILES:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            linked = list(pool.map(copy, to_copy))
+    else:
+        linked = [copy(job) for job in to_copy]
+    stats.linked = sum(linked)
+    stats.copied = len(linked) - stats.linked
+
+    for rel_path in _load_state(state_path):
+        if rel_path in outputs:
+            continue
+        dest_path = os.path.join(dest_dir, rel_path)
+        if os.path.isfile(dest_path):
+            os.remove(dest_path)
+            stats.removed += 1
+            remove_empty_dirs(dest_dir, dest_path)
+
+    if state_path is not None:
+        _save_state(state_path, sorted(outputs))
+    return stats
@@ -0,0 +1,183 @@
+"""
+Deterministic synthetic markdown corpus for benchmarks.
+
+Usage:
+    python3 src/bench_corpus.py OUT_DIR [--pages N] [--page-size BYTES] [--seed S]
+"""
+import argparse
+import os
+import random
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog elves dwarves hobbits wizards ring "
+    "mountain river forest shadow light journey council fellowship tower king "
+    "sword song ancient road home return friend story"
+).split()
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <meta charset="utf-8" />
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+class CorpusSpec:
+    """
+    Shape of a synthetic corpus.
+
+    inline_density is the fraction of words wrapped in inline markup (bold,
+    italic, code, link or image). The block ratios are the fractions of blocks
+    that are lists, quotes and code blocks; the remainder are paragraphs (with
+    an occasional sub-heading).
+    """
+
+    def __init__(
+        self,
+        pages: int = 50,
+        page_size: int = 8 * 1024,
+        inline_density: float = 0.1,
+        list_ratio: float = 0.15,
+        quote_ratio: float = 0.05,
+        code_ratio: float = 0.05,
+        seed: int = 1,
+    ):
+        self.pages = pages
+        self.page_size = page_size
+        self.inline_density = inline_density
+        self.list_ratio = list_ratio
+        self.quote_ratio = quote_ratio
+        self.code_ratio = code_ratio
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value}" for key, value in self.to_dict().items())
+        return f"CorpusSpec({fields})"
+
+
+def _inline(rng: random.Random, word: str, density: float) -> str:
+    if rng.random() >= density:
+        return word
+    kind = rng.randrange(5)
+    if kind == 0:
+        return f"**{word}**"
+    if kind == 1:
+        return f"_{word}_"
+    if kind == 2:
+        return f"`{word}`"
+    if kind == 3:
+        return f"[{word}](/blog/{word}/)"
+    return f"![{word}](/images/{word}.png)"
+
+
+def _sentence(rng: random.Random, density: float, words: int) -> str:
+    return " ".join(_inline(rng, rng.choice(WORDS), density) for _ in range(words))
+
+
+def _block(rng: random.Random, spec: CorpusSpec) -> str:
+    roll = rng.random()
+    density = spec.inline_density
+    if roll < spec.list_ratio:
+        items = [_sentence(rng, density, rng.randint(3, 10)) for _ in range(rng.randint(2, 6))]
+        if rng.random() < 0.5:
+            return "\n".join(f"- {item}" for item in items)
+        return "\n".join(f"{i}. {item}" for i, item in enumerate(items, start=1))
+    roll -= spec.list_ratio
+    if roll < spec.quote_ratio:
+        lines = [_sentence(rng, density, rng.randint(5, 12)) for _ in range(rng.randint(1, 4))]
+        return "\n".join(f"> {line}" for line in lines)
+    roll -= spec.quote_ratio
+    if roll < spec.code_ratio:
+        lines = [
+            "    " * rng.randint(0, 2) + " ".join(rng.choices(WORDS, k=rng.randint(2, 6)))
+            for _ in range(rng.randint(2, 10))
+        ]
+        return "```\n" + "\n".join(lines) + "\n```"
+    if rng.random() < 0.1:
+        return "#" * rng.randint(2, 4) + " " + _sentence(rng, 0, rng.randint(2, 6))
+    lines = [_sentence(rng, density, rng.randint(6, 16)) for _ in range(rng.randint(1, 5))]
+    return "\n".join(lines)
+
+
+def generate_markdown(rng: random.Random, spec: CorpusSpec, title: str) -> str:
+    """
+    Build one markdown document of roughly spec.page_size bytes.
+    """
+    blocks = [f"# {title}"]
+    size = len(blocks[0])
+    while size < spec.page_size:
+        block = _block(rng, spec)
+        blocks.append(block)
+        size += len(block) + 2
+    return "\n\n".join(blocks) + "\n"
+
+
+def write_corpus(root: str, spec: CorpusSpec) -> list[str]:
+    """
+    Write a site skeleton under root (content/, static/, template.html) with
+    spec.pages pages spread over a few directory levels. The same spec always
+    produces byte-identical files.
+
+    Returns:
+        The paths of the generated markdown files.
+    """
+    rng = random.Random(spec.seed)
+    content_dir = os.path.join(root, "content")
+    static_dir = os.path.join(root, "static")
+    os.makedirs(os.path.join(static_dir, "images"), exist_ok=True)
+    with open(os.path.join(static_dir, "index.css"), "w", encoding="utf-8") as f:
+        f.write("body { font-family: sans-serif; }\n")
+    with open(os.path.join(root, "template.html"), "w", encoding="utf-8") as f:
+        f.write(TEMPLATE)
+
+    paths = []
+    for i in range(spec.pages):
+        if i == 0:
+            rel_dir = ""
+        else:
+            rel_dir = os.path.join(f"section{i % 10}", f"page{i}")
+        page_dir = os.path.join(content_dir, rel_dir)
+        os.makedirs(page_dir, exist_ok=True)
+        path = os.path.join(page_dir, "index.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_markdown(rng, spec, f"Page {i}"))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic markdown corpus.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=8 * 1024)
+    parser.add_argument("--inline-density", type=float, default=0.1)
+    parser.add_argument("--list-ratio", type=float, default=0.15)
+    parser.add_argument("--quote-ratio", type=float, default=0.05)
+    parser.add_argument("--code-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    spec = CorpusSpec(
+        pages=args.pages,
+        page_size=args.page_size,
+        inline_density=args.inline_density,
+        list_ratio=args.list_ratio,
+        quote_ratio=args.quote_ratio,
+        code_ratio=args.code_ratio,
+        seed=args.seed,
+    )
+    paths = write_corpus(args.out_dir, spec)
+    print(f"wrote {len(paths)} pages to {args.out_dir} ({spec})")
+
+
+if __name__ == "__main__":
+    main()
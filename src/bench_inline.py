@@ -0,0 +1,43 @@
+"""
+Compare the single-scan text_to_textnodes with the multipass reference on
+paragraphs dense in links, emphasis and plain text.
+
+Usage:
+    python3 src/bench_inline.py [repeat]
+"""
+import sys
+import timeit
+
+from inline_markdown import _text_to_textnodes_multipass, text_to_textnodes
+
+PARAGRAPHS = {
+    "link_dense": " ".join(f"see [link {i}](https://example.com/{i}) and" for i in range(200)),
+    "link_dense_2k": " ".join(f"see [link {i}](https://example.com/{i}) and" for i in range(2000)),
+    "image_dense": " ".join(f"![img {i}](/images/{i}.png) text" for i in range(200)),
+    "emphasis_dense": " ".join(f"**bold {i}** _it {i}_ `code {i}`" for i in range(200)),
+    "plain": "Just some ordinary prose without any inline markup at all. " * 100,
+}
+
+
+def bench(repeat: int = 5, number: int = 20) -> dict[str, tuple[float, float]]:
+    results = {}
+    for name, text in PARAGRAPHS.items():
+        if text_to_textnodes(text) != _text_to_textnodes_multipass(text):
+            raise AssertionError(f"Tokenizer output differs on {name}")
+        old = min(
+            timeit.repeat(lambda: _text_to_textnodes_multipass(text), repeat=repeat, number=number)
+        )
+        new = min(timeit.repeat(lambda: text_to_textnodes(text), repeat=repeat, number=number))
+        results[name] = (old / number, new / number)
+    return results
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'paragraph':<16}{'multipass':>12}{'single-scan':>14}{'speedup':>10}")
+    for name, (old, new) in bench(repeat).items():
+        print(f"{name:<16}{old * 1e6:>10.1f}us{new * 1e6:>12.1f}us{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Measure how many bytes each node object costs, and the memory and time it
+takes to build and render the HTMLNode tree of a large synthetic document,
+compared with its flat EventBuffer.
+
+Usage:
+    python3 src/bench_nodes.py [count]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from bench_corpus import CorpusSpec, generate_markdown
+from leafnode import LeafNode
+from markdown_to_html import markdown_to_events, markdown_to_html_node
+from parentnode import ParentNode
+from textnode import TextNode, TextType
+
+SHARED_TEXT = "text"
+SHARED_CHILDREN = []
+SHARED_PROPS = {"href": "/"}
+
+def count_nodes(node) -> int:
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if node.children:
+            stack.extend(node.children)
+    return count
+
+
+NODES = {
+    "TextNode": lambda: TextNode(SHARED_TEXT, TextType.TEXT),
+    "LeafNode": lambda: LeafNode("b", SHARED_TEXT),
+    "LeafNode+props": lambda: LeafNode("a", SHARED_TEXT, SHARED_PROPS),
+    "ParentNode": lambda: ParentNode("p", SHARED_CHILDREN),
+}
+
+
+def bytes_per_node(factory, count: int) -> float:
+    """
+    Average traced allocation per object; the node's fields all point at shared
+    objects, so only the node itself is counted.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = [factory() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    list_bytes = sys.getsizeof(nodes)
+    return (after - before - list_bytes) / count
+
+
+def _document(page_size: int) -> str:
+    spec = CorpusSpec(page_size=page_size, inline_density=0.3, seed=1)
+    return generate_markdown(random.Random(spec.seed), spec, "Nodes")
+
+
+def _build(convert, markdown: str):
+    # (document, traced bytes, build seconds, render seconds)
+    start = time.perf_counter()
+    document = convert(markdown)
+    built = time.perf_counter()
+    document.to_html()
+    rendered = time.perf_counter()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        document = convert(markdown)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return document, after - before, built - start, rendered - built
+
+
+def document_tree(page_size: int) -> tuple[int, float, float, float]:
+    """
+    Build and render the tree of a synthetic document of page_size bytes.
+
+    Returns:
+        (node count, traced bytes per node, build seconds, render seconds)
+    """
+    root, size, build, render = _build(markdown_to_html_node, _document(page_size))
+    nodes = count_nodes(root)
+    return nodes, size / nodes, build, render
+
+
+def document_events(page_size: int) -> tuple[int, float, float, float]:
+    """
+    Build and render the EventBuffer of the same document as document_tree.
+
+    Returns:
+        (event count, traced bytes per event, build seconds, render seconds)
+    """
+    events, size, build, render = _build(markdown_to_events, _document(page_size))
+    return len(events), size / len(events), build, render
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{'node':<16}{'bytes/node':>12}")
+    for name, factory in NODES.items():
+        print(f"{name:<16}{bytes_per_node(factory, count):>12.1f}")
+
+    nodes, per_node, build, render = document_tree(4 * 1024 * 1024)
+    print(
+        f"4 MiB document: {nodes} html nodes, {per_node:.1f} bytes/node "
+        f"(including text and props), built in {build * 1000:.0f} ms, "
+        f"rendered in {render * 1000:.0f} ms"
+    )
+    events, per_event, build, render = document_events(4 * 1024 * 1024)
+    print(
+        f"4 MiB document: {events} events, {per_event:.1f} bytes/event "
+        f"(including text and props), built in {build * 1000:.0f} ms, "
+        f"rendered in {render * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark the build pipeline stage by stage on a synthetic corpus and compare
+the results against a saved baseline.
+
+Usage:
+    python3 src/bench_suite.py [--pages N] [--page-size BYTES] [--repeat R]
+                               [--output results.json] [--baseline baseline.json]
+
+Save a baseline once with --output, then pass it as --baseline after a change;
+benchmarks slower than the baseline by more than --tolerance are reported as
+regressions and the script exits with status 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from bench_corpus import CorpusSpec, write_corpus
+from block_markdown import BlockType, block_to_block_type, lex_markdown, markdown_to_blocks
+from generate_page import generate_page
+from inline_markdown import text_to_textnodes
+from markdown_to_html import markdown_to_html_node
+
+DEFAULT_TOLERANCE = 0.10
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def _time(func, repeat: int, number: int) -> dict:
+    timings = [t / number for t in timeit.repeat(func, repeat=repeat, number=number)]
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def _run_build(root: str, *extra: str) -> None:
+    subprocess.run(
+        [sys.executable, MAIN_PATH, "--project-root", root, *extra],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def run_benchmarks(spec: CorpusSpec, repeat: int = 5) -> dict:
+    """
+    Generate the corpus described by spec in a temporary directory and time
+    each stage over all of it.
+
+    Returns:
+        {"meta": {...}, "results": {name: {"min", "median", "repeat", "number"}}}
+        with times in seconds per run over the whole corpus.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        paths = write_corpus(root, spec)
+        documents = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                documents.append(f.read())
+        blocks = [block for document in documents for block in markdown_to_blocks(document)]
+        paragraphs = [
+            block.text
+            for document in documents
+            for block in lex_markdown(document)
+            if block.type == BlockType.PARAGRAPH
+        ]
+        trees = [markdown_to_html_node(document) for document in documents]
+
+        results["markdown_to_blocks"] = _time(
+            lambda: [markdown_to_blocks(document) for document in documents], repeat, 3
+        )
+        results["block_to_block_type"] = _time(
+            lambda: [block_to_block_type(block) for block in blocks], repeat, 3
+        )
+        # Splitting, classifying and stripping the markers of every block in
+        # one pass; compare with markdown_to_blocks + block_to_block_type.
+        results["lex_markdown"] = _time(
+            lambda: [list(lex_markdown(document)) for document in documents],
+            repeat,
+            3,
+        )
+        results["text_to_textnodes"] = _time(
+            lambda: [text_to_textnodes(paragraph) for paragraph in paragraphs], repeat, 1
+        )
+        results["parentnode_to_html"] = _time(
+            lambda: [tree.to_html() for tree in trees], repeat, 1
+        )
+
+        template_path = os.path.join(root, "template.html")
+        dest_path = os.path.join(root, "page.html")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results["generate_page"] = _time(
+                lambda: generate_page(paths[0], template_path, dest_path, "/"), repeat, 3
+            )
+
+        # --force also empties the block cache, so every run is a cold build.
+        results["full_build"] = _time(lambda: _run_build(root, "--force"), repeat, 1)
+        results["noop_build"] = _time(lambda: _run_build(root), repeat, 1)
+
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": spec.to_dict(),
+        "corpus_bytes": sum(len(document.encode("utf-8")) for document in documents),
+        "blocks": len(blocks),
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE):
+    """
+    Compare the min times of two benchmark runs.
+
+    Returns:
+        A list of (name, baseline seconds, current seconds, ratio) rows for the
+        benchmarks present in both, and the names of those slower than the
+        baseline by more than tolerance.
+    """
+    rows = []
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["min"] / base["min"]
+        rows.append((name, base["min"], result["min"], ratio))
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the site generator.")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=8 * 1024)
+    parser.add_argument("--inline-density", type=float, default=0.1)
+    parser.add_argument("--list-ratio", type=float, default=0.15)
+    parser.add_argument("--quote-ratio", type=float, default=0.05)
+    parser.add_argument("--code-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    spec = CorpusSpec(
+        pages=args.pages,
+        page_size=args.page_size,
+        inline_density=args.inline_density,
+        list_ratio=args.list_ratio,
+        quote_ratio=args.quote_ratio,
+        code_ratio=args.code_ratio,
+        seed=args.seed,
+    )
+    current = run_benchmarks(spec, args.repeat)
+    meta = current["meta"]
+    print(f"{spec}: {meta['corpus_bytes']} bytes, {meta['blocks']} blocks")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        print(f"{'benchmark':<22}{'min':>12}{'median':>12}")
+        for name, result in current["results"].items():
+            print(f"{name:<22}{result['min'] * 1e3:>10.2f}ms{result['median'] * 1e3:>10.2f}ms")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("corpus") != meta["corpus"]:
+        print("warning: baseline was recorded on a different corpus", file=sys.stderr)
+    rows, regressions = compare(current, baseline, args.tolerance)
+    print(f"{'benchmark':<22}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, base, now, ratio in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        change = (ratio - 1) * 100
+        print(f"{name:<22}{base * 1e3:>10.2f}ms{now * 1e3:>10.2f}ms{change:>+8.1f}%{flag}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
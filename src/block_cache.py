@@ -0,0 +1,232 @@
+import os
+import sqlite3
+
+from block_markdown import block_to_html
+from build_manifest import GENERATOR_VERSION, hash_text
+from page_graph import PageRefs
+
+BLOCK_CACHE_FILENAME = "blocks.sqlite3"
+DEFAULT_BLOCK_CACHE_BYTES = 64 * 1024 * 1024
+
+# Blocks are looked up and stored this many at a time.
+BATCH_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    key TEXT PRIMARY KEY,
+    html TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    build INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO state VALUES (0, 0, 0, 0);
+"""
+
+
+def block_key(
+    block: str, basepath: str = "/", assets_digest: str = None, images_key: str = None
+) -> str:
+    return hash_text(
+        f"{GENERATOR_VERSION}\0{basepath}\0{assets_digest}\0{images_key}\0{block}"
+    )
+
+
+def _images_key(block, images) -> str:
+    # The sizes of the images a block shows: a block's HTML only changes with
+    # those, not with the rest of the site's images.
+    if images is None:
+        return None
+    text = block if isinstance(block, str) else block.text
+    if "![" not in text:
+        return images.sizes_key([])
+    refs = PageRefs()
+    refs.add_block(block)
+    return images.sizes_key(refs.images)
+
+
+class BlockCacheStats:
+    def __init__(self, hits: int = 0, misses: int = 0, evicted: int = 0, size: int = 0):
+        self.hits = hits
+        self.misses = misses
+        self.evicted = evicted
+        self.size = size
+
+    def summary(self) -> str:
+        return (
+            f"block cache: {self.hits} hits, {self.misses} misses, "
+            f"{self.evicted} evicted, {self.size // 1024} KiB"
+        )
+
+    def __repr__(self):
+        return (
+            f"BlockCacheStats(hits={self.hits}, misses={self.misses}, "
+            f"evicted={self.evicted}, size={self.size})"
+        )
+
+
+class BlockCache:
+    """
+    Disk-backed cache of rendered blocks: sha256(generator version + basepath
+    + asset manifest digest + image index digest + block markdown) -> block
+    HTML, in an SQLite database under the build cache. The basepath and asset
+    manifest are part of the key because they are baked into link and image
+    URLs, the image index because image sizes are.
+
+    Editing one paragraph of a long page then only renders that paragraph
+    again; every other block of the page is a lookup.
+
+    Each build is stamped with a number, and blocks record the last build that
+    used them; finish() evicts least recently used blocks until the cache fits
+    in max_bytes. The cache may be shared by worker processes: the database
+    connection is opened lazily in each process, and hit/miss counts are kept
+    in the database so the parent can report them.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_BLOCK_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.build = 0
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        return state
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def begin(self) -> None:
+        """
+        Start a build: take the next build stamp and reset the hit/miss counters.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE state SET build = build + 1, hits = 0, misses = 0")
+        self.build = conn.execute("SELECT build FROM state").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        """
+        Drop every cached block, so the next build renders all of them.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM blocks")
+
+    def render_blocks(
+        self, blocks: list, basepath: str = "/", assets=None, images=None
+    ) -> list[str]:
+        """
+        Return the HTML of each block (Blocks from lex_blocks or block strings),
+        rendering (and storing) only the blocks that are not cached yet. Use
+        iter_html for more than BATCH_SIZE blocks.
+        """
+        if not blocks:
+            return []
+        assets_digest = None if assets is None else assets.digest
+        keys = [
+            block_key(
+                block if isinstance(block, str) else block.text,
+                basepath,
+                assets_digest,
+                _images_key(block, images),
+            )
+            for block in blocks
+        ]
+        conn = self._connect()
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        placeholders = ",".join("?" * len(unique))
+        for key, html in conn.execute(
+            f"SELECT key, html FROM blocks WHERE key IN ({placeholders})", unique
+        ):
+            found[key] = html
+
+        rendered = {}
+        html_blocks = []
+        for key, block in zip(keys, blocks):
+            html = found.get(key)
+            if html is None:
+                html = rendered.get(key)
+                if html is None:
+                    html = block_to_html(block, basepath, assets, images)
+                    rendered[key] = html
+            html_blocks.append(html)
+
+        hits = len(blocks) - len(rendered)
+        self.hits += hits
+        self.misses += len(rendered)
+        with conn:
+            if found:
+                conn.execute(
+                    f"UPDATE blocks SET used = ? WHERE key IN ({','.join('?' * len(found))})",
+                    [self.build, *found],
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?)",
+                [
+                    (key, html, len(html.encode("utf-8")), self.build)
+                    for key, html in rendered.items()
+                ],
+            )
+            conn.execute(
+                "UPDATE state SET hits = hits + ?, misses = misses + ?", (hits, len(rendered))
+            )
+        return html_blocks
+
+    def iter_html(self, blocks, basepath: str = "/", assets=None, images=None):
+        """
+        Yield the HTML of each block of an iterable (e.g. lex_blocks),
+        looking blocks up BATCH_SIZE at a time.
+        """
+        batch = []
+        for block in blocks:
+            batch.append(block)
+            if len(batch) == BATCH_SIZE:
+                yield from self.render_blocks(batch, basepath, assets, images)
+                batch = []
+        if batch:
+            yield from self.render_blocks(batch, basepath, assets, images)
+
+    def finish(self) -> BlockCacheStats:
+        """
+        End a build: evict least recently used blocks beyond max_bytes and
+        return the build's statistics (including work done in worker processes).
+        """
+        conn = self._connect()
+        with conn:
+            evicted = conn.execute(
+                """
+                DELETE FROM blocks WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY used DESC, key) AS total
+                        FROM blocks
+                    ) WHERE total > ?
+                )
+                """,
+                (self.max_bytes,),
+            ).rowcount
+        hits, misses = conn.execute("SELECT hits, misses FROM state").fetchone()
+        size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+        return BlockCacheStats(hits, misses, evicted, size)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
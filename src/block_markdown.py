@@ -1,8 +1,9 @@
 from enum import Enum
 
+from html_events import EventBuffer, intern_tag
 from leafnode import LeafNode
 from parentnode import ParentNode
-from textnode import TextNode, TextType, text_node_to_html_node
+from textnode import TextNode, TextType, text_node_to_events, text_node_to_html_node
 from inline_markdown import text_to_textnodes
 
 
@@ -15,21 +16,199 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 
+class Block:
+    """
+    A markdown block as lex_blocks emits it.
+
+    text is the block's markdown, stripped like the strings markdown_to_blocks
+    returns (what the block cache keys on). payload holds what rendering needs,
+    with the block markers already removed: the paragraph, the heading text,
+    the code, or the quote text as its single item, or the non-empty list
+    items. level is the heading level, 0 for other blocks.
+    """
+
+    __slots__ = ("type", "text", "payload", "level")
+
+    def __init__(self, block_type: BlockType, text: str, payload: list[str], level: int = 0):
+        self.type = block_type
+        self.text = text
+        self.payload = payload
+        self.level = level
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Block)
+            and self.type == other.type
+            and self.text == other.text
+            and self.payload == other.payload
+            and self.level == other.level
+        )
+
+    def __repr__(self):
+        return f"Block({self.type}, {self.text!r})"
+
+
+def lex_block(text: str) -> Block:
+    """
+    Classify a single stripped markdown block and strip its markers in one
+    scan: the first character picks the only type the block can have, and
+    only quotes and lists look at their other lines, removing each line's
+    marker as they check it. A block that fails its candidate's check is a
+    paragraph.
+    """
+    first = text[:1]
+    if first == "#":
+        # heading: 1-6 '#' then space
+        level = len(text) - len(text.lstrip("#"))
+        if level <= 6 and text[level : level + 1] == " ":
+            return Block(BlockType.HEADING, text, [text[level + 1 :]], level)
+
+    elif first == "`":
+        # code block: starts and ends with ```
+        if text.startswith("```") and text.endswith("```") and len(text) >= 6:
+            code = text[3:-3]
+            if code.startswith("\n"):
+                code = code[1:]
+            return Block(BlockType.CODE, text, [code])
+
+    elif first == ">":
+        # quote: every line starts with '>', optionally followed by a space
+        lines = []
+        for line in text.split("\n"):
+            if line[:1] != ">":
+                break
+            lines.append(line[2:] if line[1:2] == " " else line[1:])
+        else:
+            return Block(BlockType.QUOTE, text, ["\n".join(lines)])
+
+    elif first == "-":
+        # unordered list: every line starts with '- '
+        items = []
+        for line in text.split("\n"):
+            if not line.startswith("- "):
+                break
+            if len(line) > 2:
+                items.append(line[2:])
+        else:
+            return Block(BlockType.UNORDERED_LIST, text, items)
+
+    elif first == "1":
+        # ordered list: lines start with '1. ', '2. ', ... incrementing by 1
+        items = []
+        for idx, line in enumerate(text.split("\n"), start=1):
+            marker = f"{idx}. "
+            if not line.startswith(marker):
+                break
+            if len(line) > len(marker):
+                items.append(line[len(marker) :])
+        else:
+            return Block(BlockType.ORDERED_LIST, text, items)
+
+    return Block(BlockType.PARAGRAPH, text, [text])
+
+
+def _opens_fence(line: str) -> bool:
+    # The first line of a block, stripped, opens a fence it does not close
+    # itself (like "```x```").
+    return line.startswith("```") and not (len(line) >= 6 and line.endswith("```"))
+
+
+def _closes_fence(line: str) -> bool:
+    return line.rstrip().endswith("```")
+
+
+def _any_closes_fence(text: str) -> bool:
+    return "```" in text and any(_closes_fence(line) for line in text.split("\n"))
+
+
+def _block_texts(markdown: str):
+    # The stripped text of each block of a document (see lex_markdown).
+    chunks = markdown.split("\n\n")
+    count = len(chunks)
+    i = 0
+    while i < count:
+        chunk = chunks[i]
+        i += 1
+        text = chunk.strip()
+        if text == "":
+            continue
+        if text.startswith("```"):
+            first, _, rest = text.partition("\n")
+            if _opens_fence(first.rstrip()) and not _any_closes_fence(rest):
+                end = i
+                while end < count and not _any_closes_fence(chunks[end]):
+                    end += 1
+                if end < count:
+                    text = "\n\n".join(chunks[i - 1 : end + 1]).strip()
+                    i = end + 1
+        yield text
+
+
+def lex_markdown(markdown: str):
+    """
+    Lex a full markdown document into Blocks, one at a time.
+
+    Blocks are separated by a blank line (double newline), except inside a
+    fenced code block: once a block opens with ```, blank lines belong to it
+    until a line ending with ``` closes the fence. A fence still open at the
+    end of the document is split on its blank lines like any other text.
+    """
+    for text in _block_texts(markdown):
+        yield lex_block(text)
+
+
+def lex_blocks(lines):
+    """
+    Yield the same Blocks as lex_markdown from an iterable of lines (e.g. an
+    open text file), so a document never has to be held in memory as a whole.
+    """
+    buffer = []
+    has_text = False
+    fenced = False
+    for line in lines:
+        if line.endswith("\n"):
+            line = line[:-1]
+        if fenced:
+            if _closes_fence(line):
+                fenced = False
+        elif line == "":
+            if has_text:
+                yield lex_block("\n".join(buffer).strip())
+            buffer = []
+            has_text = False
+            continue
+        elif not has_text:
+            stripped = line.strip()
+            if stripped:
+                has_text = True
+                fenced = _opens_fence(stripped)
+        buffer.append(line)
+
+    if fenced:
+        # Never closed: split the rest on its empty lines after all.
+        yield from lex_markdown("\n".join(buffer))
+    elif has_text:
+        yield lex_block("\n".join(buffer).strip())
+
+
 def markdown_to_blocks(markdown: str) -> list[str]:
     """
     Split a full Markdown document into block strings.
 
-    Blocks are separated by a blank line (double newline). Each returned block is
-    stripped of leading/trailing whitespace, and empty blocks are removed.
+    Blocks are separated by a blank line (double newline), except inside
+    fenced code (see lex_markdown). Each returned block is stripped of
+    leading/trailing whitespace, and empty blocks are removed.
     """
-    raw_blocks = markdown.split("\n\n")
-    blocks = []
-    for block in raw_blocks:
-        stripped = block.strip()
-        if stripped == "":
-            continue
-        blocks.append(stripped)
-    return blocks
+    return list(_block_texts(markdown))
+
+
+def iter_markdown_blocks(lines):
+    """
+    Yield the same blocks as markdown_to_blocks, one at a time, from an iterable
+    of lines (e.g. an open text file).
+    """
+    for block in lex_blocks(lines):
+        yield block.text
 
 
 def block_to_block_type(block: str) -> BlockType:
@@ -39,111 +218,192 @@ def block_to_block_type(block: str) -> BlockType:
     Assumptions:
         - Leading/trailing whitespace is already stripped.
     """
-    lines = block.split("\n")
+    return lex_block(block).type
+
 
-    # heading: 1-6 '#' then space
-    if block.startswith("#"):
-        i = 0
-        while i < len(block) and block[i] == "#":
-            i += 1
-        if 1 <= i <= 6 and len(block) > i and block[i] == " ":
-            return BlockType.HEADING
+def _text_to_children(text: str, basepath: str = "/", assets=None, images=None):
+    """
+    Convert inline-markdown text into a list of HTMLNodes, resolving link and
+    image URLs against the basepath (and asset manifest, if any) and sizing
+    images from the ImageIndex, if any.
+    """
+    # Inside block elements, line breaks are treated like spaces (paragraph test expects this).
+    normalized = " ".join(text.split("\n"))
+    text_nodes = text_to_textnodes(normalized)
+    return [text_node_to_html_node(n, basepath, assets, images) for n in text_nodes]
+
+
+def block_to_html_node(
+    block: Block,
+    basepath: str = "/",
+    assets=None,
+    images=None,
+) -> ParentNode:
+    """
+    Convert a single markdown block (a Block from lex_blocks, or a string as
+    returned by markdown_to_blocks) to its HTML node. Root-relative link and
+    image URLs are prefixed with basepath, and mapped to fingerprinted names
+    through an AssetManifest when one is given. With an ImageIndex, images get
+    width, height and lazy loading attributes.
+    """
+    if isinstance(block, str):
+        block = lex_block(block)
+    block_type = block.type
 
-    # code block: starts and ends with ```
-    if block.startswith("```") and block.endswith("```") and len(block) >= 6:
-        return BlockType.CODE
+    if block_type == BlockType.PARAGRAPH:
+        return ParentNode("p", _text_to_children(block.payload[0], basepath, assets, images))
 
-    # quote: every line starts with '>'
-    if all(line.startswith(">") for line in lines):
-        return BlockType.QUOTE
+    if block_type == BlockType.HEADING:
+        children = _text_to_children(block.payload[0], basepath, assets, images)
+        return ParentNode(f"h{block.level}", children)
 
-    # unordered list: every line starts with '- '
-    if all(line.startswith("- ") for line in lines):
-        return BlockType.UNORDERED_LIST
+    if block_type == BlockType.CODE:
+        # Code is kept exactly as written (no inline parsing).
+        return ParentNode("pre", [LeafNode("code", block.payload[0])])
 
-    # ordered list: lines start with '1. ', '2. ', ... incrementing by 1
-    is_ordered = True
-    for idx, line in enumerate(lines, start=1):
-        if not line.startswith(f"{idx}. "):
-            is_ordered = False
-            break
-    if is_ordered:
-        return BlockType.ORDERED_LIST
+    if block_type == BlockType.QUOTE:
+        children = _text_to_children(block.payload[0], basepath, assets, images)
+        return ParentNode("blockquote", children)
 
-    return BlockType.PARAGRAPH
+    if block_type == BlockType.UNORDERED_LIST or block_type == BlockType.ORDERED_LIST:
+        li_nodes = [
+            ParentNode("li", _text_to_children(item, basepath, assets, images))
+            for item in block.payload
+        ]
+        return ParentNode("ul" if block_type == BlockType.UNORDERED_LIST else "ol", li_nodes)
 
+    raise Exception(f"Unhandled block type: {block_type}")
 
-def _text_to_children(text: str):
+
+def _text_to_events(text: str, events: EventBuffer, basepath: str, assets, images) -> None:
+    # _text_to_children, appending events instead of building nodes.
+    for text_node in text_to_textnodes(" ".join(text.split("\n"))):
+        text_node_to_events(text_node, events, basepath, assets, images)
+
+
+_DIV, _P, _PRE, _CODE, _BLOCKQUOTE, _LI = map(
+    intern_tag, ("div", "p", "pre", "code", "blockquote", "li")
+)
+_HEADINGS = [None] + [intern_tag(f"h{level}") for level in range(1, 7)]
+_LISTS = {
+    BlockType.UNORDERED_LIST: intern_tag("ul"),
+    BlockType.ORDERED_LIST: intern_tag("ol"),
+}
+
+
+def block_to_events(
+    block: Block,
+    events: EventBuffer,
+    basepath: str = "/",
+    assets=None,
+    images=None,
+) -> None:
     """
-    Convert inline-markdown text into a list of HTMLNodes.
+    Append the events of a block (a Block or a block string) to an
+    EventBuffer: the flat counterpart of block_to_html_node, rendering to the
+    same HTML without building any nodes.
     """
-    # Inside block elements, line breaks are treated like spaces (paragraph test expects this).
-    normalized = " ".join(text.split("\n"))
-    text_nodes = text_to_textnodes(normalized)
-    return [text_node_to_html_node(n) for n in text_nodes]
+    if isinstance(block, str):
+        block = lex_block(block)
+    block_type = block.type
+
+    if block_type == BlockType.PARAGRAPH:
+        events.open(_P)
+        _text_to_events(block.payload[0], events, basepath, assets, images)
+        events.close(_P)
+    elif block_type == BlockType.HEADING:
+        tag_id = _HEADINGS[block.level]
+        events.open(tag_id)
+        _text_to_events(block.payload[0], events, basepath, assets, images)
+        events.close(tag_id)
+    elif block_type == BlockType.CODE:
+        events.open(_PRE)
+        events.leaf(_CODE, block.payload[0])
+        events.close(_PRE)
+    elif block_type == BlockType.QUOTE:
+        events.open(_BLOCKQUOTE)
+        _text_to_events(block.payload[0], events, basepath, assets, images)
+        events.close(_BLOCKQUOTE)
+    elif block_type in _LISTS:
+        tag_id = _LISTS[block_type]
+        events.open(tag_id)
+        for item in block.payload:
+            events.open(_LI)
+            _text_to_events(item, events, basepath, assets, images)
+            events.close(_LI)
+        events.close(tag_id)
+    else:
+        raise Exception(f"Unhandled block type: {block_type}")
 
 
-def markdown_to_html_node(markdown: str) -> ParentNode:
+def block_to_html(block: Block, basepath: str = "/", assets=None, images=None) -> str:
     """
-    Convert a full markdown document to a single parent HTML node (<div>...</div>).
+    The HTML of a block, rendered through an EventBuffer; the same string as
+    block_to_html_node(block, ...).to_html().
     """
-    blocks = markdown_to_blocks(markdown)
-    block_nodes = []
+    events = EventBuffer()
+    block_to_events(block, events, basepath, assets, images)
+    return events.to_html()
 
-    for block in blocks:
-        block_type = block_to_block_type(block)
 
-        if block_type == BlockType.PARAGRAPH:
-            block_nodes.append(ParentNode("p", _text_to_children(block)))
-            continue
+def block_inline_texts(block: Block) -> list[str]:
+    """
+    The inline-markdown texts of a block (a Block or a block string), as
+    block_to_html_node passes them to text_to_textnodes: the heading text,
+    the quote with its markers removed, each list item, and so on. Code
+    blocks have none.
+    """
+    if isinstance(block, str):
+        block = lex_block(block)
+    if block.type == BlockType.CODE:
+        return []
+    return [" ".join(text.split("\n")) for text in block.payload if text != ""]
 
-        if block_type == BlockType.HEADING:
-            i = 0
-            while i < len(block) and block[i] == "#":
-                i += 1
-            heading_text = block[i + 1 :]  # skip required space after hashes
-            block_nodes.append(ParentNode(f"h{i}", _text_to_children(heading_text)))
-            continue
 
-        if block_type == BlockType.CODE:
-            # Strip the triple-backtick fences, preserve content exactly (no inline parsing).
-            content = block[3:-3]
-            if content.startswith("\n"):
-                content = content[1:]
-            code_leaf = LeafNode("code", content)
-            block_nodes.append(ParentNode("pre", [code_leaf]))
-            continue
+def markdown_to_html_node(
+    markdown: str, basepath: str = "/", assets=None, images=None
+) -> ParentNode:
+    """
+    Convert a full markdown document to a single parent HTML node (<div>...</div>).
+    """
+    blocks = lex_markdown(markdown)
+    return ParentNode(
+        "div", [block_to_html_node(block, basepath, assets, images) for block in blocks]
+    )
 
-        if block_type == BlockType.QUOTE:
-            lines = block.split("\n")
-            stripped_lines = []
-            for line in lines:
-                # remove the leading '>' and an optional following space
-                line = line[1:]
-                if line.startswith(" "):
-                    line = line[1:]
-                stripped_lines.append(line)
-            quote_text = "\n".join(stripped_lines)
-            block_nodes.append(ParentNode("blockquote", _text_to_children(quote_text)))
-            continue
 
-        if block_type == BlockType.UNORDERED_LIST:
-            items = [line[2:] for line in block.split("\n")]  # drop "- "
-            li_nodes = [ParentNode("li", _text_to_children(item)) for item in items if item != ""]
-            block_nodes.append(ParentNode("ul", li_nodes))
-            continue
+def markdown_to_events(
+    markdown: str, basepath: str = "/", assets=None, images=None
+) -> EventBuffer:
+    """
+    Convert a full markdown document to an EventBuffer holding its <div>: the
+    flat counterpart of markdown_to_html_node.
+    """
+    return blocks_to_events(lex_markdown(markdown), basepath, assets, images)
 
-        if block_type == BlockType.ORDERED_LIST:
-            items = []
-            for line in block.split("\n"):
-                # split once on ". " after the number
-                _, item_text = line.split(". ", 1)
-                items.append(item_text)
-            li_nodes = [ParentNode("li", _text_to_children(item)) for item in items if item != ""]
-            block_nodes.append(ParentNode("ol", li_nodes))
-            continue
 
-        raise Exception(f"Unhandled block type: {block_type}")
+def blocks_to_events(blocks, basepath: str = "/", assets=None, images=None) -> EventBuffer:
+    """
+    The EventBuffer of a document's <div> from its blocks (e.g. lex_markdown).
+    Its iter_html yields the same chunks as the node tree's: "<div>", one
+    rendered block per chunk, then "</div>".
+    """
+    events = EventBuffer()
+    events.open(_DIV)
+    for block in blocks:
+        block_to_events(block, events, basepath, assets, images)
+    events.close(_DIV)
+    return events
 
-    return ParentNode("div", block_nodes)
 
+def iter_markdown_html(lines, basepath: str = "/", assets=None, images=None):
+    """
+    Stream a markdown document given as lines into HTML chunks: "<div>", one
+    rendered block per chunk, then "</div>". Joined, the chunks equal
+    markdown_to_html_node(markdown).to_html(), but only one block is ever
+    parsed and held in memory at a time.
+    """
+    yield "<div>"
+    for block in lex_blocks(lines):
+        yield block_to_html(block, basepath, assets, images)
+    yield "</div>"
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+
+# Bump whenever a change to the generator alters rendered output, so every
+# page cached by an older generator is rebuilt.
+GENERATOR_VERSION = "6"
+
+MANIFEST_FILENAME = "manifest.json"
+FRAGMENTS_DIRNAME = "fragments"
+
+PAGE_SKIP = "skip"
+PAGE_RETEMPLATE = "retemplate"
+PAGE_REBUILD = "rebuild"
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hash_bytes(text.encode("utf-8"))
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildStats:
+    def __init__(self):
+        self.skipped = 0
+        self.retemplated = 0
+        self.rebuilt = 0
+        self.removed = 0
+
+    @property
+    def total(self) -> int:
+        return self.skipped + self.retemplated + self.rebuilt
+
+    def record(self, status: str) -> None:
+        if status == PAGE_SKIP:
+            self.skipped += 1
+        elif status == PAGE_RETEMPLATE:
+            self.retemplated += 1
+        elif status == PAGE_REBUILD:
+            self.rebuilt += 1
+        else:
+            raise ValueError(f"Unknown page status: {status}")
+
+    def summary(self) -> str:
+        return (
+            f"{self.total} pages: {self.rebuilt} rebuilt, {self.retemplated} re-templated, "
+            f"{self.skipped} skipped, {self.removed} stale removed"
+        )
+
+    def __repr__(self):
+        return (
+            f"BuildStats(skipped={self.skipped}, retemplated={self.retemplated}, "
+            f"rebuilt={self.rebuilt}, removed={self.removed})"
+        )
+
+
+class BuildManifest:
+    """
+    Persistent record of what the previous build produced.
+
+    The manifest stores, per content page, the hash of its markdown source, the
+    output path (relative to the output directory given to begin(), so the
+    output can be built in a staging directory and moved), the extracted title
+    and the link and image URLs the page references (the page graph, see
+    page_graph.PageGraph). The rendered content HTML (everything that goes
+    into {{ Content }}) is kept next to it as a fragment file keyed by the
+    source hash, so a template change only re-applies the template instead
+    of re-parsing the markdown. The basepath and the asset manifest digest are
+    part of the rendered link and image URLs, and the image index digest of the
+    image sizes, so changing any of them rebuilds every page. Turning
+    minification on or off re-templates every page, like a template change.
+    Drafts (pages with "draft: true" front matter) are recorded without an
+    output path while drafts are left out of the build.
+
+    Layout:
+        <cache_dir>/manifest.json
+        <cache_dir>/fragments/<source hash>.html
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, MANIFEST_FILENAME)
+        self.fragments_dir = os.path.join(cache_dir, FRAGMENTS_DIRNAME)
+        self.pages = {}
+        self.template_hash = None
+        self.basepath = None
+        self.assets_digest = None
+        self.image_sizes = None
+        self.minify = False
+        self.drafts = False
+        self.output_dir = None
+        self._previous_pages = {}
+        self._template_changed = True
+        self._urls_changed = True
+        self._previous_image_sizes = {}
+
+    def load(self) -> None:
+        """
+        Load the manifest from disk. A missing, unreadable or version-mismatched
+        manifest is treated as empty, which forces a full rebuild.
+        """
+        self.pages = {}
+        self.template_hash = None
+        self.basepath = None
+        self.assets_digest = None
+        self.image_sizes = None
+        self.minify = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("generator_version") != GENERATOR_VERSION:
+            return
+        self.pages = data.get("pages", {})
+        self.template_hash = data.get("template_hash")
+        self.basepath = data.get("basepath")
+        self.assets_digest = data.get("assets_digest")
+        self.image_sizes = data.get("image_sizes")
+        self.minify = data.get("minify", False)
+
+    def save(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = {
+            "generator_version": GENERATOR_VERSION,
+            "template_hash": self.template_hash,
+            "basepath": self.basepath,
+            "assets_digest": self.assets_digest,
+            "image_sizes": self.image_sizes,
+            "minify": self.minify,
+            "pages": self.pages,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._prune_fragments()
+
+    def begin(
+        self,
+        template_hash: str,
+        basepath: str,
+        assets_digest: str = None,
+        minify: bool = False,
+        image_sizes: dict[str, tuple[int, int]] = None,
+        drafts: bool = False,
+        output_dir: str = None,
+    ) -> None:
+        """
+        Start a new build writing into output_dir. Pages not stored again
+        before save() are dropped. image_sizes (ImageIndex.sizes, or None
+        without image sizes) only rebuilds the pages showing an image whose
+        size changed.
+        """
+        if image_sizes is not None:
+            image_sizes = {url: list(size) for url, size in image_sizes.items()}
+        os.makedirs(self.fragments_dir, exist_ok=True)
+        self._template_changed = template_hash != self.template_hash or minify != self.minify
+        self._urls_changed = (
+            basepath != self.basepath
+            or assets_digest != self.assets_digest
+            or (image_sizes is None) != (self.image_sizes is None)
+        )
+        self._previous_image_sizes = self.image_sizes or {}
+        self.template_hash = template_hash
+        self.basepath = basepath
+        self.assets_digest = assets_digest
+        self.minify = minify
+        self.image_sizes = image_sizes
+        self.drafts = drafts
+        self.output_dir = output_dir
+        self._previous_pages = self.pages
+        self.pages = {}
+
+    def page_status(self, rel_path: str, source_hash: str, dest_path: str) -> str:
+        """
+        Decide what the build has to do for a page:
+            PAGE_SKIP        - source, template, basepath, assets and images are unchanged
+            PAGE_RETEMPLATE  - only the template (or minification) changed
+            PAGE_REBUILD     - the markdown must be parsed and rendered again
+        """
+        entry = self._previous_pages.get(rel_path)
+        if entry is None or entry.get("source_hash") != source_hash:
+            return PAGE_REBUILD
+        if entry.get("draft") and not self.drafts:
+            # Unchanged drafts stay out of the build; built ones are removed.
+            return PAGE_SKIP if entry.get("dest_path") is None else PAGE_REBUILD
+        if entry.get("dest_path") != self._relative(dest_path) or self._urls_changed:
+            return PAGE_REBUILD
+        if self.image_sizes is not None:
+            for url in entry.get("images", []):
+                if self.image_sizes.get(url) != self._previous_image_sizes.get(url):
+                    return PAGE_REBUILD
+        if not os.path.exists(self.fragment_path(source_hash)):
+            return PAGE_REBUILD
+        if self._template_changed or not os.path.exists(dest_path):
+            return PAGE_RETEMPLATE
+        return PAGE_SKIP
+
+    def has_previous_page(self, rel_path: str) -> bool:
+        return rel_path in self._previous_pages
+
+    def keep_page(self, rel_path: str) -> None:
+        self.pages[rel_path] = self._previous_pages[rel_path]
+
+    def previous_title(self, rel_path: str) -> str:
+        return self._previous_pages[rel_path]["title"]
+
+    def _relative(self, dest_path: str) -> str:
+        if dest_path is None or self.output_dir is None:
+            return dest_path
+        return os.path.relpath(dest_path, self.output_dir)
+
+    def output_path(self, rel_path: str) -> str:
+        """
+        Where the current build wrote a page, or None for a draft left out.
+        """
+        dest_path = self.pages[rel_path]["dest_path"]
+        if dest_path is None or self.output_dir is None:
+            return dest_path
+        return os.path.join(self.output_dir, dest_path)
+
+    def store_page(
+        self,
+        rel_path: str,
+        source_hash: str,
+        dest_path: str,
+        title: str,
+        content_html: str = None,
+        links: list[str] = None,
+        images: list[str] = None,
+        draft: bool = False,
+    ) -> None:
+        """
+        Record a freshly rendered page. Pass content_html unless the fragment was
+        already streamed to fragment_path(source_hash) during rendering. A draft
+        left out of the build is stored with dest_path None.
+        """
+        if content_html is not None:
+            os.makedirs(self.fragments_dir, exist_ok=True)
+            with open(self.fragment_path(source_hash), "w", encoding="utf-8") as f:
+                f.write(content_html)
+        self.pages[rel_path] = {
+            "source_hash": source_hash,
+            "dest_path": self._relative(dest_path),
+            "title": title,
+            "links": links or [],
+            "images": images or [],
+        }
+        if draft:
+            self.pages[rel_path]["draft"] = True
+
+    def store_listed(self, rel_path: str, urls: list[str]) -> None:
+        """
+        Record the page URLs a listing added to a stored page. The page graph
+        treats them as links of the page.
+        """
+        self.pages[rel_path]["listed"] = list(urls)
+
+    def load_fragment(self, source_hash: str) -> str:
+        with open(self.fragment_path(source_hash), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def stale_outputs(self) -> list[str]:
+        """
+        Output paths produced by the previous build that this build did not
+        produce: those of deleted pages and of drafts now left out.
+        """
+        current = {entry["dest_path"] for entry in self.pages.values()}
+        previous = {entry["dest_path"] for entry in self._previous_pages.values()}
+        stale = sorted(previous - current - {None})
+        if self.output_dir is None:
+            return stale
+        return [os.path.join(self.output_dir, dest_path) for dest_path in stale]
+
+    def fragment_path(self, source_hash: str) -> str:
+        return os.path.join(self.fragments_dir, f"{source_hash}.html")
+
+    def _prune_fragments(self) -> None:
+        if not os.path.isdir(self.fragments_dir):
+            return
+        live = {f"{entry['source_hash']}.html" for entry in self.pages.values()}
+        for filename in os.listdir(self.fragments_dir):
+            if filename not in live:
+                os.remove(os.path.join(self.fragments_dir, filename))
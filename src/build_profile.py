@@ -0,0 +1,306 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+
+import block_markdown
+from block_markdown import blocks_to_events, lex_markdown
+from generate_page import (
+    RenderedPage,
+    apply_template,
+    decode_markdown,
+    page_title,
+    write_page,
+)
+from front_matter import parse_front_matter
+from html_minify import minify_html
+from image_index import eager_first_image
+from page_graph import PageRefs
+
+STAGES = (
+    "read",
+    "lex",
+    "refs",
+    "inline",
+    "events",
+    "to_html",
+    "template",
+    "minify",
+    "write",
+)
+
+PROFILE_REPORT_FILENAME = "profile.json"
+CPROFILE_FILENAME = "profile.prof"
+
+
+class PageProfile:
+    """
+    Time spent in each build stage for one page, plus what the page produced.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self.source_bytes = 0
+        self.blocks = 0
+        self.text_nodes = 0
+        self.events = 0
+        self.output_bytes = 0
+        self.peak_memory = None
+
+    @property
+    def total(self) -> float:
+        return sum(self.times.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "total": self.total,
+            "times": self.times,
+            "source_bytes": self.source_bytes,
+            "blocks": self.blocks,
+            "text_nodes": self.text_nodes,
+            "events": self.events,
+            "output_bytes": self.output_bytes,
+            "peak_memory": self.peak_memory,
+        }
+
+    def __repr__(self):
+        return f"PageProfile({self.path}, {self.total * 1000:.2f} ms)"
+
+
+class _InlineTimer:
+    """
+    Stand-in for text_to_textnodes that accumulates its run time and output size.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.elapsed = 0.0
+        self.nodes = 0
+
+    def __call__(self, text: str):
+        start = time.perf_counter()
+        nodes = self.func(text)
+        self.elapsed += time.perf_counter() - start
+        self.nodes += len(nodes)
+        return nodes
+
+
+@contextlib.contextmanager
+def _timed_inline():
+    # Only swapped in while a profiled page is converted, so unprofiled builds
+    # call text_to_textnodes directly.
+    timer = _InlineTimer(block_markdown.text_to_textnodes)
+    block_markdown.text_to_textnodes = timer
+    try:
+        yield timer
+    finally:
+        block_markdown.text_to_textnodes = timer.func
+
+
+class BuildProfiler:
+    """
+    Opt-in per-stage instrumentation of page rendering.
+
+    render_page has the signature generate_pages_recursive expects of a page
+    renderer and produces the same files as generate_page.render_page, but runs
+    each stage separately and records its time:
+
+        read      - reading and decoding the markdown source, extracting the title
+        lex       - lex_markdown (splitting, classifying and stripping block markers)
+        refs      - collecting the link and image URLs for the page graph
+        inline    - text_to_textnodes
+        events    - emitting the page's EventBuffer (everything else in blocks_to_events)
+        to_html   - rendering the event buffer
+        template  - filling the template
+        minify    - minifying the page (only with minify)
+        write     - writing the page (and its manifest fragment)
+
+    Profiled pages are always rendered whole and in-process, even when a build
+    would otherwise stream them or use worker processes. With cprofile, a
+    cProfile.Profile is enabled around every page; with trace_memory, the peak
+    traced allocation of every page is recorded (tracemalloc slows the build
+    down noticeably, so stage times are best read from a run without it).
+    """
+
+    def __init__(self, cprofile: bool = False, trace_memory: bool = False):
+        self.pages = []
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.trace_memory = trace_memory
+
+    def render_page(
+        self,
+        from_path: str,
+        dest_path: str,
+        fragment_path: str,
+        template,
+        minify: bool = False,
+        drafts: bool = False,
+    ):
+        print(f"Generating page from {from_path} to {dest_path}")
+        page = PageProfile(from_path)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        try:
+            result = self._render(
+                page, from_path, dest_path, fragment_path, template, minify, drafts
+            )
+        finally:
+            if self.cprofile is not None:
+                self.cprofile.disable()
+            if self.trace_memory:
+                page.peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+        self.pages.append(page)
+        return result
+
+    def _render(self, page, from_path, dest_path, fragment_path, template, minify, drafts):
+        clock = time.perf_counter
+        times = page.times
+
+        start = clock()
+        with open(from_path, "rb") as f:
+            source = f.read()
+        meta, markdown = parse_front_matter(decode_markdown(source))
+        title = page_title(meta, markdown)
+        end = clock()
+        times["read"] = end - start
+        page.source_bytes = len(source)
+        if meta.get("draft") and not drafts:
+            return RenderedPage(title, meta, PageRefs(), written=False)
+
+        start = end
+        blocks = list(lex_markdown(markdown))
+        end = clock()
+        times["lex"] = end - start
+
+        start = end
+        refs = PageRefs()
+        for block in blocks:
+            refs.add_block(block)
+        end = clock()
+        times["refs"] = end - start
+
+        start = end
+        with _timed_inline() as inline:
+            events = blocks_to_events(
+                blocks, template.basepath, template.assets, template.images
+            )
+        end = clock()
+        times["inline"] = inline.elapsed
+        times["events"] = end - start - inline.elapsed
+
+        start = end
+        content_html = events.to_html()
+        if template.images is not None:
+            content_html = "".join(eager_first_image((content_html,)))
+        end = clock()
+        times["to_html"] = end - start
+
+        start = end
+        html = apply_template(template, title, content_html)
+        end = clock()
+        times["template"] = end - start
+
+        sizes = None
+        start = end
+        if minify:
+            minified = minify_html(html)
+            sizes = (len(html.encode("utf-8")), len(minified.encode("utf-8")))
+            html = minified
+        end = clock()
+        times["minify"] = end - start
+
+        start = end
+        write_page(dest_path, html)
+        if fragment_path is not None:
+            with open(fragment_path, "w", encoding="utf-8") as f:
+                f.write(content_html)
+        times["write"] = clock() - start
+
+        page.blocks = len(blocks)
+        page.text_nodes = inline.nodes
+        page.events = len(events)
+        page.output_bytes = len(html.encode("utf-8"))
+        return RenderedPage(title, meta, refs, sizes)
+
+    def stage_totals(self) -> dict[str, float]:
+        totals = dict.fromkeys(STAGES, 0.0)
+        for page in self.pages:
+            for stage, elapsed in page.times.items():
+                totals[stage] += elapsed
+        return totals
+
+    def slowest(self, n: int) -> list[PageProfile]:
+        return sorted(self.pages, key=lambda page: page.total, reverse=True)[:n]
+
+    def peak_page(self) -> PageProfile:
+        measured = [page for page in self.pages if page.peak_memory is not None]
+        if not measured:
+            return None
+        return max(measured, key=lambda page: page.peak_memory)
+
+    def report(self) -> dict:
+        stages = self.stage_totals()
+        peak = self.peak_page()
+        return {
+            "pages": len(self.pages),
+            "total": sum(stages.values()),
+            "stages": stages,
+            "source_bytes": sum(page.source_bytes for page in self.pages),
+            "output_bytes": sum(page.output_bytes for page in self.pages),
+            "blocks": sum(page.blocks for page in self.pages),
+            "text_nodes": sum(page.text_nodes for page in self.pages),
+            "events": sum(page.events for page in self.pages),
+            "peak_memory": None if peak is None else peak.peak_memory,
+            "peak_memory_page": None if peak is None else peak.path,
+            "per_page": [page.to_dict() for page in self.pages],
+        }
+
+    def summary(self, slowest: int = 5, functions: int = 15) -> str:
+        report = self.report()
+        total = report["total"]
+        lines = [f"profile: {report['pages']} pages rendered in {total * 1000:.1f} ms"]
+        for stage, elapsed in report["stages"].items():
+            share = elapsed / total * 100 if total else 0.0
+            lines.append(f"  {stage:<10}{elapsed * 1000:>10.1f} ms{share:>7.1f}%")
+        lines.append(
+            f"  {report['blocks']} blocks, {report['text_nodes']} text nodes, "
+            f"{report['events']} events, "
+            f"{report['source_bytes']} bytes in, {report['output_bytes']} bytes out"
+        )
+        if self.pages:
+            lines.append(f"slowest {min(slowest, len(self.pages))} pages:")
+            for page in self.slowest(slowest):
+                lines.append(f"  {page.total * 1000:>10.1f} ms  {page.path}")
+        if report["peak_memory"] is not None:
+            lines.append(
+                f"peak memory: {report['peak_memory'] / 1024:.1f} KiB "
+                f"({report['peak_memory_page']})"
+            )
+        if self.cprofile is not None and self.pages:
+            out = io.StringIO()
+            stats = pstats.Stats(self.cprofile, stream=out)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(functions)
+            lines.append(out.getvalue().rstrip())
+        return "\n".join(lines)
+
+    def save(self, report_path: str, cprofile_path: str = None) -> None:
+        """
+        Write the JSON report and, when cProfile was enabled, the raw stats
+        (readable with `python3 -m pstats`).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        if self.cprofile is not None and cprofile_path is not None:
+            self.cprofile.dump_stats(cprofile_path)
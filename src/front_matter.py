@@ -0,0 +1,124 @@
+import datetime
+import itertools
+
+FENCE = "---"
+
+# Keys with a meaning to the generator; any other key is kept as a string.
+#   title  - page title (instead of the first "# " heading)
+#   date   - publication date, ISO 8601 ("2024-05-01" or "2024-05-01T09:30")
+#   tags   - list of tags: "[a, b]", "a, b" or one "- a" line per tag
+#   draft  - true/false; drafts are only built with --drafts
+#   list   - content directory whose pages this page lists (e.g. "blog")
+#   feed   - with list: file name of an RSS feed written next to the page
+_BOOLEANS = {"true": True, "yes": True, "false": False, "no": False}
+
+# Keys taking a single value, never a "- a" block list.
+_SCALARS = ("title", "date", "draft", "list", "feed")
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _parse_list(value: str) -> list[str]:
+    if value.startswith("[") and value.endswith("]"):
+        value = value[1:-1]
+    return [_unquote(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def _normalize(meta: dict) -> dict:
+    for key in _SCALARS:
+        if isinstance(meta.get(key), list):
+            raise ValueError(f"Invalid front matter {key}: expected a single value, got a list")
+    if "date" in meta:
+        date = meta["date"]
+        try:
+            datetime.datetime.fromisoformat(date)
+        except ValueError:
+            raise ValueError(f"Invalid front matter date: {date!r}") from None
+    if "tags" in meta and isinstance(meta["tags"], str):
+        meta["tags"] = _parse_list(meta["tags"])
+    if "draft" in meta:
+        draft = meta["draft"]
+        if draft.lower() not in _BOOLEANS:
+            raise ValueError(f"Invalid front matter draft value: {draft!r}")
+        meta["draft"] = _BOOLEANS[draft.lower()]
+    if "list" in meta:
+        meta["list"] = meta["list"].strip("/")
+    return meta
+
+
+def parse_fields(lines) -> dict:
+    """
+    Parse the "key: value" lines between the front matter fences.
+
+    Example:
+        parse_fields(["title: Hi", "tags: [a, b]", "draft: no"])
+        -> {"title": "Hi", "tags": ["a", "b"], "draft": False}
+    """
+    meta = {}
+    list_key = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and list_key is not None:
+            # Block list: "tags:" followed by "- a" lines.
+            if meta[list_key] == "":
+                meta[list_key] = []
+            meta[list_key].append(_unquote(stripped[2:].strip()))
+            continue
+        key, sep, value = stripped.partition(":")
+        key = key.strip()
+        if not sep or not key:
+            raise ValueError(f"Invalid front matter line: {line!r}")
+        meta[key] = _unquote(value.strip())
+        list_key = key if meta[key] == "" else None
+    return _normalize(meta)
+
+
+def parse_front_matter(markdown: str) -> tuple[dict, str]:
+    """
+    Split optional front matter off a markdown document: a first line of
+    "---", "key: value" lines and a closing "---" line. A document without
+    (closed) front matter is returned unchanged with empty metadata.
+
+    Returns:
+        (meta, body)
+    """
+    if not markdown.startswith(FENCE + "\n"):
+        return {}, markdown
+    start = len(FENCE) + 1
+    end = markdown.find("\n" + FENCE + "\n", start - 1)
+    if end < 0:
+        if not markdown.endswith("\n" + FENCE):
+            return {}, markdown
+        end = len(markdown) - len(FENCE) - 1
+    fields = markdown[start:end].split("\n") if end >= start else []
+    body = markdown[end + len(FENCE) + 2 :]
+    return parse_fields(fields), body
+
+
+def split_front_matter_lines(lines) -> tuple[dict, object]:
+    """
+    Like parse_front_matter, for an iterable of lines such as an open text
+    file. Only the front matter is consumed.
+
+    Returns:
+        (meta, body_lines) where body_lines iterates over the remaining lines.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return {}, iter(())
+    if first.rstrip("\n") != FENCE:
+        return {}, itertools.chain([first], lines)
+    consumed = [first]
+    for line in lines:
+        if line.rstrip("\n") == FENCE:
+            return parse_fields(field.rstrip("\n") for field in consumed[1:]), lines
+        consumed.append(line)
+    # No closing fence: not front matter after all.
+    return {}, iter(consumed)
@@ -1,52 +1,199 @@
+import copy
+import functools
 import os
+import re
 
-from markdown_to_html import markdown_to_html_node
+from build_manifest import (
+    PAGE_REBUILD,
+    PAGE_RETEMPLATE,
+    PAGE_SKIP,
+    BuildStats,
+    hash_file,
+)
+from block_markdown import block_to_html, blocks_to_events, lex_blocks, lex_markdown
+from front_matter import parse_front_matter, split_front_matter_lines
+from html_minify import MinifiedWriter, minify_html
+from image_index import eager_first_image
+from io_pipeline import run_pipelined
+from output_tree import remove_empty_dirs, replace_if_changed, write_if_changed
+from markdown_to_html import markdown_to_events
+from page_graph import PageRefs, collect_refs
+from parallel_build import BuildError, PageTask, resolve_jobs, run_page_tasks
+from sharding import shard_of
+from template_engine import CompiledTemplate, load_template
+
+
+# Pages at least this large (in bytes) are rendered block by block straight
+# from the file instead of being read into memory whole.
+DEFAULT_STREAM_THRESHOLD = 4 * 1024 * 1024
+
+_H1_RE = re.compile(r"^# (.*)$", re.MULTILINE)
 
 
 def extract_title(markdown: str) -> str:
     """
     Extract the H1 title (a line starting with '# ') from a markdown document.
+    The search stops at the first heading instead of splitting the document.
+    """
+    match = _H1_RE.search(markdown)
+    if match is None:
+        raise Exception("No h1 header found")
+    return match[1].strip()
+
+
+def extract_title_from_lines(lines) -> str:
+    """
+    Like extract_title, for an iterable of lines such as an open text file.
     """
-    for line in markdown.split("\n"):
+    for line in lines:
         if line.startswith("# "):
             return line[2:].strip()
     raise Exception("No h1 header found")
 
 
-def generate_page(from_path: str, template_path: str, dest_path: str, basepath: str) -> None:
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+def page_title(meta: dict, markdown: str) -> str:
+    """
+    The page title: the front matter title if there is one, else the H1.
+    """
+    title = meta.get("title")
+    return title if title else extract_title(markdown)
+
+
+def read_page_meta(from_path: str) -> tuple[str, dict]:
+    """
+    Read just a page's front matter and title, stopping at the first heading.
 
+    Returns:
+        (title, meta)
+    """
     with open(from_path, "r", encoding="utf-8") as f:
-        markdown = f.read()
+        meta, lines = split_front_matter_lines(f)
+        title = meta.get("title") or extract_title_from_lines(lines)
+    return title, meta
 
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = f.read()
 
-    content_html = markdown_to_html_node(markdown).to_html()
-    title = extract_title(markdown)
+def decode_markdown(source: bytes) -> str:
+    """
+    Decode raw markdown bytes the way text-mode open() would (UTF-8, universal newlines).
+    """
+    return source.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
 
-    full_html = template.replace("{{ Title }}", title).replace("{{ Content }}", content_html)
-    full_html = full_html.replace('href="/', f'href="{basepath}').replace(
-        'src="/', f'src="{basepath}'
-    )
 
+def render_markdown(markdown: str) -> tuple[str, str]:
+    """
+    Render a markdown document (with optional front matter) into its
+    (title, content_html) pair.
+    """
+    meta, markdown = parse_front_matter(markdown)
+    content_html = markdown_to_events(markdown).to_html()
+    title = page_title(meta, markdown)
+    return title, content_html
+
+
+def apply_template(template: CompiledTemplate, title: str, content_html: str, **extra) -> str:
+    """
+    Fill a compiled template with a page's title and content. Any extra keyword
+    arguments fill additional {{ Name }} placeholders.
+    """
+    return template.render({"Title": title, "Content": content_html, **extra})
+
+
+def _make_parent_dir(dest_path: str) -> None:
     dest_dir = os.path.dirname(dest_path)
     if dest_dir != "":
         os.makedirs(dest_dir, exist_ok=True)
-    with open(dest_path, "w", encoding="utf-8") as f:
-        f.write(full_html)
 
 
-def generate_pages_recursive(
-    dir_path_content: str, template_path: str, dest_dir_path: str, basepath: str
-) -> None:
+def write_page(dest_path: str, full_html: str, minify: bool = False):
     """
-    Walk a content directory tree and generate an HTML file for every .md file,
-    preserving the directory structure under dest_dir.
+    Write a finished page, minified when asked. A page whose bytes are
+    unchanged is left untouched.
+
+    Returns:
+        (bytes_in, bytes_out) of the minification, or None without minify.
+    """
+    sizes = None
+    if minify:
+        minified = minify_html(full_html)
+        sizes = (len(full_html.encode("utf-8")), len(minified.encode("utf-8")))
+        full_html = minified
+    write_if_changed(dest_path, full_html)
+    return sizes
+
+
+def _tee(chunks, fp):
+    for chunk in chunks:
+        fp.write(chunk)
+        yield chunk
+
+
+def stream_page(
+    dest_path: str,
+    template: CompiledTemplate,
+    title: str,
+    content_chunks,
+    fragment_path: str = None,
+    minify: bool = False,
+):
+    """
+    Write a page to dest_path as it is produced: the template text before
+    {{ Content }}, then the content chunks (e.g. HTMLNode.iter_html()), then the
+    rest of the template. The full page is never held in memory as one string.
+    It is streamed into a temporary file that only replaces dest_path when the
+    bytes differ.
+
+    When fragment_path is given, the content HTML is copied there as it streams
+    (for the build manifest's fragment cache). With minify, the page is
+    minified as it is written; the fragment is not. When the template carries
+    an ImageIndex, the first image of the page is loaded eagerly.
+
+    Returns:
+        (bytes_in, bytes_out) of the minification, or None without minify.
+    """
+    if template.images is not None:
+        content_chunks = eager_first_image(content_chunks)
+    _make_parent_dir(dest_path)
+    tmp_path = dest_path + ".tmp"
+    sizes = None
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            out = MinifiedWriter(f) if minify else f
+            if fragment_path is None:
+                template.write_to(out, {"Title": title, "Content": content_chunks})
+            else:
+                with open(fragment_path, "w", encoding="utf-8") as fragment:
+                    content = _tee(content_chunks, fragment)
+                    template.write_to(out, {"Title": title, "Content": content})
+            if minify:
+                sizes = out.close()
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    replace_if_changed(tmp_path, dest_path)
+    return sizes
+
+
+def generate_page(from_path: str, template_path: str, dest_path: str, basepath: str) -> None:
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+
+    with open(from_path, "r", encoding="utf-8") as f:
+        meta, markdown = parse_front_matter(f.read())
+
+    template = load_template(template_path, basepath)
+    title = page_title(meta, markdown)
+    content_chunks = markdown_to_events(markdown, basepath).iter_html()
+    stream_page(dest_path, template, title, content_chunks)
+
+
+def find_pages(dir_path_content: str, dest_dir_path: str) -> list[tuple[str, str]]:
+    """
+    List every .md file under a content directory with its destination .html
+    path, in a stable (sorted) order.
 
     Example:
         content/blog/x/index.md -> docs/blog/x/index.html
     """
+    pages = []
     for root, _, files in os.walk(dir_path_content):
         for filename in files:
             if not filename.endswith(".md"):
@@ -56,6 +203,418 @@ def generate_pages_recursive(
             rel_path = os.path.relpath(from_path, dir_path_content)
             rel_html = os.path.splitext(rel_path)[0] + ".html"
             dest_path = os.path.join(dest_dir_path, rel_html)
-            generate_page(from_path, template_path, dest_path, basepath)
+            pages.append((from_path, dest_path))
+    pages.sort()
+    return pages
+
+
+class BuildOptions:
+    """
+    How generate_pages_recursive builds pages:
+
+        jobs              worker processes rendering pages (see parallel_build)
+        stream_threshold  sources of at least this many bytes are rendered
+                          block by block from the file
+        drafts            also write pages with "draft: true" front matter
+        in_flight         with a single job, build through an asyncio pipeline
+                          holding at most this many pages (see io_pipeline);
+                          0 turns the pipeline off
+        shard             (i, N): build only the pages sharding.shard_of
+                          assigns to shard i, as if the others did not exist
+    """
+
+    def __init__(
+        self,
+        jobs: int = 1,
+        stream_threshold: int = DEFAULT_STREAM_THRESHOLD,
+        drafts: bool = False,
+        in_flight: int = 0,
+        shard: tuple[int, int] = None,
+    ):
+        self.jobs = jobs
+        self.stream_threshold = stream_threshold
+        self.drafts = drafts
+        self.in_flight = in_flight
+        self.shard = shard
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value}" for key, value in vars(self).items())
+        return f"BuildOptions({fields})"
+
+
+class RenderedPage:
+    """
+    What rendering a page produced, as returned (from worker processes too)
+    by the page renderers: its title and front matter, the links and images
+    it references (see page_graph.PageRefs), and the (bytes_in, bytes_out) of
+    minification, or None without minify. written is False for a draft that
+    was left out of the build.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        meta: dict,
+        refs: PageRefs,
+        minify_sizes: tuple[int, int] = None,
+        written: bool = True,
+    ):
+        self.title = title
+        self.meta = meta
+        self.links = refs.links
+        self.images = refs.images
+        self.minify_sizes = minify_sizes
+        self.written = written
+
+    def __repr__(self):
+        return f"RenderedPage({self.title!r}, {len(self.links)} links, {len(self.images)} images)"
+
+
+def _content_chunks(blocks, template: CompiledTemplate, block_cache=None):
+    # Same chunks as ParentNode("div", ...).iter_html(), one per block.
+    yield "<div>"
+    if block_cache is None:
+        for block in blocks:
+            yield block_to_html(block, template.basepath, template.assets, template.images)
+    else:
+        yield from block_cache.iter_html(
+            blocks, template.basepath, template.assets, template.images
+        )
+    yield "</div>"
+
+
+def stream_markdown_file(
+    from_path: str,
+    dest_path: str,
+    template: CompiledTemplate,
+    fragment_path: str = None,
+    block_cache=None,
+    minify: bool = False,
+    drafts: bool = False,
+) -> RenderedPage:
+    """
+    Render a markdown file with memory bounded by its largest block: one pass
+    over the lines reads the front matter and finds the title, a second one
+    reads, converts and writes the document block by block.
+    """
+    title, meta = read_page_meta(from_path)
+    refs = PageRefs()
+    if meta.get("draft") and not drafts:
+        return RenderedPage(title, meta, refs, written=False)
+    with open(from_path, "r", encoding="utf-8") as f:
+        _, lines = split_front_matter_lines(f)
+        blocks = collect_refs(lex_blocks(lines), refs)
+        content_chunks = _content_chunks(blocks, template, block_cache)
+        sizes = stream_page(dest_path, template, title, content_chunks, fragment_path, minify)
+    return RenderedPage(title, meta, refs, sizes)
+
+
+def render_page(
+    from_path: str,
+    dest_path: str,
+    fragment_path: str,
+    template: CompiledTemplate,
+    stream_threshold: int = DEFAULT_STREAM_THRESHOLD,
+    block_cache=None,
+    minify: bool = False,
+    drafts: bool = False,
+) -> RenderedPage:
+    """
+    Read, render and stream a single page using an already loaded template.
+    Sources of stream_threshold bytes or more go through stream_markdown_file.
+    With a BlockCache, only blocks not rendered by an earlier build are
+    converted. With minify, the page is minified after templating. Pages
+    marked as drafts in their front matter are not written unless drafts is
+    set.
+    """
+    print(f"Generating page from {from_path} to {dest_path}")
+    if os.path.getsize(from_path) >= stream_threshold:
+        return stream_markdown_file(
+            from_path, dest_path, template, fragment_path, block_cache, minify, drafts
+        )
+
+    with open(from_path, "rb") as f:
+        title, meta, refs, blocks = _parse_page(f.read(), drafts)
+    if blocks is None:
+        return RenderedPage(title, meta, refs, written=False)
+    if block_cache is None:
+        # Converted up front, so a page that fails to convert leaves no
+        # partial output behind.
+        events = blocks_to_events(blocks, template.basepath, template.assets, template.images)
+        content_chunks = events.iter_html()
+    else:
+        content_chunks = _content_chunks(blocks, template, block_cache)
+    sizes = stream_page(dest_path, template, title, content_chunks, fragment_path, minify)
+    return RenderedPage(title, meta, refs, sizes)
+
+
+def _parse_page(source: bytes, drafts: bool):
+    # (title, meta, refs, blocks) of a page read into memory; blocks is None
+    # for a draft left out of the build.
+    meta, markdown = parse_front_matter(decode_markdown(source))
+    title = page_title(meta, markdown)
+    refs = PageRefs()
+    if meta.get("draft") and not drafts:
+        return title, meta, refs, None
+    blocks = list(lex_markdown(markdown))
+    for block in blocks:
+        refs.add_block(block)
+    return title, meta, refs, blocks
+
+
+def render_source(
+    source: bytes,
+    template: CompiledTemplate,
+    block_cache=None,
+    minify: bool = False,
+    drafts: bool = False,
+) -> tuple[RenderedPage, str, str]:
+    """
+    Render the bytes of a markdown source into a finished page, without any
+    I/O of its own.
+
+    Returns:
+        (page, content_html, html); both HTML strings are None for a draft
+        left out of the build.
+    """
+    title, meta, refs, blocks = _parse_page(source, drafts)
+    if blocks is None:
+        return RenderedPage(title, meta, refs, written=False), None, None
+    content_chunks = _content_chunks(blocks, template, block_cache)
+    if template.images is not None:
+        content_chunks = eager_first_image(content_chunks)
+    content_html = "".join(content_chunks)
+    html = apply_template(template, title, content_html)
+    sizes = None
+    if minify:
+        minified = minify_html(html)
+        sizes = (len(html.encode("utf-8")), len(minified.encode("utf-8")))
+        html = minified
+    return RenderedPage(title, meta, refs, sizes), content_html, html
+
+
+def render_pipelined(
+    task: PageTask,
+    source: bytes,
+    template: CompiledTemplate,
+    block_cache=None,
+    minify: bool = False,
+    drafts: bool = False,
+    stream_block_cache=None,
+):
+    """
+    The render step of io_pipeline.run_pipelined: turn a source read by the
+    pipeline into the page and fragment to write. Sources the pipeline did not
+    read (source None) are above the stream threshold and streamed here, on
+    the pipeline's streaming thread; they use stream_block_cache, since an
+    SQLite connection only works on the thread that opened it.
+    """
+    print(f"Generating page from {task.from_path} to {task.dest_path}")
+    if source is None:
+        page = stream_markdown_file(
+            task.from_path,
+            task.dest_path,
+            template,
+            task.fragment_path,
+            stream_block_cache,
+            minify,
+            drafts,
+        )
+        return page, []
+    page, content_html, html = render_source(source, template, block_cache, minify, drafts)
+    if not page.written:
+        return page, []
+    outputs = [(task.dest_path, html)]
+    if task.fragment_path is not None:
+        outputs.append((task.fragment_path, content_html))
+    return page, outputs
+
+
+def generate_pages_recursive(
+    dir_path_content: str,
+    template_path: str,
+    dest_dir_path: str,
+    basepath: str,
+    manifest=None,
+    options: BuildOptions = None,
+    only: set[str] = None,
+    profiler=None,
+    block_cache=None,
+    assets=None,
+    minify_report=None,
+    images=None,
+    page_index=None,
+) -> BuildStats:
+    """
+    Walk a content directory tree and generate an HTML file for every .md file,
+    preserving the directory structure under dest_dir, as set by options
+    (a BuildOptions).
+
+    A failing page does not abort the build: all other pages are still
+    generated and a BuildError listing every failure is raised at the end.
+
+    Optional parts of the build:
+        manifest       skip unchanged pages, re-template pages whose template
+                       alone changed, and remove outputs of deleted pages
+        only           build only these content-relative paths; the other
+                       pages keep their manifest entry without being read
+        profiler       render in-process through profiler.render_page
+        block_cache    reuse the HTML of blocks rendered by earlier builds
+        assets         reference static files by their fingerprinted names
+        minify_report  minify written pages and record their sizes
+        images         give images their size and lazy loading attributes
+        page_index     keep every page's title and front matter indexed,
+                       reading front matter only for missing or outdated rows
+
+    Example:
+        content/blog/x/index.md -> docs/blog/x/index.html
+    """
+    if options is None:
+        options = BuildOptions()
+    jobs = options.jobs
+    stream_threshold = options.stream_threshold
+    drafts = options.drafts
+    in_flight = options.in_flight
+    shard = options.shard
+    stats = BuildStats()
+
+    minify = minify_report is not None
+    template = load_template(template_path, basepath, assets, images)
+    if manifest is not None:
+        assets_digest = None if assets is None else assets.digest
+        manifest.begin(
+            hash_file(template_path),
+            basepath,
+            assets_digest,
+            minify,
+            None if images is None else images.sizes,
+            drafts,
+            output_dir=dest_dir_path,
+        )
+    indexed = {} if page_index is None else page_index.source_hashes()
+    # (rel_path, from_path, source_hash) of pages not rendered by this build
+    # whose index row is missing or outdated; source_hash is None for pages
+    # outside `only`, which are not hashed.
+    unindexed = []
+
+    tasks = []
+    rel_paths = []
+    for from_path, dest_path in find_pages(dir_path_content, dest_dir_path):
+        rel_path = os.path.relpath(from_path, dir_path_content)
+        if shard is not None and shard_of(rel_path, shard[1]) != shard[0]:
+            continue
+        rel_paths.append(rel_path)
+        if only is not None and rel_path not in only:
+            if manifest is not None and manifest.has_previous_page(rel_path):
+                manifest.keep_page(rel_path)
+            if page_index is not None and rel_path not in indexed:
+                unindexed.append((rel_path, from_path, None))
+            continue
+
+        size = os.path.getsize(from_path)
+        if manifest is None and page_index is None:
+            tasks.append(PageTask(rel_path, from_path, dest_path, None, size))
+            continue
+
+        source_hash = hash_file(from_path)
+        if manifest is None:
+            tasks.append(PageTask(rel_path, from_path, dest_path, source_hash, size))
+            continue
+
+        status = manifest.page_status(rel_path, source_hash, dest_path)
+        if status != PAGE_REBUILD and page_index is not None:
+            if indexed.get(rel_path) != source_hash:
+                unindexed.append((rel_path, from_path, source_hash))
+        if status == PAGE_SKIP:
+            manifest.keep_page(rel_path)
+            stats.record(status)
+        elif status == PAGE_RETEMPLATE:
+            title = manifest.previous_title(rel_path)
+            content_html = manifest.load_fragment(source_hash)
+            html = apply_template(template, title, content_html)
+            sizes = write_page(dest_path, html, minify)
+            if sizes is not None:
+                minify_report.record(rel_path, *sizes)
+            manifest.keep_page(rel_path)
+            stats.record(status)
+        else:
+            fragment_path = manifest.fragment_path(source_hash)
+            tasks.append(PageTask(rel_path, from_path, dest_path, source_hash, size, fragment_path))
+
+    if profiler is None and in_flight > 0 and resolve_jobs(jobs) == 1:
+        render = functools.partial(
+            render_pipelined,
+            template=template,
+            block_cache=block_cache,
+            minify=minify,
+            drafts=drafts,
+            # A copy opens a connection of its own on first use.
+            stream_block_cache=copy.copy(block_cache),
+        )
+        results, failures = run_pipelined(render, tasks, in_flight, stream_threshold)
+    else:
+        if profiler is not None:
+            render = functools.partial(
+                profiler.render_page, template=template, minify=minify, drafts=drafts
+            )
+            jobs = 1
+        else:
+            render = functools.partial(
+                render_page,
+                template=template,
+                stream_threshold=stream_threshold,
+                block_cache=block_cache,
+                minify=minify,
+                drafts=drafts,
+            )
+        results, failures = run_page_tasks(render, tasks, jobs)
+
+    index_rows = []
+    for task in tasks:
+        if task.rel_path not in results:
+            continue
+        page = results[task.rel_path]
+        index_rows.append((task.rel_path, task.source_hash, page.title, page.meta))
+        if not page.written:
+            # A draft left out of the build is remembered without an output,
+            # so it is skipped until its source or the drafts setting changes.
+            stats.record(PAGE_SKIP)
+            if manifest is not None:
+                manifest.store_page(task.rel_path, task.source_hash, None, page.title, draft=True)
+            continue
+        stats.record(PAGE_REBUILD)
+        if page.minify_sizes is not None:
+            minify_report.record(task.rel_path, *page.minify_sizes)
+        if manifest is not None:
+            manifest.store_page(
+                task.rel_path,
+                task.source_hash,
+                task.dest_path,
+                page.title,
+                links=page.links,
+                images=page.images,
+                draft=bool(page.meta.get("draft")),
+            )
+
+    if page_index is not None:
+        for rel_path, from_path, source_hash in unindexed:
+            try:
+                title, meta = read_page_meta(from_path)
+            except Exception as e:
+                failures.append((from_path, f"{type(e).__name__}: {e}"))
+                continue
+            index_rows.append((rel_path, source_hash or hash_file(from_path), title, meta))
+        page_index.store(index_rows)
+        page_index.retain(rel_paths)
 
+    if manifest is not None:
+        for stale_path in manifest.stale_outputs():
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+                stats.removed += 1
+                remove_empty_dirs(dest_dir_path, stale_path)
+        manifest.save()
 
+    if failures:
+        raise BuildError(failures)
+    return stats
@@ -0,0 +1,271 @@
+import threading
+from array import array
+
+from leafnode import LeafNode
+from parentnode import ParentNode
+
+# Event opcodes. Each event takes its operands from EventBuffer.args:
+#   OPEN  tag_id, props       - start of an element with children
+#   CLOSE tag_id              - end of the innermost open element
+#   TEXT  text                - untagged text (a LeafNode without a tag)
+#   LEAF  tag_id, props, text - a whole element holding only text (a LeafNode)
+OPEN = 0
+CLOSE = 1
+TEXT = 2
+LEAF = 3
+
+_ARG_COUNTS = (2, 1, 1, 3)
+
+# Interned tags: the id of a tag indexes its name and its prebuilt "<tag>"
+# and "</tag>" strings. Tags are only ever added, so ids stay valid.
+_TAG_IDS = {}
+_TAGS = []
+_OPEN_TAGS = []
+_CLOSE_TAGS = []
+_intern_lock = threading.Lock()
+
+
+def intern_tag(tag: str) -> int:
+    """
+    The small integer id of a tag name, the same for the whole process.
+    """
+    tag_id = _TAG_IDS.get(tag)
+    if tag_id is None:
+        with _intern_lock:
+            tag_id = _TAG_IDS.get(tag)
+            if tag_id is None:
+                tag_id = len(_TAGS)
+                _TAGS.append(tag)
+                _OPEN_TAGS.append(f"<{tag}>")
+                _CLOSE_TAGS.append(f"</{tag}>")
+                _TAG_IDS[tag] = tag_id
+    return tag_id
+
+
+def _props_to_html(props) -> str:
+    # Same attributes as HTMLNode.props_to_html.
+    return "".join([f' {key}="{value}"' for key, value in props.items()])
+
+
+class EventBuffer:
+    """
+    A document as a flat buffer of events instead of a tree of HTMLNodes.
+
+    Every element is an OPEN ... CLOSE pair around its children, every piece
+    of text a TEXT event, and an element holding only text (what a LeafNode
+    with a tag renders) a single LEAF event. Opcodes are kept in a byte array
+    and their operands in one flat list, and tags are interned, so a page
+    costs two appends per event rather than a node object, a children list
+    and a props dict per block and inline span. to_html renders the buffer
+    in one linear pass, with no recursion.
+
+    node_to_events and events_to_node convert from and to HTMLNode trees;
+    both render to the same HTML.
+    """
+
+    __slots__ = ("ops", "args")
+
+    def __init__(self):
+        self.ops = array("B")
+        self.args = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    # Elements are appended by tag id (see intern_tag), so hot code interns
+    # its tags once up front.
+
+    def open(self, tag_id: int, props: dict = None) -> None:
+        self.ops.append(OPEN)
+        self.args += (tag_id, props)
+
+    def close(self, tag_id: int) -> None:
+        self.ops.append(CLOSE)
+        self.args.append(tag_id)
+
+    def text(self, text: str) -> None:
+        self.ops.append(TEXT)
+        self.args.append(text)
+
+    def leaf(self, tag_id: int, text: str, props: dict = None) -> None:
+        self.ops.append(LEAF)
+        self.args += (tag_id, props, text)
+
+    def extend(self, other: "EventBuffer") -> None:
+        self.ops.extend(other.ops)
+        self.args.extend(other.args)
+
+    def clear(self) -> None:
+        del self.ops[:]
+        self.args.clear()
+
+    def events(self):
+        """
+        Yield each event as (opcode, tag, props, text), with None for the
+        fields the opcode does not have.
+        """
+        i = 0
+        for op in self.ops:
+            if op == OPEN:
+                yield op, _TAGS[self.args[i]], self.args[i + 1], None
+            elif op == CLOSE:
+                yield op, _TAGS[self.args[i]], None, None
+            elif op == TEXT:
+                yield op, None, None, self.args[i]
+            else:
+                yield op, _TAGS[self.args[i]], self.args[i + 1], self.args[i + 2]
+            i += _ARG_COUNTS[op]
+
+    def _render(self, start: int, end: int, i: int, out: list) -> int:
+        # Append the HTML of events start..end (operands from i) to out and
+        # return the operand index after them.
+        ops = self.ops
+        args = self.args
+        open_tags = _OPEN_TAGS
+        close_tags = _CLOSE_TAGS
+        for n in range(start, end):
+            op = ops[n]
+            if op == TEXT:
+                out.append(args[i])
+                i += 1
+            elif op == LEAF:
+                tag_id, props, text = args[i], args[i + 1], args[i + 2]
+                if props:
+                    out.append(f"<{_TAGS[tag_id]}{_props_to_html(props)}>")
+                else:
+                    out.append(open_tags[tag_id])
+                out.append(text)
+                out.append(close_tags[tag_id])
+                i += 3
+            elif op == OPEN:
+                tag_id, props = args[i], args[i + 1]
+                if props:
+                    out.append(f"<{_TAGS[tag_id]}{_props_to_html(props)}>")
+                else:
+                    out.append(open_tags[tag_id])
+                i += 2
+            else:
+                out.append(close_tags[args[i]])
+                i += 1
+        return i
+
+    def _html(self, start: int, end: int, i: int) -> str:
+        out = []
+        self._render(start, end, i, out)
+        return "".join(out)
+
+    def to_html(self) -> str:
+        return self._html(0, len(self.ops), 0)
+
+    def iter_html(self):
+        """
+        Yield the HTML in chunks like ParentNode.iter_html: for a buffer
+        holding one element, its opening tag, then each child's complete
+        HTML, then its closing tag; otherwise one chunk per top-level element.
+        """
+        ops = self.ops
+        if ops and ops[0] == OPEN and self._root_end() == len(ops) - 1:
+            yield self._html(0, 1, 0)
+            yield from self._iter_elements(1, len(ops) - 1, _ARG_COUNTS[OPEN])
+            yield _CLOSE_TAGS[self.args[-1]]
+        else:
+            yield from self._iter_elements(0, len(ops), 0)
+
+    def _iter_elements(self, start: int, end: int, i: int):
+        # The HTML of each top-level element (or text) among events start..end.
+        ops = self.ops
+        depth = 0
+        first, first_arg = start, i
+        for n in range(start, end):
+            op = ops[n]
+            if op == OPEN:
+                depth += 1
+            elif op == CLOSE:
+                depth -= 1
+            i += _ARG_COUNTS[op]
+            if depth == 0:
+                yield self._html(first, n + 1, first_arg)
+                first, first_arg = n + 1, i
+
+    def _root_end(self) -> int:
+        # Index of the event closing the element opened by event 0.
+        depth = 0
+        for n, op in enumerate(self.ops):
+            if op == OPEN:
+                depth += 1
+            elif op == CLOSE:
+                depth -= 1
+                if depth == 0:
+                    return n
+        return -1
+
+    def write_to(self, fp) -> int:
+        """
+        Stream the HTML into a text file object, chunk by chunk. Returns the
+        number of characters written.
+        """
+        written = 0
+        for chunk in self.iter_html():
+            fp.write(chunk)
+            written += len(chunk)
+        return written
+
+    def __repr__(self):
+        return f"EventBuffer({len(self.ops)} events)"
+
+
+def node_to_events(node, events: EventBuffer = None) -> EventBuffer:
+    """
+    Append the events of an HTMLNode tree to events (a new EventBuffer by
+    default) and return the buffer. Raises ValueError for the same invalid
+    nodes as to_html.
+    """
+    if events is None:
+        events = EventBuffer()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            # A marker pushed below an element's children: its closing tag.
+            events.close(intern_tag(node))
+        elif node.children is None:
+            if node.value is None:
+                raise ValueError("LeafNode must have a value")
+            if node.tag is None:
+                events.text(node.value)
+            else:
+                events.leaf(intern_tag(node.tag), node.value, node.props)
+        else:
+            if node.tag is None:
+                raise ValueError("ParentNode must have a tag")
+            events.open(intern_tag(node.tag), node.props)
+            stack.append(node.tag)
+            stack.extend(reversed(node.children))
+    return events
+
+
+def events_to_node(events: EventBuffer):
+    """
+    Rebuild the HTMLNode tree of an EventBuffer holding a single element
+    (as node_to_events produces from a tree).
+    """
+    roots = []
+    stack = [roots]
+    for op, tag, props, text in events.events():
+        if op == TEXT:
+            stack[-1].append(LeafNode(None, text))
+        elif op == LEAF:
+            stack[-1].append(LeafNode(tag, text, props))
+        elif op == OPEN:
+            node = ParentNode(tag, [], props)
+            stack[-1].append(node)
+            stack.append(node.children)
+        else:
+            if len(stack) == 1:
+                raise ValueError(f"Unbalanced events: </{tag}> closes nothing")
+            stack.pop()
+    if len(stack) != 1:
+        raise ValueError("Unbalanced events: element left open")
+    if len(roots) != 1:
+        raise ValueError(f"Expected a single root element, got {len(roots)}")
+    return roots[0]
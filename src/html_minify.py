@@ -0,0 +1,219 @@
+import json
+import os
+import re
+
+MINIFY_REPORT_FILENAME = "minify.json"
+
+# Whitespace next to these tags never renders, so it is dropped rather than
+# collapsed to a single space.
+BLOCK_TAGS = frozenset(
+    """
+    !doctype html head body title meta link base script style noscript
+    article section nav aside header footer main div p h1 h2 h3 h4 h5 h6
+    ul ol li dl dt dd blockquote pre hr table thead tbody tfoot tr th td
+    figure figcaption form fieldset
+    """.split()
+)
+
+# Content of these elements is copied byte for byte.
+RAW_TAGS = frozenset(("pre", "code", "textarea", "script", "style"))
+
+_TAG_RE = re.compile(r"<(/?)([A-Za-z][\w:-]*|![A-Za-z]+)[^>]*>")
+_WHITESPACE_RE = re.compile(r"\s+")
+_RAW_END_RES = {tag: re.compile(rf"</{tag}[\s>]", re.IGNORECASE) for tag in RAW_TAGS}
+
+
+class HtmlMinifier:
+    """
+    Incremental HTML minifier: feed() it the page in chunks of any size and
+    write out what it returns, then whatever close() returns.
+
+    - comments are removed (conditional comments, "<!--[if ...", are kept)
+    - whitespace next to block-level tags is removed, and any other run of
+      whitespace between or inside text is collapsed to a single space
+    - the content of pre, code, textarea, script and style elements, and the
+      tags themselves, are copied unchanged
+
+    bytes_in and bytes_out count the UTF-8 size of the input and the output.
+
+    Example:
+        minify_html("<ul>\\n  <li>a  b</li>\\n</ul>") -> "<ul><li>a b</li></ul>"
+    """
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._buffer = ""
+        self._raw = None
+        self._pending_space = False
+        # True at the start of the document and right after a block-level tag,
+        # where leading whitespace is dropped.
+        self._after_block = True
+
+    def feed(self, chunk: str) -> str:
+        self.bytes_in += len(chunk.encode("utf-8"))
+        self._buffer += chunk
+        return self._emit(self._process(final=False))
+
+    def close(self) -> str:
+        return self._emit(self._process(final=True))
+
+    def _emit(self, parts: list[str]) -> str:
+        out = "".join(parts)
+        self.bytes_out += len(out.encode("utf-8"))
+        return out
+
+    def _process(self, final: bool) -> list[str]:
+        buf = self._buffer
+        end = len(buf)
+        pos = 0
+        out = []
+        while pos < end:
+            if self._raw is not None:
+                m = _RAW_END_RES[self._raw].search(buf, pos)
+                if m is None:
+                    # Hold back enough for a closing tag split across chunks.
+                    keep = 0 if final else len(self._raw) + 2
+                    stop = max(pos, end - keep)
+                    out.append(buf[pos:stop])
+                    pos = stop
+                    break
+                out.append(buf[pos : m.start()])
+                pos = m.start()
+                self._raw = None
+                continue
+
+            if buf.startswith("<!--", pos):
+                close = buf.find("-->", pos + 4)
+                if close < 0:
+                    if not final:
+                        break
+                    close = end - 3
+                if buf.startswith("<!--[if", pos):
+                    out.append(self._inline(buf[pos : close + 3]))
+                pos = close + 3
+                continue
+
+            m = _TAG_RE.match(buf, pos)
+            if m is not None:
+                name = m[2].lower()
+                if self._pending_space and not self._after_block and name not in BLOCK_TAGS:
+                    out.append(" ")
+                self._pending_space = False
+                self._after_block = name in BLOCK_TAGS
+                out.append(m[0])
+                if not m[1] and name in RAW_TAGS and not m[0].endswith("/>"):
+                    self._raw = name
+                pos = m.end()
+                continue
+
+            if buf.startswith("<", pos) and not final and buf.find(">", pos) < 0:
+                # Possibly a tag that continues in the next chunk.
+                break
+
+            stop = buf.find("<", pos + 1)
+            if stop < 0:
+                stop = end
+            out.append(self._text(buf[pos:stop]))
+            pos = stop
+
+        self._buffer = buf[pos:]
+        return out
+
+    def _text(self, text: str) -> str:
+        text = _WHITESPACE_RE.sub(" ", text)
+        if text.startswith(" "):
+            self._pending_space = True
+            text = text[1:]
+        if not text:
+            return ""
+        trailing = text.endswith(" ")
+        if trailing:
+            text = text[:-1]
+        text = self._inline(text)
+        self._pending_space = trailing
+        return text
+
+    def _inline(self, text: str) -> str:
+        if self._pending_space and not self._after_block:
+            text = " " + text
+        self._pending_space = False
+        self._after_block = False
+        return text
+
+
+def minify_html(html: str) -> str:
+    minifier = HtmlMinifier()
+    return minifier.feed(html) + minifier.close()
+
+
+class MinifiedWriter:
+    """
+    Text file wrapper that minifies everything written through it. close()
+    flushes the minifier (the wrapped file is left open).
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.minifier = HtmlMinifier()
+
+    def write(self, chunk: str) -> int:
+        self.fp.write(self.minifier.feed(chunk))
+        return len(chunk)
+
+    def close(self) -> tuple[int, int]:
+        """
+        Returns:
+            (bytes_in, bytes_out) for everything written.
+        """
+        self.fp.write(self.minifier.close())
+        return self.minifier.bytes_in, self.minifier.bytes_out
+
+
+class MinifyReport:
+    """
+    Bytes saved by minification, per page, for one build.
+    """
+
+    def __init__(self):
+        self.pages = {}
+
+    def record(self, path: str, bytes_in: int, bytes_out: int) -> None:
+        self.pages[path] = (bytes_in, bytes_out)
+
+    @property
+    def bytes_in(self) -> int:
+        return sum(sizes[0] for sizes in self.pages.values())
+
+    @property
+    def bytes_out(self) -> int:
+        return sum(sizes[1] for sizes in self.pages.values())
+
+    def report(self) -> dict:
+        return {
+            "pages": len(self.pages),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "per_page": {
+                path: {"bytes_in": bytes_in, "bytes_out": bytes_out, "saved": bytes_in - bytes_out}
+                for path, (bytes_in, bytes_out) in sorted(self.pages.items())
+            },
+        }
+
+    def summary(self, largest: int = 5) -> str:
+        bytes_in = self.bytes_in
+        saved = bytes_in - self.bytes_out
+        share = saved / bytes_in * 100 if bytes_in else 0.0
+        lines = [f"minify: {len(self.pages)} pages, {saved} bytes saved ({share:.1f}%)"]
+        ranked = sorted(self.pages.items(), key=lambda item: item[1][1] - item[1][0])
+        for path, (bytes_in, bytes_out) in ranked[:largest]:
+            lines.append(f"  {bytes_in - bytes_out:>10} bytes  {path}")
+        return "\n".join(lines)
+
+    def save(self, report_path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def __repr__(self):
+        return f"MinifyReport({len(self.pages)} pages, {self.bytes_in - self.bytes_out} saved)"
@@ -1,13 +1,47 @@
 class HTMLNode:
+    """
+    Base class of the HTML node tree.
+
+    Nodes are slotted so that large documents stay compact: the base only
+    stores tag and props, LeafNode adds value and ParentNode adds children.
+    The other field reads as None through the class defaults below.
+    Instantiating HTMLNode directly gives a node with all four fields.
+    """
+
+    __slots__ = ("tag", "props")
+
+    value = None
+    children = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls is HTMLNode:
+            cls = _GenericHTMLNode
+        return super().__new__(cls)
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
-        self.value = value
-        self.children = children
         self.props = props
 
     def to_html(self):
         raise NotImplementedError
 
+    def iter_html(self):
+        """
+        Yield the node's HTML in chunks; "".join(node.iter_html()) == node.to_html().
+        """
+        yield self.to_html()
+
+    def write_to(self, fp) -> int:
+        """
+        Stream the node's HTML into a text file object without building the whole
+        document string. Returns the number of characters written.
+        """
+        written = 0
+        for chunk in self.iter_html():
+            fp.write(chunk)
+            written += len(chunk)
+        return written
+
     def props_to_html(self):
         if not self.props:
             return ""
@@ -19,3 +53,12 @@ class HTMLNode:
             f"children={self.children}, props={self.props})"
         )
 
+
+class _GenericHTMLNode(HTMLNode):
+    __slots__ = ("value", "children")
+
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
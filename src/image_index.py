@@ -0,0 +1,179 @@
+import json
+import os
+import struct
+
+from build_manifest import hash_text
+
+IMAGE_INDEX_FILENAME = "images.json"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+LAZY_LOADING = ' loading="lazy"'
+
+# Enough for the PNG, GIF and WebP headers; JPEG is read segment by segment.
+_HEADER_BYTES = 32
+
+# JPEG start-of-frame markers (SOF0-SOF15 without DHT, JPG and DAC), which
+# carry the image size.
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(f) -> tuple[int, int]:
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            # Fill byte: the real marker follows.
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack(">H", length_bytes)
+        if code in _JPEG_SOF_MARKERS:
+            segment = f.read(5)
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack(">HH", segment[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(path: str) -> tuple[int, int]:
+    """
+    Read the pixel size of a PNG, JPEG, GIF or WebP file from its header,
+    without decoding the image.
+
+    Returns:
+        (width, height), or None if the file is not a recognised image.
+    """
+    with open(path, "rb") as f:
+        head = f.read(_HEADER_BYTES)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"\xff\xd8"):
+            return _jpeg_size(f)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            chunk = head[12:16]
+            if chunk == b"VP8L" and len(head) >= 25:
+                (bits,) = struct.unpack("<I", head[21:25])
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if len(head) < 30:
+                return None
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8X":
+                width = int.from_bytes(head[24:27], "little") + 1
+                height = int.from_bytes(head[27:30], "little") + 1
+                return width, height
+    return None
+
+
+class ImageIndex:
+    """
+    Pixel sizes of the images under static/, by root-relative URL.
+
+    props() gives the extra attributes of an <img>: width and height when the
+    image is known (so the browser can reserve its space before it loads), and
+    lazy loading with asynchronous decoding. digest identifies all the sizes;
+    sizes_key identifies those of a few images, so caches of rendered HTML
+    only go stale when an image they show changes.
+    """
+
+    def __init__(self, sizes: dict[str, tuple[int, int]]):
+        self.sizes = sizes
+        self.digest = hash_text(json.dumps(sizes, sort_keys=True))
+
+    def props(self, url: str) -> dict[str, str]:
+        size = self.sizes.get(url)
+        if size is None:
+            return {"loading": "lazy", "decoding": "async"}
+        width, height = size
+        return {
+            "width": str(width),
+            "height": str(height),
+            "loading": "lazy",
+            "decoding": "async",
+        }
+
+    def sizes_key(self, urls: list[str]) -> str:
+        return json.dumps([[url, self.sizes.get(url)] for url in urls])
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __repr__(self):
+        return f"ImageIndex({len(self.sizes)} images, {self.digest[:12]})"
+
+
+def _load_state(state_path: str) -> dict:
+    if state_path is None:
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_image_index(static_dir: str, state_path: str = None) -> ImageIndex:
+    """
+    Read the size of every image under static_dir. With state_path, sizes are
+    remembered by (mtime, size) so unchanged images are not opened again.
+    """
+    previous = _load_state(state_path)
+    state = {}
+    sizes = {}
+    for dirpath, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(path, static_dir)
+            st = os.stat(path)
+            stamp = [st.st_mtime_ns, st.st_size]
+            entry = previous.get(rel_path)
+            if entry is not None and entry[:2] == stamp:
+                size = entry[2]
+            else:
+                try:
+                    size = read_image_size(path)
+                except (OSError, struct.error):
+                    size = None
+            state[rel_path] = stamp + [None if size is None else list(size)]
+            if size is not None:
+                sizes["/" + rel_path.replace(os.sep, "/")] = tuple(size)
+
+    if state_path is not None and state != previous:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, state_path)
+    return ImageIndex(dict(sorted(sizes.items())))
+
+
+def eager_first_image(chunks):
+    """
+    Pass HTML chunks through, removing lazy loading from the first <img>: the
+    first image is usually above the fold, where lazy loading only delays it.
+    An <img> tag must not be split across chunks (rendered nodes never are).
+    """
+    chunks = iter(chunks)
+    for chunk in chunks:
+        start = chunk.find("<img ")
+        if start < 0:
+            yield chunk
+            continue
+        end = chunk.find(">", start)
+        tag = chunk[start:end].replace(LAZY_LOADING, "", 1)
+        yield chunk[:start] + tag + chunk[end:]
+        yield from chunks
+        return
@@ -3,8 +3,9 @@ from textnode import TextNode, TextType
 import re
 
 
-def _text_type_value(text_type) -> str:
-    return text_type.value if hasattr(text_type, "value") else text_type
+# TextNode normalises its type to a TextType member, so plain-text checks are
+# identity comparisons.
+_PLAIN_TYPES = (TextType.TEXT, TextType.PLAIN)
 
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
@@ -20,8 +21,7 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 
     new_nodes = []
     for node in old_nodes:
-        node_type = _text_type_value(node.text_type)
-        if node_type not in (TextType.TEXT.value, TextType.PLAIN.value):
+        if node.text_type not in _PLAIN_TYPES:
             new_nodes.append(node)
             continue
 
@@ -73,8 +73,7 @@ def split_nodes_image(old_nodes):
     """
     new_nodes = []
     for node in old_nodes:
-        node_type = _text_type_value(node.text_type)
-        if node_type not in (TextType.TEXT.value, TextType.PLAIN.value):
+        if node.text_type not in _PLAIN_TYPES:
             new_nodes.append(node)
             continue
 
@@ -108,8 +107,7 @@ def split_nodes_link(old_nodes):
     """
     new_nodes = []
     for node in old_nodes:
-        node_type = _text_type_value(node.text_type)
-        if node_type not in (TextType.TEXT.value, TextType.PLAIN.value):
+        if node.text_type not in _PLAIN_TYPES:
             new_nodes.append(node)
             continue
 
@@ -137,10 +135,10 @@ def split_nodes_link(old_nodes):
     return new_nodes
 
 
-def text_to_textnodes(text: str) -> list[TextNode]:
+def _text_to_textnodes_multipass(text: str) -> list[TextNode]:
     """
-    Convert a raw markdown-ish string into a list of TextNodes by applying all
-    splitting functions in sequence.
+    Reference implementation of text_to_textnodes: apply every splitting
+    function in sequence, rebuilding the node list after each pass.
     """
     nodes = [TextNode(text, TextType.TEXT)]
     nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
@@ -150,3 +148,101 @@ def text_to_textnodes(text: str) -> list[TextNode]:
     nodes = split_nodes_link(nodes)
     return nodes
 
+
+# The delimiters, in the order the multipass reference splits on them.
+_DELIMITER_RE = re.compile(r"\*\*|[_`]")
+# re.split on these yields text, label, url, text, label, url, ..., text.
+_IMAGE_SPLIT_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_LINK_SPLIT_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+# Looking a member up on an Enum class costs more than building the node, so
+# the hot paths use these.
+_TEXT = TextType.TEXT
+_LINK = TextType.LINK
+_IMAGE = TextType.IMAGE
+_BOLD = TextType.BOLD
+_ITALIC = TextType.ITALIC
+_CODE = TextType.CODE
+
+
+def _append_links(nodes: list, text: str) -> None:
+    if "[" not in text:
+        if text:
+            nodes.append(TextNode(text, _TEXT))
+        return
+    parts = _LINK_SPLIT_RE.split(text)
+    append = nodes.append
+    for before, label, url in zip(parts[0::3], parts[1::3], parts[2::3]):
+        if before:
+            append(TextNode(before, _TEXT))
+        append(TextNode(label, _LINK, url))
+    if parts[-1]:
+        append(TextNode(parts[-1], _TEXT))
+
+
+def _append_plain(nodes: list, text: str) -> None:
+    # Split the images, then the links, out of text lying between delimiters,
+    # where the multipass reference looks for them; each is one re.split.
+    if "![" not in text:
+        _append_links(nodes, text)
+        return
+    parts = _IMAGE_SPLIT_RE.split(text)
+    for i in range(0, len(parts) - 1, 3):
+        _append_links(nodes, parts[i])
+        nodes.append(TextNode(parts[i + 1], _IMAGE, parts[i + 2]))
+    _append_links(nodes, parts[-1])
+
+
+def text_to_textnodes(text: str) -> list[TextNode]:
+    """
+    Convert a raw markdown-ish string into a list of TextNodes in a single
+    left-to-right scan.
+
+    The result is identical to running split_nodes_delimiter for "**", "_" and
+    "`", then split_nodes_image and split_nodes_link (see
+    _text_to_textnodes_multipass): bold wins over italic, italic over code, and
+    images/links are only recognised in the plain text between delimiters,
+    which is split once it is known to be plain. Input with an unclosed or
+    interleaved delimiter is handed to the multipass implementation so the
+    same result (or exception) comes out.
+    """
+    if "*" not in text and "_" not in text and "`" not in text and "[" not in text:
+        # Fast path: no inline markup at all.
+        return [TextNode(text, _TEXT)] if text != "" else []
+
+    nodes = []
+    start = 0
+    for match in _DELIMITER_RE.finditer(text):
+        token_start, pos = match.span()
+        if token_start < start:
+            # Inside the span of the previous delimiter pair.
+            continue
+        delimiter = match.group()
+        if delimiter == "**":
+            close = text.find("**", pos)
+            if close == -1:
+                return _text_to_textnodes_multipass(text)
+            text_type = _BOLD
+        elif delimiter == "_":
+            close = text.find("_", pos)
+            if close == -1 or text.find("**", pos, close) != -1:
+                return _text_to_textnodes_multipass(text)
+            text_type = _ITALIC
+        else:
+            close = text.find("`", pos)
+            if (
+                close == -1
+                or text.find("_", pos, close) != -1
+                or text.find("**", pos, close) != -1
+            ):
+                return _text_to_textnodes_multipass(text)
+            text_type = _CODE
+        if token_start > start:
+            _append_plain(nodes, text[start:token_start])
+        if close > pos:
+            nodes.append(TextNode(text[pos:close], text_type))
+        start = close + len(delimiter)
+
+    if start < len(text):
+        _append_plain(nodes, text[start:])
+    return nodes
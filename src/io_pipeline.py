@@ -0,0 +1,164 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from output_tree import write_if_changed
+
+# Pages read, being rendered or waiting to be written at the same time.
+DEFAULT_IN_FLIGHT = 16
+
+
+class PipelineStats:
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.peak_in_flight = 0
+
+    def __repr__(self):
+        return (
+            f"PipelineStats(read={self.read}, written={self.written}, "
+            f"peak_in_flight={self.peak_in_flight})"
+        )
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write(outputs: list[tuple[str, str]]) -> None:
+    # Outputs whose bytes are unchanged are left untouched.
+    for path, text in outputs:
+        write_if_changed(path, text)
+
+
+async def _run(render, tasks, in_flight, read_limit, io_threads, stats):
+    loop = asyncio.get_running_loop()
+    results = {}
+    failures = []
+    slots = asyncio.Semaphore(in_flight)
+    # Both queues hold at most in_flight pages, since a page holds its slot
+    # from the start of its read until its outputs are written.
+    rendering = asyncio.Queue(maxsize=in_flight)
+    writing = asyncio.Queue(maxsize=in_flight)
+    held = 0
+
+    def release():
+        nonlocal held
+        held -= 1
+        slots.release()
+
+    def fail(task, e):
+        failures.append((task.from_path, f"{type(e).__name__}: {e}"))
+        release()
+
+    # Sources too large to read whole are streamed by render on a thread of
+    # their own, one at a time, so they do not hold up the event loop.
+    with ThreadPoolExecutor(max_workers=io_threads) as pool, ThreadPoolExecutor(
+        max_workers=1
+    ) as streamer:
+
+        async def read_one(task):
+            source = None
+            try:
+                if read_limit is None or task.size < read_limit:
+                    source = await loop.run_in_executor(pool, _read, task.from_path)
+                    stats.read += 1
+            except Exception as e:
+                fail(task, e)
+                source = e
+            await rendering.put((task, source))
+
+        async def read_all():
+            nonlocal held
+            readers = []
+            for task in tasks:
+                await slots.acquire()
+                held += 1
+                stats.peak_in_flight = max(stats.peak_in_flight, held)
+                readers.append(asyncio.create_task(read_one(task)))
+            await asyncio.gather(*readers)
+
+        async def stream_one(task):
+            try:
+                result, outputs = await loop.run_in_executor(streamer, render, task, None)
+            except Exception as e:
+                fail(task, e)
+                return
+            await writing.put((task, result, outputs))
+
+        async def render_all():
+            # Rendering is CPU work and runs on the event loop thread, one page
+            # at a time; the I/O threads keep reading and writing meanwhile.
+            streams = []
+            for _ in tasks:
+                task, source = await rendering.get()
+                if isinstance(source, Exception):
+                    continue
+                if source is None:
+                    streams.append(asyncio.create_task(stream_one(task)))
+                    continue
+                try:
+                    result, outputs = render(task, source)
+                except Exception as e:
+                    fail(task, e)
+                    continue
+                await writing.put((task, result, outputs))
+                # Let finished reads and writes hand over before the next page.
+                await asyncio.sleep(0)
+            await asyncio.gather(*streams)
+            await writing.put(None)
+
+        async def write_one(task, result, outputs):
+            try:
+                await loop.run_in_executor(pool, _write, outputs)
+            except Exception as e:
+                fail(task, e)
+                return
+            stats.written += len(outputs)
+            results[task.rel_path] = result
+            release()
+
+        async def write_all():
+            writers = []
+            while (item := await writing.get()) is not None:
+                writers.append(asyncio.create_task(write_one(*item)))
+            await asyncio.gather(*writers)
+
+        await asyncio.gather(read_all(), render_all(), write_all())
+    return results, failures
+
+
+def run_pipelined(
+    render,
+    tasks,
+    in_flight: int = DEFAULT_IN_FLIGHT,
+    read_limit: int = None,
+    io_threads: int = None,
+    stats: PipelineStats = None,
+):
+    """
+    Build pages in an asyncio pipeline that overlaps reading sources, rendering
+    and writing outputs: while one page is rendered, the next sources are read
+    and finished pages are written by a pool of I/O threads.
+
+    render(task, source) is called on the event loop thread with the task's
+    source bytes and returns (result, outputs), outputs being the (path, text)
+    pairs to write. Sources of read_limit bytes or more are not read: render
+    gets None for them and has to read (or stream) the file itself, which it
+    does on a separate thread, one such page at a time, while the loop goes
+    on with the others. At most in_flight pages are held in memory between
+    the start of their read and the end of their write.
+
+    A failing read, render or write does not stop the build.
+
+    Returns:
+        (results, failures) like parallel_build.run_page_tasks: results maps
+        rel_path -> render's result, failures is a list of (from_path, message).
+    """
+    if in_flight < 1:
+        raise ValueError(f"in_flight must be at least 1, got {in_flight}")
+    if io_threads is None:
+        io_threads = min(in_flight, 8)
+    if stats is None:
+        stats = PipelineStats()
+    return asyncio.run(_run(render, tasks, in_flight, read_limit, io_threads, stats))
@@ -0,0 +1,175 @@
+import datetime
+import email.utils
+import html
+import os
+
+from generate_page import apply_template
+from html_minify import minify_html
+from output_tree import write_if_changed
+from parallel_build import BuildError
+
+# Newest pages a feed carries.
+FEED_ITEMS = 20
+
+
+class ListingStats:
+    def __init__(self):
+        self.listings = 0
+        self.feeds = 0
+        self.written = 0
+        self.removed = 0
+        self.skipped_feeds = []
+
+    def summary(self) -> str:
+        summary = (
+            f"{self.listings} listing pages, {self.feeds} feeds: {self.written} written, "
+            f"{self.removed} stale feeds removed"
+        )
+        if self.skipped_feeds:
+            summary += f", {len(self.skipped_feeds)} feeds skipped without a site URL"
+        return summary
+
+    def __repr__(self):
+        return (
+            f"ListingStats(listings={self.listings}, feeds={self.feeds}, "
+            f"written={self.written}, removed={self.removed})"
+        )
+
+
+def _site_path(basepath: str, url: str) -> str:
+    return basepath.rstrip("/") + url
+
+
+def listing_html(pages, basepath: str) -> str:
+    """
+    The list appended to a listing page: one item per IndexedPage, linking to
+    the page, with its date when it has one.
+    """
+    items = []
+    for page in pages:
+        item = f'<li><a href="{html.escape(_site_path(basepath, page.url))}">'
+        item += f"{html.escape(page.title)}</a>"
+        if page.date:
+            item += f' <time datetime="{page.date}">{page.date[:10]}</time>'
+        items.append(item + "</li>")
+    return '<ul class="page-list">' + "".join(items) + "</ul>"
+
+
+def _rfc822(date: str) -> str:
+    moment = datetime.datetime.fromisoformat(date)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return email.utils.format_datetime(moment)
+
+
+def feed_xml(title: str, link: str, pages, site_url: str, basepath: str) -> str:
+    """
+    An RSS 2.0 feed of the newest FEED_ITEMS pages. RSS links must be
+    absolute, so they are prefixed with site_url (e.g. "https://example.com").
+    """
+    root = site_url.rstrip("/")
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0">',
+        "<channel>",
+        f"<title>{html.escape(title)}</title>",
+        f"<link>{html.escape(root + link)}</link>",
+        f"<description>{html.escape(title)}</description>",
+    ]
+    for page in pages[:FEED_ITEMS]:
+        url = html.escape(root + _site_path(basepath, page.url))
+        lines.append("<item>")
+        lines.append(f"<title>{html.escape(page.title)}</title>")
+        lines.append(f"<link>{url}</link>")
+        lines.append(f"<guid>{url}</guid>")
+        if page.date:
+            lines.append(f"<pubDate>{_rfc822(page.date)}</pubDate>")
+        for tag in page.tags:
+            lines.append(f"<category>{html.escape(tag)}</category>")
+        lines.append("</item>")
+    lines += ["</channel>", "</rss>", ""]
+    return "\n".join(lines)
+
+
+def generate_listings(
+    page_index,
+    manifest,
+    template,
+    site_url: str = "",
+    drafts: bool = False,
+    minify: bool = False,
+) -> ListingStats:
+    """
+    Fill in the listing pages and write their feeds, from the PageIndex alone.
+
+    A page with "list: <dir>" front matter gets, after its own content, a list
+    of the pages under content/<dir> (the whole site for "list: /"), newest
+    first; with "feed: <name>" an RSS feed of them is also written next to it.
+    The listing page's content comes from the manifest's fragment cache and
+    the listed pages' titles and dates from the index, so no markdown source
+    is read. Files are only rewritten when their content changed, and feeds no
+    listing produces any more are removed. Feeds are recorded relative to the
+    manifest's output directory, and the URLs a listing links to in the
+    manifest (see BuildManifest.store_listed), so link checks cover them.
+
+    Without a site_url feeds are not written (feed links have to be absolute);
+    their paths are collected in stats.skipped_feeds instead. A feed name
+    that would put the feed outside the output directory fails the listing
+    page, and a BuildError naming every such page is raised at the end.
+    """
+    stats = ListingStats()
+    outputs = set()
+    failures = []
+    output_dir = os.path.abspath(manifest.output_dir)
+    for listing in page_index.listing_pages(drafts):
+        entry = manifest.pages.get(listing.rel_path)
+        if entry is None or entry.get("dest_path") is None:
+            continue
+        stats.listings += 1
+        pages = [
+            page
+            for page in page_index.pages_under(listing.list, drafts)
+            if page.rel_path != listing.rel_path
+        ]
+        manifest.store_listed(listing.rel_path, [page.url for page in pages])
+        content_html = manifest.load_fragment(entry["source_hash"])
+        items = listing_html(pages, template.basepath)
+        if content_html.endswith("</div>"):
+            content_html = content_html[: -len("</div>")] + items + "</div>"
+        else:
+            content_html += items
+        page_html = apply_template(template, entry["title"], content_html)
+        if minify:
+            page_html = minify_html(page_html)
+        dest_path = manifest.output_path(listing.rel_path)
+        if write_if_changed(dest_path, page_html):
+            stats.written += 1
+
+        if listing.feed:
+            feed_path = os.path.abspath(os.path.join(os.path.dirname(dest_path), listing.feed))
+            if feed_path == output_dir or os.path.commonpath([feed_path, output_dir]) != (
+                output_dir
+            ):
+                failures.append(
+                    (listing.rel_path, f"feed {listing.feed!r} is outside the output directory")
+                )
+                continue
+            if not site_url:
+                stats.skipped_feeds.append(os.path.relpath(feed_path, manifest.output_dir))
+                continue
+            stats.feeds += 1
+            link = _site_path(template.basepath, listing.url)
+            xml = feed_xml(listing.title, link, pages, site_url, template.basepath)
+            if write_if_changed(feed_path, xml):
+                stats.written += 1
+            outputs.add(os.path.relpath(feed_path, manifest.output_dir))
+
+    for stale in page_index.outputs() - outputs:
+        stale_path = os.path.join(manifest.output_dir, stale)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            stats.removed += 1
+    page_index.set_outputs(sorted(outputs))
+    if failures:
+        raise BuildError(failures)
+    return stats
@@ -1,56 +1,522 @@
+import argparse
 import os
 import shutil
 import sys
 
-from generate_page import generate_pages_recursive
+from asset_fingerprint import (
+    FINGERPRINT_STATE_FILENAME,
+    fingerprint_assets,
+    remove_asset_files,
+    write_asset_files,
+)
+from asset_sync import ASSET_STATE_FILENAME, sync_directory
+from block_cache import BLOCK_CACHE_FILENAME, DEFAULT_BLOCK_CACHE_BYTES, BlockCache
+from build_manifest import BuildManifest
+from build_profile import CPROFILE_FILENAME, PROFILE_REPORT_FILENAME, BuildProfiler
+from generate_page import (
+    DEFAULT_STREAM_THRESHOLD,
+    BuildOptions,
+    find_pages,
+    generate_pages_recursive,
+)
+from html_minify import MINIFY_REPORT_FILENAME, MinifyReport
+from image_index import IMAGE_INDEX_FILENAME, build_image_index
+from io_pipeline import DEFAULT_IN_FLIGHT
+from listings import generate_listings
+from page_graph import PAGE_GRAPH_FILENAME, PageGraph, format_broken_refs, static_urls
+from output_tree import CHANGES_FILENAME, StagedOutput
+from page_index import PAGE_INDEX_FILENAME, PageIndex
+from parallel_build import BuildError
+from precompress import (
+    DEFAULT_MIN_BYTES,
+    PRECOMPRESS_STATE_FILENAME,
+    precompress_directory,
+    remove_precompressed,
+)
+from serve import DEFAULT_CACHE_BYTES, DEFAULT_PORT, serve
+from sharding import (
+    SHARD_INFO_FILENAME,
+    SHARDS_DIRNAME,
+    ShardMergeError,
+    merge_shards,
+    parse_shard,
+    shard_dir,
+    write_shard_info,
+)
+from template_engine import load_template
+from watch import DEFAULT_DEBOUNCE, watch
 
 
-def _copy_directory_recursive(src_dir: str, dest_dir: str) -> None:
-    """
-    Recursively copy all contents of src_dir into an existing dest_dir.
-    """
-    for entry in os.listdir(src_dir):
-        src_path = os.path.join(src_dir, entry)
-        dest_path = os.path.join(dest_dir, entry)
+def _shard(value: str) -> tuple[int, int]:
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
 
-        if os.path.isfile(src_path):
-            shutil.copy(src_path, dest_path)
-            print(f"copied file: {src_path} -> {dest_path}")
-            continue
 
-        if os.path.isdir(src_path):
-            os.mkdir(dest_path)
-            print(f"created dir: {dest_path}")
-            _copy_directory_recursive(src_path, dest_path)
-            continue
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the static site.")
+    parser.add_argument(
+        "basepath", nargs="?", default="/", help="URL prefix the site is served under"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="ignore the build manifest and block cache, wipe docs/ and rebuild every page",
+    )
+    parser.add_argument(
+        "--hash-assets",
+        action="store_true",
+        help="compare static files by content hash when their mtime differs",
+    )
+    parser.add_argument(
+        "--link-assets",
+        action="store_true",
+        help="hardlink static files into docs/ instead of copying them",
+    )
+    parser.add_argument(
+        "--fingerprint-assets",
+        action="store_true",
+        help="also write static files under content-hashed names, reference those from "
+        "pages, and emit asset-manifest.json and a _headers file marking them immutable",
+    )
+    parser.add_argument(
+        "--no-image-sizes",
+        dest="image_sizes",
+        action="store_false",
+        help="do not add width/height and lazy-loading attributes to images",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="minify generated pages (keeping pre/code content intact) and report the bytes "
+        f"saved per page in .build-cache/{MINIFY_REPORT_FILENAME}",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write a .gz sibling of every generated HTML file and CSS/SVG/JS asset",
+    )
+    parser.add_argument(
+        "--precompress-min-bytes",
+        type=int,
+        default=DEFAULT_MIN_BYTES,
+        metavar="BYTES",
+        help="leave files smaller than BYTES uncompressed",
+    )
+    parser.add_argument(
+        "--drafts",
+        action="store_true",
+        help='also build pages marked "draft: true" in their front matter',
+    )
+    parser.add_argument(
+        "--site-url",
+        default="",
+        metavar="URL",
+        help="absolute site URL (e.g. https://example.com) used for links in RSS feeds; "
+        "feeds are not written without it",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="fail the build when a page links to a missing page or references a missing "
+        "static file",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="render pages in N worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--async-io",
+        action="store_true",
+        help="with a single job, overlap reading sources, rendering and writing pages in an "
+        "asyncio pipeline",
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        default=DEFAULT_IN_FLIGHT,
+        metavar="N",
+        help="with --async-io, hold at most N pages in memory between read and write",
+    )
+    parser.add_argument(
+        "--stream-threshold",
+        type=int,
+        default=DEFAULT_STREAM_THRESHOLD,
+        metavar="BYTES",
+        help="render markdown files of at least BYTES block by block from disk",
+    )
+    parser.add_argument(
+        "--block-cache-bytes",
+        type=int,
+        default=DEFAULT_BLOCK_CACHE_BYTES,
+        metavar="BYTES",
+        help="size of the on-disk cache of rendered blocks (0 disables it)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every build stage per page and print a summary (combine with --force "
+        "to profile all pages)",
+    )
+    parser.add_argument(
+        "--profile-report",
+        metavar="PATH",
+        help=f"where --profile writes its JSON report (default: .build-cache/"
+        f"{PROFILE_REPORT_FILENAME})",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help=f"with --profile, also run cProfile and save its stats as {CPROFILE_FILENAME}",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="with --profile, record each page's peak memory with tracemalloc",
+    )
+    parser.add_argument(
+        "--shard",
+        type=_shard,
+        metavar="I/N",
+        help="build only shard I of N of the pages (partitioned by a stable hash of their "
+        "paths) into the shard's own directory, for merging with --merge-shards",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        type=int,
+        metavar="N",
+        help="combine the outputs and manifests of shards 1..N into docs/, checking that "
+        "every page was built exactly once, then finish the build",
+    )
+    parser.add_argument(
+        "--shards-dir",
+        metavar="DIR",
+        help=f"where shard builds are kept (default: {SHARDS_DIRNAME}/ in the project root)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after building, watch content/, static/ and template.html and rebuild on change",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        metavar="SECONDS",
+        help="quiet period that ends a burst of changes in --watch mode",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve the site, rendering pages on request instead of building docs/",
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port for --serve")
+    parser.add_argument(
+        "--project-root",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        metavar="DIR",
+        help="directory holding content/, static/ and template.html (default: the repository)",
+    )
+    parser.add_argument(
+        "--cache-bytes",
+        type=int,
+        default=DEFAULT_CACHE_BYTES,
+        metavar="BYTES",
+        help="size of the rendered-page LRU cache for --serve",
+    )
+    args = parser.parse_args(argv)
+    if args.shard is not None and (args.watch or args.serve or args.merge_shards):
+        parser.error("--shard cannot be combined with --watch, --serve or --merge-shards")
+    return args
 
-        raise Exception(f"Unsupported file type: {src_path}")
 
+def main(argv: list[str] = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    basepath = args.basepath
 
-def copy_directory_recursive(src_dir: str, dest_dir: str) -> None:
-    """
-    Delete the destination directory (if it exists), recreate it, and recursively
-    copy all contents of src_dir into it.
-    """
-    if os.path.exists(dest_dir):
-        shutil.rmtree(dest_dir)
-    os.mkdir(dest_dir)
-    _copy_directory_recursive(src_dir, dest_dir)
-
-
-def main():
-    basepath = "/"
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
-
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    project_root = os.path.abspath(args.project_root)
     static_dir = os.path.join(project_root, "static")
     docs_dir = os.path.join(project_root, "docs")
-    copy_directory_recursive(static_dir, docs_dir)
-
+    cache_dir = os.path.join(project_root, ".build-cache")
     template_path = os.path.join(project_root, "template.html")
     content_dir = os.path.join(project_root, "content")
-    generate_pages_recursive(content_dir, template_path, docs_dir, basepath)
+    shards_root = os.path.abspath(args.shards_dir or os.path.join(project_root, SHARDS_DIRNAME))
+    if args.shard is not None:
+        # A shard builds its pages into a directory of its own; static files,
+        # listings, link checks and compression are left to the merge.
+        shard_root = shard_dir(shards_root, *args.shard)
+        docs_dir = os.path.join(shard_root, "docs")
+        cache_dir = os.path.join(shard_root, "cache")
+
+    if args.serve:
+        serve(
+            content_dir,
+            static_dir,
+            template_path,
+            basepath,
+            port=args.port,
+            cache_bytes=args.cache_bytes,
+        )
+        return
+
+    manifest = BuildManifest(cache_dir)
+    if not args.force:
+        manifest.load()
+
+    page_index = PageIndex(os.path.join(cache_dir, PAGE_INDEX_FILENAME))
+
+    # Builds go into a staging copy of docs/ that replaces it once complete;
+    # out_dir is where the current build writes. Shards have no live tree.
+    output = None
+    if args.shard is None:
+        state_paths = [
+            manifest.path,
+            os.path.join(cache_dir, ASSET_STATE_FILENAME),
+            os.path.join(cache_dir, PRECOMPRESS_STATE_FILENAME),
+        ]
+        output = StagedOutput(docs_dir, state_paths)
+    out_dir = docs_dir
+    live_feeds = set()
+
+    def stage(fresh: bool = False) -> None:
+        nonlocal out_dir, live_feeds
+        if output is not None:
+            out_dir = output.begin(fresh)
+            live_feeds = page_index.outputs()
+        elif fresh and os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+
+    def abort() -> None:
+        # Drop the staged build and go back to the manifest and feed list
+        # of the live tree. Index rows and cached blocks describe sources,
+        # not outputs, and stay valid.
+        if output is None or not output.staged:
+            return
+        output.abort()
+        manifest.load()
+        page_index.set_outputs(sorted(live_feeds))
+
+    def publish() -> None:
+        if output is None:
+            return
+        changes = output.commit()
+        changes.save(os.path.join(cache_dir, CHANGES_FILENAME))
+        print(changes.summary())
+
+    block_cache = None
+    if args.block_cache_bytes > 0:
+        block_cache = BlockCache(
+            os.path.join(cache_dir, BLOCK_CACHE_FILENAME), args.block_cache_bytes
+        )
+        if args.force:
+            block_cache.clear()
+
+    assets = None
+    images = None
+
+    def sync_assets() -> tuple[bool, set[str]]:
+        """
+        Copy static/ into the output directory.
+
+        Returns:
+            (renamed, resized): whether fingerprinted asset URLs changed, which
+            means every page has to be rebuilt, and the URLs of images whose
+            size changed since the previous call.
+        """
+        nonlocal assets, images
+        previous = assets
+        previous_images = images
+        resized = set()
+        if args.image_sizes:
+            images = build_image_index(static_dir, os.path.join(cache_dir, IMAGE_INDEX_FILENAME))
+            if previous_images is not None:
+                old, new = previous_images.sizes, images.sizes
+                resized = {url for url in old.keys() | new.keys() if old.get(url) != new.get(url)}
+        if args.fingerprint_assets:
+            assets = fingerprint_assets(
+                static_dir, os.path.join(cache_dir, FINGERPRINT_STATE_FILENAME)
+            )
+        if args.shard is not None:
+            return False, resized
+        asset_stats = sync_directory(
+            static_dir,
+            out_dir,
+            state_path=os.path.join(cache_dir, ASSET_STATE_FILENAME),
+            check_hash=args.hash_assets,
+            link=args.link_assets,
+            extra_names=None if assets is None else assets.files,
+        )
+        print(asset_stats.summary())
+        if assets is None:
+            remove_asset_files(out_dir, static_dir)
+            return False, resized
+        write_asset_files(out_dir, assets)
+        return previous is None or previous.digest != assets.digest, resized
+
+    options = BuildOptions(
+        jobs=args.jobs,
+        stream_threshold=args.stream_threshold,
+        drafts=args.drafts,
+        in_flight=args.in_flight if args.async_io else 0,
+        shard=args.shard,
+    )
+
+    def build_pages(only=None):
+        profiler = None
+        if args.profile:
+            profiler = BuildProfiler(cprofile=args.cprofile, trace_memory=args.trace_memory)
+        minify_report = MinifyReport() if args.minify else None
+        if block_cache is not None:
+            block_cache.begin()
+        try:
+            stats = generate_pages_recursive(
+                content_dir,
+                template_path,
+                out_dir,
+                basepath,
+                manifest,
+                options,
+                only=only,
+                profiler=profiler,
+                block_cache=block_cache,
+                assets=assets,
+                minify_report=minify_report,
+                images=images,
+                page_index=page_index,
+            )
+            print(stats.summary())
+            if args.shard is not None:
+                return
+            listing_stats = generate_listings(
+                page_index,
+                manifest,
+                load_template(template_path, basepath, assets, images),
+                site_url=args.site_url,
+                drafts=args.drafts,
+                minify=args.minify,
+            )
+            print(listing_stats.summary())
+            for feed in listing_stats.skipped_feeds:
+                print(f"warning: {feed} not written, RSS needs --site-url", file=sys.stderr)
+        finally:
+            if minify_report is not None:
+                minify_report.save(os.path.join(cache_dir, MINIFY_REPORT_FILENAME))
+                print(minify_report.summary())
+            if block_cache is not None:
+                print(block_cache.finish().summary())
+            if profiler is not None:
+                report_path = args.profile_report or os.path.join(
+                    cache_dir, PROFILE_REPORT_FILENAME
+                )
+                profiler.save(report_path, os.path.join(cache_dir, CPROFILE_FILENAME))
+                print(profiler.summary())
+                print(f"profile report written to {report_path}")
+
+    graph = None
+
+    def check_links() -> bool:
+        """
+        Rebuild the page graph from the manifest, save it and report links and
+        images that point nowhere. Returns True when there are none.
+        """
+        nonlocal graph
+        graph = PageGraph.from_manifest(manifest)
+        graph.save(os.path.join(cache_dir, PAGE_GRAPH_FILENAME))
+        broken = graph.check(static_urls(static_dir))
+        if broken:
+            print(format_broken_refs(broken), file=sys.stderr)
+        return not broken
+
+    def precompress():
+        state_path = os.path.join(cache_dir, PRECOMPRESS_STATE_FILENAME)
+        if not args.precompress:
+            # Drop the .gz files of earlier builds, which would go stale.
+            precompress_stats = remove_precompressed(out_dir, state_path)
+            if precompress_stats.removed:
+                print(precompress_stats.summary())
+            return
+        precompress_stats = precompress_directory(
+            out_dir, state_path=state_path, min_bytes=args.precompress_min_bytes
+        )
+        print(precompress_stats.summary())
+
+    stage(fresh=args.force)
+    try:
+        if args.merge_shards:
+            rel_paths = {
+                os.path.relpath(from_path, content_dir)
+                for from_path, _ in find_pages(content_dir, docs_dir)
+            }
+            try:
+                merge_stats = merge_shards(
+                    shards_root, args.merge_shards, rel_paths, out_dir, manifest
+                )
+            except ShardMergeError as e:
+                print(e, file=sys.stderr)
+                sys.exit(1)
+            print(merge_stats.summary())
+
+        sync_assets()
+        try:
+            build_pages()
+        except BuildError as e:
+            print(e, file=sys.stderr)
+            if not args.watch:
+                sys.exit(1)
+        if args.shard is not None:
+            write_shard_info(
+                os.path.join(shard_root, SHARD_INFO_FILENAME), *args.shard, manifest
+            )
+            return
+        links_ok = check_links()
+        precompress()
+        publish()
+    except BaseException:
+        # Whatever stops the build (a failed page, an error, Ctrl-C), the live
+        # docs/ keeps the last complete build.
+        abort()
+        raise
+    if args.check_links and not links_ok and not args.watch:
+        sys.exit(1)
+
+    if args.watch:
+
+        def rebuild(changes):
+            stage()
+            try:
+                try:
+                    assets_renamed, resized = (
+                        sync_assets() if changes.assets else (False, set())
+                    )
+                    if changes.template or assets_renamed:
+                        # The manifest turns a template change into a re-template
+                        # of every page, and new asset fingerprints into a
+                        # rebuild of every page.
+                        build_pages()
+                    else:
+                        # Only the pages showing a resized image need its new size.
+                        pages = set(changes.pages)
+                        for url in resized:
+                            pages.update(graph.referrers(url))
+                        if pages:
+                            build_pages(only=pages)
+                    check_links()
+                    precompress()
+                except BuildError:
+                    # Pages that did build are published even when others failed.
+                    publish()
+                    raise
+                publish()
+            except BaseException:
+                abort()
+                raise
+
+        watch(content_dir, static_dir, template_path, rebuild, debounce=args.debounce)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,3 @@
-from block_markdown import markdown_to_html_node
+from block_markdown import iter_markdown_html, markdown_to_events, markdown_to_html_node
 
 
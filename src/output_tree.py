@@ -0,0 +1,319 @@
+import ctypes
+import ctypes.util
+import errno
+import filecmp
+import json
+import os
+import shutil
+import tempfile
+
+CHANGES_FILENAME = "changes.json"
+
+# renameat2() arguments (linux/fcntl.h, linux/fs.h).
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+# mkstemp creates files readable by the owner only; outputs get the mode
+# open() would have given them under the process umask.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_FILE_MODE = 0o666 & ~_UMASK
+
+
+def _temp_file(path: str) -> tuple[int, str]:
+    # A uniquely named temporary file next to path (creating its directory
+    # if needed), so concurrent writers of one path never share it.
+    directory = os.path.dirname(path) or os.curdir
+    prefix = os.path.basename(path) + "."
+    try:
+        return tempfile.mkstemp(suffix=".tmp", prefix=prefix, dir=directory)
+    except FileNotFoundError:
+        os.makedirs(directory, exist_ok=True)
+        return tempfile.mkstemp(suffix=".tmp", prefix=prefix, dir=directory)
+
+
+def _replace_with(tmp_path: str, path: str) -> None:
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_if_changed(path: str, data) -> bool:
+    """
+    Write text or bytes to path unless the file already holds exactly that,
+    so unchanged outputs keep their mtime. The new file replaces the old one
+    instead of overwriting it, which keeps hardlinked copies (see
+    StagedOutput) intact. Missing parent directories are created, and only
+    looked for when the file cannot be created without them.
+
+    Returns:
+        True if the file was written.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    fd, tmp_path = _temp_file(path)
+    try:
+        with open(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, _FILE_MODE)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _replace_with(tmp_path, path)
+    return True
+
+
+def replace_if_changed(tmp_path: str, path: str) -> bool:
+    """
+    Move a freshly written tmp_path over path, or drop it when path already
+    has the same bytes.
+
+    Returns:
+        True if path was replaced.
+    """
+    if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def copy_if_changed(src_path: str, dest_path: str) -> bool:
+    """
+    Copy src_path (with its mtime) to dest_path unless both hold the same bytes.
+
+    Returns:
+        True if dest_path was written.
+    """
+    if os.path.exists(dest_path) and filecmp.cmp(src_path, dest_path, shallow=False):
+        return False
+    fd, tmp_path = _temp_file(dest_path)
+    os.close(fd)
+    try:
+        shutil.copy2(src_path, tmp_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _replace_with(tmp_path, dest_path)
+    return True
+
+
+def remove_empty_dirs(root: str, path: str) -> None:
+    """
+    Remove the directories above path that are left empty, up to but not
+    including root.
+    """
+    root = os.path.abspath(root)
+    parent = os.path.dirname(os.path.abspath(path))
+    while parent != root and os.path.commonpath([parent, root]) == root:
+        if not os.path.isdir(parent) or os.listdir(parent):
+            return
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+
+class ChangeList:
+    """
+    Files a build added, modified and deleted in the output tree, as
+    slash-separated paths relative to it, for incremental deploys.
+    """
+
+    def __init__(self, added=(), modified=(), deleted=()):
+        self.added = sorted(added)
+        self.modified = sorted(modified)
+        self.deleted = sorted(deleted)
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.deleted)
+
+    def summary(self) -> str:
+        return (
+            f"output: {len(self.added)} added, {len(self.modified)} modified, "
+            f"{len(self.deleted)} deleted"
+        )
+
+    def save(self, path: str) -> None:
+        data = {"added": self.added, "modified": self.modified, "deleted": self.deleted}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def __repr__(self):
+        return (
+            f"ChangeList(added={len(self.added)}, modified={len(self.modified)}, "
+            f"deleted={len(self.deleted)})"
+        )
+
+
+def _files(root: str) -> dict[str, os.stat_result]:
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+            files[rel_path] = os.stat(path)
+    return files
+
+
+def _exchange(path_a: str, path_b: str) -> bool:
+    """
+    Swap two existing paths in one step with renameat2(RENAME_EXCHANGE).
+
+    Returns:
+        False, leaving both paths alone, where the C library or the
+        filesystem does not support it.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    renameat2.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_uint,
+    ]
+    result = renameat2(
+        _AT_FDCWD, os.fsencode(path_a), _AT_FDCWD, os.fsencode(path_b), _RENAME_EXCHANGE
+    )
+    if result == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error, f"renameat2 failed for {path_a} and {path_b}")
+
+
+def _link_or_copy(src_path: str, dest_path: str) -> None:
+    try:
+        os.link(src_path, dest_path)
+    except OSError:
+        shutil.copy2(src_path, dest_path)
+
+
+class StagedOutput:
+    """
+    Build into a staging copy of an output directory and swap it in when the
+    build is done, so a server pointed at the directory never sees a
+    half-built tree.
+
+    The staging tree starts as a hardlinked copy of the live one (no file
+    contents are copied), and every writer replaces files rather than
+    overwriting them, so the live tree is never modified through a shared
+    link. Files left alone keep their inode, which is how commit() tells the
+    untouched files from the rewritten ones without reading them; only
+    rewritten files of unchanged size have their bytes compared.
+
+    On Linux the swap is a single renameat2(RENAME_EXCHANGE), so the live
+    path always holds a complete tree. Elsewhere (or on filesystems without
+    it) the swap is near-atomic: two renames (live -> old, staging -> live)
+    with a moment in between where the live path is missing. Either way the
+    old tree is deleted afterwards.
+
+    state_paths are files describing what the output tree holds (the build
+    manifest, the asset and compression state). begin() keeps a copy of each
+    and abort() puts it back, so the build after a failed one compares
+    against the live tree rather than the staging tree that was thrown away.
+    """
+
+    def __init__(self, live_dir: str, state_paths=()):
+        self.live_dir = os.path.abspath(live_dir)
+        parent, name = os.path.split(self.live_dir)
+        self.staging_dir = os.path.join(parent, f".{name}.staging")
+        self.old_dir = os.path.join(parent, f".{name}.old")
+        self.state_paths = list(state_paths)
+        # Between begin() and the swap in commit() (or abort()).
+        self.staged = False
+
+    def begin(self, fresh: bool = False) -> str:
+        """
+        Create the staging tree, empty when fresh (or when there is no live
+        tree yet), and return its path.
+        """
+        for path in (self.staging_dir, self.old_dir):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        if fresh or not os.path.isdir(self.live_dir):
+            os.makedirs(self.staging_dir)
+        else:
+            shutil.copytree(self.live_dir, self.staging_dir, copy_function=_link_or_copy)
+        for path in self.state_paths:
+            if os.path.exists(path):
+                shutil.copy2(path, path + ".live")
+            elif os.path.exists(path + ".live"):
+                os.remove(path + ".live")
+        self.staged = True
+        return self.staging_dir
+
+    def changes(self) -> ChangeList:
+        """
+        Compare the staging tree with the live one.
+        """
+        live = _files(self.live_dir) if os.path.isdir(self.live_dir) else {}
+        staged = _files(self.staging_dir)
+        modified = []
+        for rel_path in staged.keys() & live.keys():
+            old, new = live[rel_path], staged[rel_path]
+            if (old.st_ino, old.st_dev) == (new.st_ino, new.st_dev):
+                continue
+            if old.st_size != new.st_size or not filecmp.cmp(
+                os.path.join(self.live_dir, rel_path),
+                os.path.join(self.staging_dir, rel_path),
+                shallow=False,
+            ):
+                modified.append(rel_path)
+        return ChangeList(staged.keys() - live.keys(), modified, live.keys() - staged.keys())
+
+    def commit(self) -> ChangeList:
+        """
+        Swap the staging tree in as the live tree.
+
+        Returns:
+            What changed in the live tree.
+        """
+        changes = self.changes()
+        if os.path.isdir(self.live_dir) and _exchange(self.staging_dir, self.live_dir):
+            self.staged = False
+            # The staging path now holds the old tree.
+            shutil.rmtree(self.staging_dir)
+        else:
+            if os.path.isdir(self.live_dir):
+                os.rename(self.live_dir, self.old_dir)
+            os.rename(self.staging_dir, self.live_dir)
+            self.staged = False
+            if os.path.exists(self.old_dir):
+                shutil.rmtree(self.old_dir)
+        for path in self.state_paths:
+            if os.path.exists(path + ".live"):
+                os.remove(path + ".live")
+        return changes
+
+    def abort(self) -> None:
+        """
+        Throw the staging tree away, leaving the live tree (and the state
+        files describing it) as it was. Does nothing once the staging tree
+        has been swapped in.
+        """
+        if not self.staged:
+            return
+        self.staged = False
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+        for path in self.state_paths:
+            if os.path.exists(path + ".live"):
+                os.replace(path + ".live", path)
+            elif os.path.exists(path):
+                os.remove(path)
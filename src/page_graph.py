@@ -0,0 +1,229 @@
+import json
+import os
+import posixpath
+import re
+import urllib.parse
+
+from block_markdown import block_inline_texts
+from inline_markdown import text_to_textnodes
+from textnode import TextType
+
+PAGE_GRAPH_FILENAME = "graph.json"
+
+LINK = "link"
+IMAGE = "image"
+
+# "https:", "mailto:", ... and protocol-relative "//host" URLs leave the site.
+_EXTERNAL_RE = re.compile(r"^(?:[A-Za-z][A-Za-z0-9+.-]*:|//)")
+
+
+class PageRefs:
+    """
+    Outbound link and image URLs of one page, exactly as written in its
+    markdown (before the basepath or asset fingerprints are applied).
+    """
+
+    def __init__(self):
+        self.links = []
+        self.images = []
+
+    def add_block(self, block) -> None:
+        """
+        Record the links and images of a Block (or block string).
+        """
+        text = block if isinstance(block, str) else block.text
+        # Links and images always contain "](", so most blocks are skipped
+        # without being parsed.
+        if "](" not in text:
+            return
+        for text in block_inline_texts(block):
+            for node in text_to_textnodes(text):
+                if node.text_type is TextType.LINK:
+                    self.links.append(node.url)
+                elif node.text_type is TextType.IMAGE:
+                    self.images.append(node.url)
+
+    def __repr__(self):
+        return f"PageRefs({len(self.links)} links, {len(self.images)} images)"
+
+
+def collect_refs(blocks, refs: PageRefs):
+    """
+    Pass markdown blocks through, recording the links and images of each.
+    """
+    for block in blocks:
+        refs.add_block(block)
+        yield block
+
+
+def page_url(rel_path: str) -> str:
+    """
+    The site URL (without basepath) of a content page.
+
+    Example:
+        page_url("blog/tom/index.md") -> "/blog/tom/"
+        page_url("about.md") -> "/about.html"
+    """
+    rel_path = rel_path.replace(os.sep, "/")
+    html_path = "/" + posixpath.splitext(rel_path)[0] + ".html"
+    if html_path.endswith("/index.html"):
+        return html_path[: -len("index.html")]
+    return html_path
+
+
+def _page_paths(rel_path: str) -> list[str]:
+    # Every normalised path a link to the page may take: "/blog/tom",
+    # "/blog/tom/index.html" (the root page is "/" and "/index.html").
+    url = page_url(rel_path)
+    if url.endswith("/"):
+        return [posixpath.normpath(url), url + "index.html"]
+    return [url, url[: -len(".html")]]
+
+
+class BrokenRef:
+    def __init__(self, rel_path: str, kind: str, url: str):
+        self.rel_path = rel_path
+        self.kind = kind
+        self.url = url
+
+    def __eq__(self, other):
+        return (self.rel_path, self.kind, self.url) == (other.rel_path, other.kind, other.url)
+
+    def __repr__(self):
+        return f"BrokenRef({self.rel_path}, {self.kind}, {self.url})"
+
+
+class PageGraph:
+    """
+    The pages of the site with the links and images each one references.
+
+    pages maps content-relative markdown paths to {"title", "links",
+    "images"} as recorded in the build manifest, links including those a
+    listing added to the page. URLs are resolved the way a browser would
+    resolve them on the page (relative ones against the page's own URL), and
+    external URLs and in-page anchors are ignored.
+
+    check() finds links and images pointing at neither a page nor a static
+    file, and referrers() answers which pages reference a URL; both are
+    dictionary lookups per reference.
+    """
+
+    def __init__(self, pages: dict[str, dict]):
+        self.pages = pages
+        self.paths = {}
+        for rel_path in pages:
+            for path in _page_paths(rel_path):
+                self.paths[path] = rel_path
+        self._referrers = None
+
+    @classmethod
+    def from_manifest(cls, manifest) -> "PageGraph":
+        return cls(
+            {
+                rel_path: {
+                    "title": entry.get("title"),
+                    "links": entry.get("links", []) + entry.get("listed", []),
+                    "images": entry.get("images", []),
+                }
+                for rel_path, entry in manifest.pages.items()
+                if entry.get("dest_path") is not None
+            }
+        )
+
+    @staticmethod
+    def resolve(url: str, rel_path: str) -> str:
+        """
+        Resolve a link or image URL found on the page rel_path into a
+        normalised site path, or None if it points off the site (or only at
+        an anchor on the same page).
+
+        Example:
+            PageGraph.resolve("../tom/#intro", "blog/majesty/index.md") -> "/blog/tom"
+        """
+        if not url or url.startswith("#") or _EXTERNAL_RE.match(url):
+            return None
+        path = urllib.parse.unquote(urllib.parse.urlsplit(url).path)
+        if not path:
+            return None
+        if not path.startswith("/"):
+            path = urllib.parse.urljoin(page_url(rel_path), path)
+        return posixpath.normpath(path)
+
+    def edges(self, rel_path: str):
+        """
+        Yield (kind, url, resolved path) for every internal reference of a page.
+        """
+        page = self.pages[rel_path]
+        for kind, urls in ((LINK, page["links"]), (IMAGE, page["images"])):
+            for url in urls:
+                path = self.resolve(url, rel_path)
+                if path is not None:
+                    yield kind, url, path
+
+    def referrers(self, url: str) -> list[str]:
+        """
+        The pages that link to or embed url (a root-relative site URL, such as
+        "/images/tolkien.png" or "/blog/tom/").
+        """
+        if self._referrers is None:
+            self._referrers = {}
+            for rel_path in self.pages:
+                for _, _, path in self.edges(rel_path):
+                    target = self.paths.get(path, path)
+                    self._referrers.setdefault(target, set()).add(rel_path)
+        path = posixpath.normpath(url)
+        return sorted(self._referrers.get(self.paths.get(path, path), ()))
+
+    def check(self, static_urls: set[str]) -> list[BrokenRef]:
+        """
+        Return every reference that resolves to neither a page nor one of
+        static_urls (root-relative URLs of the static files, e.g. "/index.css").
+        """
+        broken = []
+        for rel_path in sorted(self.pages):
+            for kind, url, path in self.edges(rel_path):
+                if path not in self.paths and path not in static_urls:
+                    broken.append(BrokenRef(rel_path, kind, url))
+        return broken
+
+    def save(self, path: str) -> None:
+        """
+        Write the graph as JSON: per page its URL, title, references, and the
+        pages referring to it.
+        """
+        data = {}
+        for rel_path, page in sorted(self.pages.items()):
+            url = page_url(rel_path)
+            data[rel_path] = {
+                "url": url,
+                "title": page["title"],
+                "links": page["links"],
+                "images": page["images"],
+                "referrers": self.referrers(url),
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def __repr__(self):
+        return f"PageGraph({len(self.pages)} pages)"
+
+
+def static_urls(static_dir: str) -> set[str]:
+    """
+    Root-relative URLs of every file under static_dir.
+    """
+    urls = set()
+    for dirpath, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            rel_path = os.path.relpath(os.path.join(dirpath, filename), static_dir)
+            urls.add("/" + rel_path.replace(os.sep, "/"))
+    return urls
+
+
+def format_broken_refs(broken: list[BrokenRef]) -> str:
+    lines = [f"{len(broken)} broken reference(s):"]
+    lines += [f"  {ref.rel_path}: {ref.kind} {ref.url}" for ref in broken]
+    return "\n".join(lines)
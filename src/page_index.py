@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+
+from page_graph import page_url
+
+PAGE_INDEX_FILENAME = "pages.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    rel_path TEXT PRIMARY KEY,
+    source_hash TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT,
+    tags TEXT NOT NULL,
+    draft INTEGER NOT NULL,
+    list TEXT,
+    feed TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_date ON pages (date);
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY
+);
+"""
+
+_COLUMNS = "rel_path, title, date, tags, draft, list, feed"
+
+
+class IndexedPage:
+    """
+    One row of the page index: a page's title and front matter metadata.
+    """
+
+    def __init__(self, rel_path, title, date, tags, draft, list_dir, feed):
+        self.rel_path = rel_path
+        self.title = title
+        self.date = date
+        self.tags = json.loads(tags)
+        self.draft = bool(draft)
+        self.list = list_dir
+        self.feed = feed
+
+    @property
+    def url(self) -> str:
+        return page_url(self.rel_path)
+
+    def __repr__(self):
+        return f"IndexedPage({self.rel_path}, {self.title!r}, {self.date})"
+
+
+class PageIndex:
+    """
+    Persistent index of every page's title and front matter (date, tags,
+    draft, list, feed), in an SQLite database under the build cache.
+
+    Rows are written for the pages a build renders and kept, keyed by source
+    hash, for the pages it skips, so listing pages and feeds are generated
+    from the index alone: an unchanged post is never read again to list it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def store(self, pages: list[tuple[str, str, str, dict]]) -> None:
+        """
+        Insert or replace (rel_path, source_hash, title, meta) rows, meta being
+        the page's parsed front matter.
+        """
+        rows = [
+            (
+                rel_path,
+                source_hash,
+                title,
+                meta.get("date"),
+                json.dumps(meta.get("tags", [])),
+                int(meta.get("draft", False)),
+                meta.get("list"),
+                meta.get("feed"),
+            )
+            for rel_path, source_hash, title, meta in pages
+        ]
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def source_hashes(self) -> dict[str, str]:
+        conn = self._connect()
+        return dict(conn.execute("SELECT rel_path, source_hash FROM pages"))
+
+    def retain(self, rel_paths) -> int:
+        """
+        Delete the rows of pages not in rel_paths. Returns how many were deleted.
+        """
+        conn = self._connect()
+        stale = set(self.source_hashes()) - set(rel_paths)
+        with conn:
+            conn.executemany("DELETE FROM pages WHERE rel_path = ?", [(p,) for p in stale])
+        return len(stale)
+
+    def _select(self, where: str, params: tuple) -> list[IndexedPage]:
+        conn = self._connect()
+        query = (
+            f"SELECT {_COLUMNS} FROM pages WHERE {where} "
+            "ORDER BY date IS NULL, date DESC, title, rel_path"
+        )
+        return [IndexedPage(*row) for row in conn.execute(query, params)]
+
+    def listing_pages(self, include_drafts: bool = False) -> list[IndexedPage]:
+        """
+        Pages whose front matter asks for a listing of a content directory.
+        """
+        return self._select("list IS NOT NULL AND (draft = 0 OR ?)", (include_drafts,))
+
+    def pages_under(self, directory: str, include_drafts: bool = False) -> list[IndexedPage]:
+        """
+        Pages inside a content directory ("" for the whole site), newest first;
+        undated pages come last, by title.
+        """
+        prefix = directory.replace("/", os.sep) + os.sep if directory else ""
+        return self._select(
+            "substr(rel_path, 1, ?) = ? AND (draft = 0 OR ?)",
+            (len(prefix), prefix, include_drafts),
+        )
+
+    def outputs(self) -> set[str]:
+        """
+        Files written from the index by the previous build (feeds), relative to
+        the output directory, so they can be removed once nothing produces them.
+        """
+        conn = self._connect()
+        return {path for (path,) in conn.execute("SELECT path FROM outputs")}
+
+    def set_outputs(self, paths) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM outputs")
+            conn.executemany("INSERT INTO outputs VALUES (?)", [(path,) for path in paths])
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
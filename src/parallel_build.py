@@ -0,0 +1,146 @@
+import contextlib
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Each worker gets about this many chunks, so the pool can even out pages of
+# very different sizes without paying one IPC round trip per page.
+CHUNKS_PER_JOB = 4
+
+
+class PageTask:
+    def __init__(
+        self,
+        rel_path: str,
+        from_path: str,
+        dest_path: str,
+        source_hash: str,
+        size: int,
+        fragment_path: str = None,
+    ):
+        self.rel_path = rel_path
+        self.from_path = from_path
+        self.dest_path = dest_path
+        self.source_hash = source_hash
+        self.size = size
+        self.fragment_path = fragment_path
+
+    def __repr__(self):
+        return f"PageTask({self.rel_path}, {self.size})"
+
+
+class BuildError(Exception):
+    """
+    Raised after a build in which one or more pages failed to render.
+
+    failures is a list of (from_path, message) tuples sorted by path.
+    """
+
+    def __init__(self, failures: list[tuple[str, str]]):
+        self.failures = sorted(failures)
+        lines = [f"{len(self.failures)} page(s) failed to build:"]
+        lines += [f"  {path}: {message}" for path, message in self.failures]
+        super().__init__("\n".join(lines))
+
+
+def resolve_jobs(jobs: int) -> int:
+    """
+    Turn a --jobs value into a worker count; 0 (or less) means one per CPU.
+    """
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def _run_page(render, from_path: str, dest_path: str, fragment_path: str):
+    try:
+        return True, render(from_path, dest_path, fragment_path)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def _run_chunk(render, chunk: list[tuple[str, str, str, str]]):
+    # In a worker: what each page prints is captured and sent back with its
+    # result, so the parent can print it in page order.
+    results = []
+    for rel_path, from_path, dest_path, fragment_path in chunk:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            ok, payload = _run_page(render, from_path, dest_path, fragment_path)
+        results.append((rel_path, ok, payload, output.getvalue()))
+    return results
+
+
+def _payload(task: PageTask) -> tuple[str, str, str, str]:
+    return task.rel_path, task.from_path, task.dest_path, task.fragment_path
+
+
+def chunk_tasks(tasks: list[PageTask], jobs: int) -> list[list[PageTask]]:
+    """
+    Order tasks largest source first and cut them into contiguous chunks, so the
+    expensive pages start early and the small ones fill in at the end.
+    """
+    ordered = sorted(tasks, key=lambda task: (-task.size, task.rel_path))
+    chunk_size = max(1, len(ordered) // (jobs * CHUNKS_PER_JOB))
+    return [ordered[i : i + chunk_size] for i in range(0, len(ordered), chunk_size)]
+
+
+def run_page_tasks(render, tasks: list[PageTask], jobs: int = 1):
+    """
+    Call render(from_path, dest_path, fragment_path) for every task, in-process
+    when jobs is 1 and over a process pool otherwise. render must be picklable
+    (a module-level function or a functools.partial of one).
+
+    A failing page does not stop the build; every failure is collected.
+    Whatever the pages print comes out in task order, also from the pool.
+
+    Returns:
+        (results, failures) where results maps rel_path -> render's return value
+        and failures is a list of (from_path, message) tuples.
+    """
+    by_rel_path = {task.rel_path: task for task in tasks}
+    results = {}
+    failures = []
+
+    def collect(rel_path, ok, payload):
+        if ok:
+            results[rel_path] = payload
+        else:
+            failures.append((by_rel_path[rel_path].from_path, payload))
+
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            ok, payload = _run_page(render, task.from_path, task.dest_path, task.fragment_path)
+            collect(task.rel_path, ok, payload)
+        return results, failures
+
+    # Output of pages that finished ahead of an earlier page in task order.
+    pending = {}
+    next_index = 0
+
+    def flush():
+        nonlocal next_index
+        while next_index < len(tasks) and tasks[next_index].rel_path in pending:
+            sys.stdout.write(pending.pop(tasks[next_index].rel_path))
+            next_index += 1
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for chunk in chunk_tasks(tasks, jobs):
+            payload = [_payload(task) for task in chunk]
+            futures[pool.submit(_run_chunk, render, payload)] = chunk
+
+        for future in as_completed(futures):
+            try:
+                for rel_path, ok, payload, output in future.result():
+                    collect(rel_path, ok, payload)
+                    pending[rel_path] = output
+            except Exception as e:
+                for task in futures[future]:
+                    failures.append((task.from_path, f"{type(e).__name__}: {e}"))
+                    pending[task.rel_path] = ""
+            flush()
+
+    return results, failures
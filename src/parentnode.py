@@ -2,16 +2,32 @@ from htmlnode import HTMLNode
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ("children",)
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag=tag, value=None, children=children, props=props)
+        self.tag = tag
+        self.children = children
+        self.props = props
 
-    def to_html(self):
+    def _validate(self):
         if self.tag is None:
             raise ValueError("ParentNode must have a tag")
 
         if self.children is None:
             raise ValueError("ParentNode must have children")
 
+    def to_html(self):
+        self._validate()
         children_html = "".join([child.to_html() for child in self.children])
         return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
 
+    def iter_html(self):
+        """
+        Yield the opening tag, then each child's complete HTML, then the closing
+        tag. For the document <div> every chunk is one rendered block.
+        """
+        self._validate()
+        yield f"<{self.tag}{self.props_to_html()}>"
+        for child in self.children:
+            yield child.to_html()
+        yield f"</{self.tag}>"
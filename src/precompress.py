@@ -0,0 +1,196 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+PRECOMPRESS_STATE_FILENAME = "precompressed.json"
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".svg", ".js")
+GZIP_SUFFIX = ".gz"
+
+# Below this size the gzip header and framing eat most of the saving, so such
+# files are served as they are.
+DEFAULT_MIN_BYTES = 1024
+DEFAULT_COMPRESS_THREADS = 8
+COMPRESS_LEVEL = 9
+
+
+class PrecompressStats:
+    def __init__(self):
+        self.compressed = 0
+        self.skipped = 0
+        self.too_small = 0
+        self.removed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def summary(self) -> str:
+        saved = self.bytes_in - self.bytes_out
+        return (
+            f"precompress: {self.compressed} compressed ({saved // 1024} KiB saved), "
+            f"{self.skipped} up to date, {self.too_small} not worth it, "
+            f"{self.removed} stale removed"
+        )
+
+    def __repr__(self):
+        return (
+            f"PrecompressStats(compressed={self.compressed}, skipped={self.skipped}, "
+            f"too_small={self.too_small}, removed={self.removed})"
+        )
+
+
+def _is_up_to_date(path: str, st: os.stat_result) -> bool:
+    try:
+        gz_stat = os.stat(path + GZIP_SUFFIX)
+    except FileNotFoundError:
+        return False
+    return gz_stat.st_mtime_ns == st.st_mtime_ns
+
+
+def _compress_file(path: str, st: os.stat_result) -> int:
+    """
+    Write path.gz next to path, stamped with the source mtime so the next run
+    can tell it is current.
+
+    Returns:
+        The compressed size, or -1 if compression did not make the file smaller
+        (no .gz is left behind in that case).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    # mtime=0 keeps the output byte-identical across builds. zlib releases the
+    # GIL while compressing, so threads run in parallel.
+    compressed = gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+    gz_path = path + GZIP_SUFFIX
+    if len(compressed) >= len(data):
+        if os.path.exists(gz_path):
+            os.remove(gz_path)
+        return -1
+    tmp_path = gz_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(compressed)
+    os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(tmp_path, gz_path)
+    return len(compressed)
+
+
+def _load_state(state_path: str) -> tuple[list[str], dict[str, list[int]]]:
+    if state_path is None:
+        return [], {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return [], {}
+    return data.get("compressed", []), data.get("incompressible", {})
+
+
+def _save_state(
+    state_path: str, compressed: list[str], incompressible: dict[str, list[int]]
+) -> None:
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"compressed": compressed, "incompressible": incompressible},
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    os.replace(tmp_path, state_path)
+
+
+def _stamp(st: os.stat_result) -> list[int]:
+    return [st.st_size, st.st_mtime_ns]
+
+
+def precompress_directory(
+    root: str,
+    state_path: str = None,
+    min_bytes: int = DEFAULT_MIN_BYTES,
+    threads: int = DEFAULT_COMPRESS_THREADS,
+) -> PrecompressStats:
+    """
+    Write a gzip sibling (index.html -> index.html.gz) for every HTML, CSS, SVG
+    and JS file under root that is at least min_bytes large, for servers that
+    serve precompressed files directly.
+
+    A .gz carries its source's mtime and is only rewritten when the source
+    changes. state_path records which .gz files the last run produced, so
+    those whose source was deleted (or shrank below min_bytes) are removed,
+    and the size and mtime of files gzip did not make smaller, so they are
+    not compressed again until they change.
+    """
+    stats = PrecompressStats()
+    candidates = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, filename)
+            st = os.stat(path)
+            if st.st_size < min_bytes:
+                stats.too_small += 1
+                continue
+            candidates[os.path.relpath(path, root)] = st
+
+    previous, previous_incompressible = _load_state(state_path)
+    produced = set()
+    incompressible = {}
+    to_compress = []
+    for rel_path, st in sorted(candidates.items()):
+        if previous_incompressible.get(rel_path) == _stamp(st):
+            stats.too_small += 1
+            incompressible[rel_path] = _stamp(st)
+        elif _is_up_to_date(os.path.join(root, rel_path), st):
+            stats.skipped += 1
+            produced.add(rel_path)
+        else:
+            to_compress.append(rel_path)
+
+    def compress(rel_path):
+        return _compress_file(os.path.join(root, rel_path), candidates[rel_path])
+
+    if threads > 1 and len(to_compress) > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            sizes = list(pool.map(compress, to_compress))
+    else:
+        sizes = [compress(rel_path) for rel_path in to_compress]
+
+    for rel_path, size in zip(to_compress, sizes):
+        if size < 0:
+            stats.too_small += 1
+            incompressible[rel_path] = _stamp(candidates[rel_path])
+            continue
+        produced.add(rel_path)
+        stats.compressed += 1
+        stats.bytes_in += candidates[rel_path].st_size
+        stats.bytes_out += size
+
+    for rel_path in previous:
+        if rel_path in produced:
+            continue
+        gz_path = os.path.join(root, rel_path + GZIP_SUFFIX)
+        if os.path.isfile(gz_path):
+            os.remove(gz_path)
+            stats.removed += 1
+
+    if state_path is not None:
+        _save_state(state_path, sorted(produced), incompressible)
+    return stats
+
+
+def remove_precompressed(root: str, state_path: str) -> PrecompressStats:
+    """
+    Remove every .gz file precompress_directory recorded in state_path, for
+    builds that no longer precompress, and forget the state.
+    """
+    stats = PrecompressStats()
+    previous, _ = _load_state(state_path)
+    for rel_path in previous:
+        gz_path = os.path.join(root, rel_path + GZIP_SUFFIX)
+        if os.path.isfile(gz_path):
+            os.remove(gz_path)
+            stats.removed += 1
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return stats
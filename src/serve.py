@@ -0,0 +1,243 @@
+import functools
+import os
+import posixpath
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from build_manifest import hash_file
+from front_matter import parse_front_matter
+from generate_page import apply_template, page_title
+from markdown_to_html import markdown_to_html_node
+from template_engine import load_template
+
+DEFAULT_PORT = 8888
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class RenderCache:
+    """
+    Size-bounded LRU of rendered pages. Keys are (source hash, template hash,
+    basepath), so an edited page or template simply misses and the stale entry
+    ages out.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _HashMemo:
+    """
+    Remember file hashes by (path, mtime, size) so a cache hit costs a stat()
+    instead of re-reading the file.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def hash(self, path: str) -> str:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        digest = hash_file(path)
+        with self._lock:
+            self._hashes[path] = (stamp, digest)
+        return digest
+
+
+class PageRenderer:
+    """
+    Render content pages on demand: request path -> content/**/index.md ->
+    markdown_to_html_node -> template, memoised in a RenderCache.
+    """
+
+    def __init__(
+        self,
+        content_dir: str,
+        template_path: str,
+        basepath: str = "/",
+        cache: RenderCache = None,
+    ):
+        self.content_dir = os.path.abspath(content_dir)
+        self.template_path = template_path
+        self.basepath = basepath
+        self.cache = RenderCache() if cache is None else cache
+        self._hashes = _HashMemo()
+
+    def strip_basepath(self, url_path: str) -> str:
+        """
+        Remove the site basepath from a request path: "/site/x" -> "/x".
+        """
+        prefix = self.basepath.rstrip("/")
+        if prefix and (url_path == prefix or url_path.startswith(prefix + "/")):
+            return url_path[len(prefix) :] or "/"
+        return url_path
+
+    def resolve(self, url_path: str) -> str:
+        """
+        Map a URL path to its markdown source, or None if there is none.
+
+        Example:
+            "/blog/tom/" -> content/blog/tom/index.md
+            "/blog/tom/index.html" -> content/blog/tom/index.md
+            "/contact.html" -> content/contact.md
+        """
+        path = urllib.parse.unquote(urllib.parse.urlsplit(url_path).path)
+        path = posixpath.normpath("/" + self.strip_basepath(path).lstrip("/"))
+
+        if path.endswith(".html"):
+            candidates = [path[: -len(".html")] + ".md"]
+        else:
+            candidates = [posixpath.join(path, "index.md"), path + ".md"]
+        for candidate in candidates:
+            source = os.path.normpath(os.path.join(self.content_dir, candidate.lstrip("/")))
+            if os.path.commonpath([source, self.content_dir]) != self.content_dir:
+                continue
+            if os.path.isfile(source):
+                return source
+        return None
+
+    def render(self, source_path: str) -> bytes:
+        key = (
+            self._hashes.hash(source_path),
+            self._hashes.hash(self.template_path),
+            self.basepath,
+        )
+        page = self.cache.get(key)
+        if page is not None:
+            return page
+
+        with open(source_path, "r", encoding="utf-8") as f:
+            meta, markdown = parse_front_matter(f.read())
+        template = load_template(self.template_path, self.basepath)
+        content_html = markdown_to_html_node(markdown, self.basepath).to_html()
+        page = apply_template(template, page_title(meta, markdown), content_html).encode("utf-8")
+        self.cache.put(key, page)
+        return page
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    """
+    Serve rendered content pages from a PageRenderer and everything else from
+    the static directory.
+    """
+
+    def __init__(self, *args, renderer: PageRenderer, **kwargs):
+        self.renderer = renderer
+        super().__init__(*args, **kwargs)
+
+    def translate_path(self, path: str) -> str:
+        return super().translate_path(self.renderer.strip_basepath(path))
+
+    def do_GET(self):
+        if not self._send_page(head_only=False):
+            super().do_GET()
+
+    def do_HEAD(self):
+        if not self._send_page(head_only=True):
+            super().do_HEAD()
+
+    def _send_page(self, head_only: bool) -> bool:
+        source = self.renderer.resolve(self.path)
+        if source is None:
+            return False
+
+        url_path = urllib.parse.urlsplit(self.path).path
+        if os.path.basename(source) == "index.md" and not url_path.endswith(("/", ".html")):
+            # Redirect like a static server would, so relative links resolve.
+            self.send_response(301)
+            self.send_header("Location", url_path + "/")
+            self.end_headers()
+            return True
+
+        start = time.perf_counter()
+        try:
+            page = self.renderer.render(source)
+        except Exception as e:
+            self.send_error(500, f"Failed to render {source}: {e}")
+            return True
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.send_header("Server-Timing", f"render;dur={elapsed_ms:.2f}")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(page)
+        return True
+
+
+def make_server(
+    content_dir: str,
+    static_dir: str,
+    template_path: str,
+    basepath: str = "/",
+    host: str = "",
+    port: int = DEFAULT_PORT,
+    cache_bytes: int = DEFAULT_CACHE_BYTES,
+) -> ThreadingHTTPServer:
+    renderer = PageRenderer(content_dir, template_path, basepath, RenderCache(cache_bytes))
+    handler = functools.partial(PreviewHandler, renderer=renderer, directory=static_dir)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    content_dir: str,
+    static_dir: str,
+    template_path: str,
+    basepath: str = "/",
+    port: int = DEFAULT_PORT,
+    cache_bytes: int = DEFAULT_CACHE_BYTES,
+) -> None:
+    """
+    Serve the site without building docs/: pages are rendered on first request
+    and kept in an LRU cache.
+    """
+    server = make_server(
+        content_dir, static_dir, template_path, basepath, port=port, cache_bytes=cache_bytes
+    )
+    print(f"Serving {content_dir} on http://localhost:{server.server_address[1]}{basepath}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+
+from build_manifest import BuildManifest
+from output_tree import copy_if_changed
+
+SHARDS_DIRNAME = ".build-shards"
+SHARD_INFO_FILENAME = "shard.json"
+
+# Build settings every shard must have rendered its pages with.
+_SETTINGS = ("template_hash", "basepath", "assets_digest", "image_sizes", "minify")
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """
+    Parse a --shard value "i/N" (1 <= i <= N) into (i, N).
+    """
+    index, sep, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        index = count = 0
+    if not sep or count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {text!r}: expected i/N with 1 <= i <= N")
+    return index, count
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    """
+    The shard (1..count) a content page belongs to: a stable hash of its
+    content-relative path, the same on every machine and platform.
+    """
+    key = rel_path.replace(os.sep, "/").encode("utf-8")
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big") % count + 1
+
+
+def shard_dir(shards_root: str, index: int, count: int) -> str:
+    """
+    Where shard i of N keeps its output (docs/) and build cache (cache/).
+    """
+    return os.path.join(shards_root, f"{index}-of-{count}")
+
+
+def write_shard_info(path: str, index: int, count: int, manifest: BuildManifest) -> None:
+    """
+    Record which shard a shard directory holds, next to its manifest.
+    """
+    data = {"shard": index, "count": count, "pages": sorted(manifest.pages)}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ShardMergeError(Exception):
+    """
+    Raised when the shards to merge are incomplete or inconsistent. problems
+    lists every issue found; nothing is written when there is any.
+    """
+
+    def __init__(self, problems: list[str]):
+        self.problems = problems
+        lines = [f"cannot merge shards, {len(problems)} problem(s):"]
+        lines += [f"  {problem}" for problem in problems]
+        super().__init__("\n".join(lines))
+
+
+class MergeStats:
+    def __init__(self):
+        self.shards = 0
+        self.pages = 0
+        self.copied = 0
+        self.removed = 0
+
+    def summary(self) -> str:
+        return (
+            f"merged {self.shards} shards: {self.pages} pages, {self.copied} files copied, "
+            f"{self.removed} stale removed"
+        )
+
+    def __repr__(self):
+        return (
+            f"MergeStats(shards={self.shards}, pages={self.pages}, copied={self.copied}, "
+            f"removed={self.removed})"
+        )
+
+
+def _load_shard(shards_root: str, index: int, count: int, problems: list[str]):
+    root = shard_dir(shards_root, index, count)
+    try:
+        with open(os.path.join(root, SHARD_INFO_FILENAME), "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        problems.append(f"shard {index}/{count}: missing or unreadable {SHARD_INFO_FILENAME}")
+        return None
+    if (info.get("shard"), info.get("count")) != (index, count):
+        found = f"{info.get('shard')}/{info.get('count')}"
+        problems.append(f"shard {index}/{count}: directory holds shard {found}")
+        return None
+    manifest = BuildManifest(os.path.join(root, "cache"))
+    manifest.load()
+    if sorted(manifest.pages) != info.get("pages"):
+        problems.append(f"shard {index}/{count}: manifest does not match {SHARD_INFO_FILENAME}")
+        return None
+    return manifest
+
+
+def merge_shards(
+    shards_root: str, count: int, rel_paths: set[str], docs_dir: str, manifest: BuildManifest
+) -> MergeStats:
+    """
+    Combine the outputs and manifests of shards 1..count into docs_dir and
+    manifest (which is saved), after checking that together they cover every
+    content page (rel_paths) exactly once, each page in the shard it hashes
+    to, all rendered with the same settings.
+
+    Outputs in docs_dir of pages the merged manifest no longer lists are
+    removed. The merged manifest lets the next build skip every merged page.
+    """
+    problems = []
+    shards = {}
+    for index in range(1, count + 1):
+        shard_manifest = _load_shard(shards_root, index, count, problems)
+        if shard_manifest is not None:
+            shards[index] = shard_manifest
+
+    first = shards[min(shards)] if shards else None
+    for index, shard_manifest in sorted(shards.items()):
+        for setting in _SETTINGS:
+            if getattr(shard_manifest, setting) != getattr(first, setting):
+                problems.append(f"shard {index}/{count}: built with a different {setting}")
+
+    owners = {}
+    for index, shard_manifest in sorted(shards.items()):
+        for rel_path in shard_manifest.pages:
+            owners.setdefault(rel_path, []).append(index)
+    for rel_path, indices in sorted(owners.items()):
+        if len(indices) > 1:
+            problems.append(f"{rel_path}: built by shards {', '.join(map(str, indices))}")
+        elif rel_path not in rel_paths:
+            problems.append(f"{rel_path}: built by shard {indices[0]} but not in content")
+        elif indices[0] != shard_of(rel_path, count):
+            problems.append(f"{rel_path}: built by shard {indices[0]}, not its own")
+    if len(shards) == count:
+        for rel_path in sorted(rel_paths - owners.keys()):
+            problems.append(f"{rel_path}: not built by any shard")
+
+    pages = {}
+    copies = []
+    for index, shard_manifest in sorted(shards.items()):
+        root = shard_dir(shards_root, index, count)
+        for rel_path, entry in shard_manifest.pages.items():
+            if entry["dest_path"] is not None:
+                # Output paths are relative to each shard's docs/.
+                source = os.path.join(root, "docs", entry["dest_path"])
+                if not os.path.exists(source):
+                    problems.append(f"{rel_path}: output missing from shard {index}")
+                copies.append((source, os.path.join(docs_dir, entry["dest_path"])))
+                fragment = shard_manifest.fragment_path(entry["source_hash"])
+                if os.path.exists(fragment):
+                    copies.append((fragment, manifest.fragment_path(entry["source_hash"])))
+            pages[rel_path] = entry
+    if problems:
+        raise ShardMergeError(problems)
+
+    stats = MergeStats()
+    stats.shards = count
+    stats.pages = len(pages)
+    for source, dest in copies:
+        if copy_if_changed(source, dest):
+            stats.copied += 1
+
+    previous = {entry["dest_path"] for entry in manifest.pages.values()}
+    current = {entry["dest_path"] for entry in pages.values()}
+    for stale in sorted(previous - current - {None}):
+        stale_path = os.path.join(docs_dir, stale)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            stats.removed += 1
+
+    for setting in _SETTINGS:
+        setattr(manifest, setting, getattr(first, setting))
+    manifest.pages = pages
+    manifest.save()
+    return stats
@@ -0,0 +1,118 @@
+import os
+import re
+
+from textnode import apply_basepath
+
+# Placeholders are written exactly like the ones in template.html: "{{ Name }}".
+PLACEHOLDER_RE = re.compile(r"\{\{ (\w+) \}\}")
+_URL_ATTR_RE = re.compile(r'\b(href|src)="(/[^"]*)"')
+
+
+def rewrite_urls(html: str, basepath: str, assets=None) -> str:
+    """
+    Prefix root-relative href/src attributes with the site basepath, and map
+    static files to their fingerprinted names when an AssetManifest is given.
+    Used on the template text only: page content gets the same treatment per
+    URL while its nodes are built (see textnode.apply_basepath).
+
+    Example:
+        rewrite_urls('<a href="/x">', "/site/") -> '<a href="/site/x">'
+    """
+    if assets is not None:
+        return _URL_ATTR_RE.sub(
+            lambda m: f'{m[1]}="{apply_basepath(m[2], basepath, assets)}"', html
+        )
+    if basepath == "/":
+        return html
+    return html.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+
+
+class CompiledTemplate:
+    """
+    A template split once into literal segments and placeholder names.
+
+    The basepath is applied to the literal segments at compile time, so filling
+    the template is a single join no matter how many placeholders it has.
+    assets and images are kept for rendering the page content that fills it.
+    Values are inserted as they are; rendered content already carries the
+    basepath in its link and image URLs. Placeholders without a value are
+    rendered back verbatim.
+
+    Example:
+        CompiledTemplate("<title>{{ Title }}</title>").render({"Title": "Hi"})
+        -> "<title>Hi</title>"
+    """
+
+    def __init__(self, text: str, basepath: str = "/", assets=None, images=None):
+        self.basepath = basepath
+        self.assets = assets
+        self.images = images
+        # Even indices are literal text, odd indices are placeholder names.
+        parts = PLACEHOLDER_RE.split(text)
+        for i in range(0, len(parts), 2):
+            parts[i] = rewrite_urls(parts[i], basepath, assets)
+        self.segments = parts
+
+    @property
+    def placeholders(self) -> list[str]:
+        return self.segments[1::2]
+
+    def iter_chunks(self, values: dict):
+        """
+        Yield the filled template piece by piece. A value may be a string or an
+        iterable of string chunks (e.g. HTMLNode.iter_html()), which is consumed
+        lazily.
+        """
+        for i, segment in enumerate(self.segments):
+            if i % 2 == 0:
+                yield segment
+                continue
+            if segment not in values:
+                yield f"{{{{ {segment} }}}}"
+                continue
+            value = values[segment]
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+
+    def render(self, values: dict) -> str:
+        return "".join(self.iter_chunks(values))
+
+    def write_to(self, fp, values: dict) -> int:
+        """
+        Stream the filled template into a text file object. Returns the number
+        of characters written.
+        """
+        written = 0
+        for chunk in self.iter_chunks(values):
+            fp.write(chunk)
+            written += len(chunk)
+        return written
+
+    def __repr__(self):
+        return f"CompiledTemplate(placeholders={self.placeholders}, basepath={self.basepath})"
+
+
+_template_cache = {}
+
+
+def load_template(
+    template_path: str, basepath: str = "/", assets=None, images=None
+) -> CompiledTemplate:
+    """
+    Read and compile a template file, reusing the compiled result for as long as
+    the file's mtime and size are unchanged.
+    """
+    st = os.stat(template_path)
+    assets_digest = None if assets is None else assets.digest
+    images_digest = None if images is None else images.digest
+    key = (os.path.abspath(template_path), basepath, assets_digest, images_digest)
+    cached = _template_cache.get(key)
+    if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+        return cached[1]
+
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = CompiledTemplate(f.read(), basepath, assets, images)
+    _template_cache[key] = ((st.st_mtime_ns, st.st_size), template)
+    return template
@@ -0,0 +1,88 @@
+import json
+import os
+import unittest
+
+from asset_fingerprint import (
+    ASSET_MANIFEST_FILENAME,
+    HEADERS_FILENAME,
+    AssetManifest,
+    fingerprint_assets,
+    fingerprinted_name,
+    write_asset_files,
+)
+from asset_sync import sync_directory
+from build_manifest import hash_text
+from markdown_to_html import markdown_to_html_node
+from template_engine import CompiledTemplate
+from test_support import TempDirTestCase, read_file, write_file
+
+
+class TestAssetFingerprint(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp_dir, "static")
+        self.docs = os.path.join(self.tmp_dir, "docs")
+        os.makedirs(os.path.join(self.static, "images"))
+        self._write("index.css", "body {}")
+        self._write(os.path.join("images", "logo.png"), "png")
+
+    def _write(self, rel_path, text):
+        write_file(os.path.join(self.static, rel_path), text)
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(
+            fingerprinted_name(os.path.join("images", "a.png"), "0123456789abcdef"),
+            os.path.join("images", "a.0123456789ab.png"),
+        )
+
+    def test_manifest_maps_urls_by_content(self):
+        assets = fingerprint_assets(self.static)
+        css = "/index." + hash_text("body {}")[:12] + ".css"
+        self.assertEqual(assets.resolve("/index.css"), css)
+        self.assertEqual(assets.resolve("/blog/"), "/blog/")
+
+        self._write("index.css", "body { color: red; }")
+        changed = fingerprint_assets(self.static)
+        self.assertNotEqual(changed.resolve("/index.css"), css)
+        self.assertNotEqual(changed.digest, assets.digest)
+
+    def test_template_and_content_use_fingerprinted_urls(self):
+        assets = AssetManifest({"index.css": "index.abc.css", "logo.png": "logo.abc.png"})
+        template = CompiledTemplate('<link href="/index.css" /><a href="/">{{ X }}', "/s/", assets)
+        self.assertEqual(
+            template.render({"X": ""}), '<link href="/s/index.abc.css" /><a href="/s/">'
+        )
+        md = "![logo](/logo.png) [css](/index.css)"
+        self.assertEqual(
+            markdown_to_html_node(md, "/s/", assets).to_html(),
+            '<div><p><img src="/s/logo.abc.png" alt="logo"></img> '
+            '<a href="/s/index.abc.css">css</a></p></div>',
+        )
+
+    def test_sync_writes_both_names_and_drops_stale_fingerprints(self):
+        state = os.path.join(self.tmp_dir, "assets.json")
+        assets = fingerprint_assets(self.static)
+        sync_directory(self.static, self.docs, state_path=state, extra_names=assets.files)
+        old_css = assets.files["index.css"]
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.css")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, old_css)))
+
+        self._write("index.css", "body { color: red; }")
+        assets = fingerprint_assets(self.static)
+        stats = sync_directory(self.static, self.docs, state_path=state, extra_names=assets.files)
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, old_css)))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, assets.files["index.css"])))
+
+    def test_write_asset_files(self):
+        assets = fingerprint_assets(self.static)
+        write_asset_files(self.docs, assets)
+        with open(os.path.join(self.docs, ASSET_MANIFEST_FILENAME), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), assets.urls)
+        headers = read_file(os.path.join(self.docs, HEADERS_FILENAME))
+        rule = assets.urls["/index.css"] + "\n  Cache-Control: public, max-age=31536000, immutable\n"
+        self.assertIn(rule, headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import unittest
+
+from asset_sync import sync_directory
+from test_support import TempDirTestCase, read_file, write_file
+
+
+class TestSyncDirectory(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        root = self.tmp_dir
+        self.static = os.path.join(root, "static")
+        self.docs = os.path.join(root, "docs")
+        self.state = os.path.join(root, ".build-cache", "assets.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(os.path.join(self.static, "images", "a.png"), "png")
+
+    def _sync(self, **kwargs):
+        return sync_directory(self.static, self.docs, state_path=self.state, **kwargs)
+
+    def test_first_sync_copies_everything(self):
+        stats = self._sync()
+        self.assertEqual((stats.copied, stats.skipped), (2, 0))
+        self.assertTrue(os.path.isfile(os.path.join(self.docs, "images", "a.png")))
+
+    def test_unchanged_files_are_skipped(self):
+        self._sync()
+        stats = self._sync()
+        self.assertEqual((stats.copied, stats.skipped), (0, 2))
+
+    def test_changed_file_is_copied(self):
+        self._sync()
+        write_file(os.path.join(self.static, "index.css"), "body { color: red }")
+        stats = self._sync()
+        self.assertEqual(stats.copied, 1)
+        self.assertEqual(read_file(os.path.join(self.docs, "index.css")), "body { color: red }")
+
+    def test_hash_check_skips_touched_but_identical_file(self):
+        self._sync()
+        os.utime(os.path.join(self.static, "index.css"), ns=(0, 0))
+        stats = self._sync(check_hash=True)
+        self.assertEqual((stats.copied, stats.skipped), (0, 2))
+
+    def test_stale_assets_removed_but_pages_kept(self):
+        self._sync()
+        write_file(os.path.join(self.docs, "index.html"), "<html></html>")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        stats = self._sync()
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+    def test_link_mode_hardlinks(self):
+        stats = self._sync(link=True)
+        self.assertEqual(stats.linked, 2)
+        self.assertTrue(
+            os.path.samefile(
+                os.path.join(self.static, "index.css"), os.path.join(self.docs, "index.css")
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
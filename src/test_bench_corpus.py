@@ -0,0 +1,44 @@
+import os
+import random
+import tempfile
+import unittest
+
+from bench_corpus import CorpusSpec, generate_markdown, write_corpus
+from bench_suite import compare
+from block_markdown import BlockType, block_to_block_type, markdown_to_blocks
+from markdown_to_html import markdown_to_html_node
+
+
+class TestBenchCorpus(unittest.TestCase):
+    def test_generate_markdown_is_deterministic(self):
+        spec = CorpusSpec(page_size=4096, seed=7)
+        first = generate_markdown(random.Random(spec.seed), spec, "Title")
+        second = generate_markdown(random.Random(spec.seed), spec, "Title")
+        self.assertEqual(first, second)
+        self.assertGreaterEqual(len(first), 4096)
+
+    def test_generated_markdown_renders(self):
+        spec = CorpusSpec(page_size=16 * 1024, inline_density=0.5, seed=3)
+        markdown = generate_markdown(random.Random(spec.seed), spec, "Title")
+        types = {block_to_block_type(block) for block in markdown_to_blocks(markdown)}
+        self.assertTrue({BlockType.PARAGRAPH, BlockType.CODE, BlockType.QUOTE} <= types)
+        self.assertTrue(markdown_to_html_node(markdown).to_html().startswith("<div><h1>"))
+
+    def test_write_corpus_layout(self):
+        with tempfile.TemporaryDirectory() as root:
+            paths = write_corpus(root, CorpusSpec(pages=12, page_size=512))
+            self.assertEqual(len(paths), 12)
+            self.assertEqual(paths[0], os.path.join(root, "content", "index.md"))
+            self.assertTrue(os.path.isfile(os.path.join(root, "template.html")))
+            self.assertTrue(os.path.isfile(os.path.join(root, "static", "index.css")))
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": {"a": {"min": 1.0}, "b": {"min": 1.0}}}
+        current = {"results": {"a": {"min": 1.05}, "b": {"min": 1.5}, "new": {"min": 1.0}}}
+        rows, regressions = compare(current, baseline, tolerance=0.1)
+        self.assertEqual([row[0] for row in rows], ["a", "b"])
+        self.assertEqual(regressions, ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import pickle
+import unittest
+
+from block_cache import BATCH_SIZE, BlockCache
+from block_markdown import markdown_to_blocks
+from markdown_to_html import markdown_to_html_node
+from test_support import TempDirTestCase
+
+MARKDOWN = """# Title
+
+A **bold** paragraph with a [link](/x).
+
+- one
+- two
+
+```
+code
+```
+
+A **bold** paragraph with a [link](/x).
+"""
+
+
+class TestBlockCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp_dir, "cache", "blocks.sqlite3")
+
+    def render(self, cache, markdown):
+        return "<div>" + "".join(cache.iter_html(markdown_to_blocks(markdown))) + "</div>"
+
+    def test_matches_uncached_rendering(self):
+        cache = BlockCache(self.path)
+        cache.begin()
+        self.assertEqual(
+            self.render(cache, MARKDOWN), markdown_to_html_node(MARKDOWN).to_html()
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+    def test_second_build_only_renders_changed_blocks(self):
+        cache = BlockCache(self.path)
+        cache.begin()
+        self.render(cache, MARKDOWN)
+        cache.finish()
+        cache.close()
+
+        cache = BlockCache(self.path)
+        cache.begin()
+        edited = MARKDOWN.replace("- two", "- three")
+        self.assertEqual(self.render(cache, edited), markdown_to_html_node(edited).to_html())
+        stats = cache.finish()
+        self.assertEqual((stats.hits, stats.misses, stats.evicted), (4, 1, 0))
+
+        cache.clear()
+        cache.begin()
+        self.render(cache, edited)
+        stats = cache.finish()
+        self.assertEqual((stats.hits, stats.misses), (1, 4))
+        cache.close()
+
+    def test_evicts_least_recently_used_blocks(self):
+        blocks = [f"paragraph {i}" for i in range(BATCH_SIZE + 10)]
+        cache = BlockCache(self.path, max_bytes=10**9)
+        cache.begin()
+        list(cache.iter_html(blocks))
+        cache.finish()
+
+        cache.max_bytes = len("<p>paragraph 1</p>") * 2
+        cache.begin()
+        cache.render_blocks(["paragraph 1", "paragraph 2"])
+        stats = cache.finish()
+        self.assertEqual(stats.evicted, len(blocks) - 2)
+        self.assertEqual(stats.size, cache.max_bytes)
+
+        cache.begin()
+        cache.render_blocks(["paragraph 1", "paragraph 3"])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_pickles_without_connection(self):
+        cache = BlockCache(self.path)
+        cache.begin()
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(copy.build, cache.build)
+        self.assertEqual(copy.render_blocks(["hi"]), ["<p>hi</p>"])
+
+
+if __name__ == "__main__":
+    unittest.main()
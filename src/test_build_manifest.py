@@ -0,0 +1,82 @@
+import os
+import unittest
+
+from build_manifest import BuildManifest
+from generate_page import generate_pages_recursive
+from test_support import TempDirTestCase, read_file, write_file
+
+
+class TestIncrementalBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        root = self.tmp_dir
+        self.content = os.path.join(root, "content")
+        self.docs = os.path.join(root, "docs")
+        self.cache = os.path.join(root, ".build-cache")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nHello **there**")
+        write_file(os.path.join(self.content, "blog", "post.md"), "# Post\n\nA post")
+        write_file(self.template, "<title>{{ Title }}</title>{{ Content }}")
+
+    def _build(self, basepath="/"):
+        manifest = BuildManifest(self.cache)
+        manifest.load()
+        return generate_pages_recursive(
+            self.content, self.template, self.docs, basepath, manifest
+        )
+
+    def test_first_build_rebuilds_everything(self):
+        stats = self._build()
+        self.assertEqual((stats.rebuilt, stats.skipped), (2, 0))
+        self.assertEqual(
+            read_file(os.path.join(self.docs, "index.html")),
+            "<title>Home</title><div><h1>Home</h1><p>Hello <b>there</b></p></div>",
+        )
+
+    def test_unchanged_build_skips_all_pages(self):
+        self._build()
+        stats = self._build()
+        self.assertEqual((stats.rebuilt, stats.retemplated, stats.skipped), (0, 0, 2))
+
+    def test_changed_page_is_rebuilt(self):
+        self._build()
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+        stats = self._build()
+        self.assertEqual((stats.rebuilt, stats.skipped), (1, 1))
+        self.assertIn("Changed", read_file(os.path.join(self.docs, "index.html")))
+
+    def test_template_change_retemplates_without_rebuild(self):
+        self._build()
+        write_file(self.template, "<h2>{{ Title }}</h2>{{ Content }}")
+        stats = self._build()
+        self.assertEqual((stats.rebuilt, stats.retemplated), (0, 2))
+        self.assertTrue(
+            read_file(os.path.join(self.docs, "blog", "post.html")).startswith("<h2>Post</h2>")
+        )
+
+    def test_basepath_change_rebuilds(self):
+        self._build()
+        stats = self._build(basepath="/site/")
+        self.assertEqual((stats.rebuilt, stats.retemplated), (2, 0))
+
+    def test_missing_output_is_rewritten(self):
+        self._build()
+        os.remove(os.path.join(self.docs, "index.html"))
+        stats = self._build()
+        self.assertEqual((stats.retemplated, stats.skipped), (1, 1))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+    def test_deleted_page_output_is_removed(self):
+        self._build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        stats = self._build()
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "post.html")))
+        # The directory it leaves empty goes too, but not the output root.
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+        self.assertTrue(os.path.isdir(self.docs))
+
+
+if __name__ == "__main__":
+    unittest.main()
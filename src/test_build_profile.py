@@ -0,0 +1,67 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+
+import block_markdown
+from build_profile import STAGES, BuildProfiler
+from generate_page import generate_pages_recursive
+from test_support import TempDirTestCase, read_file, write_file
+
+MARKDOWN = """# Title
+
+Some **bold** text with a [link](/blog/) and an ![image](/images/x.png).
+
+- one
+- _two_
+
+```
+code
+```
+"""
+
+
+class TestBuildProfile(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.tmp_dir
+        self.content = os.path.join(self.root, "content")
+        os.makedirs(os.path.join(self.content, "blog"))
+        for rel_path in ("index.md", os.path.join("blog", "index.md")):
+            write_file(os.path.join(self.content, rel_path), MARKDOWN)
+        self.template = os.path.join(self.root, "template.html")
+        write_file(self.template, '<title>{{ Title }}</title><a href="/x">{{ Content }}</a>')
+
+    def build(self, dest_dir, profiler=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(
+                self.content, self.template, dest_dir, "/site/", profiler=profiler
+            )
+        return read_file(os.path.join(dest_dir, "blog", "index.html"))
+
+    def test_profiled_build_matches_normal_build(self):
+        profiler = BuildProfiler()
+        profiled = self.build(os.path.join(self.root, "profiled"), profiler)
+        self.assertEqual(profiled, self.build(os.path.join(self.root, "normal")))
+
+    def test_report_counts_stages_and_nodes(self):
+        profiler = BuildProfiler(trace_memory=True)
+        self.build(os.path.join(self.root, "docs"), profiler)
+        report = profiler.report()
+        self.assertEqual(report["pages"], 2)
+        self.assertEqual(list(report["stages"]), list(STAGES))
+        self.assertEqual(report["blocks"], 8)
+        self.assertGreater(report["text_nodes"], 0)
+        self.assertGreater(report["peak_memory"], 0)
+        json.dumps(report)
+        self.assertIn("slowest 2 pages:", profiler.summary())
+
+    def test_inline_hook_is_removed_after_profiling(self):
+        original = block_markdown.text_to_textnodes
+        self.build(os.path.join(self.root, "docs"), BuildProfiler())
+        self.assertIs(block_markdown.text_to_textnodes, original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import unittest
+
+from front_matter import parse_fields, parse_front_matter, split_front_matter_lines
+from generate_page import render_markdown
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_parse_front_matter(self):
+        meta, body = parse_front_matter(
+            "---\n"
+            'title: "Hello: world"\n'
+            "date: 2024-05-01\n"
+            "tags: [a, 'b c']\n"
+            "draft: yes\n"
+            "list: /blog/\n"
+            "---\n"
+            "# Heading\n"
+        )
+        self.assertEqual(
+            meta,
+            {
+                "title": "Hello: world",
+                "date": "2024-05-01",
+                "tags": ["a", "b c"],
+                "draft": True,
+                "list": "blog",
+            },
+        )
+        self.assertEqual(body, "# Heading\n")
+
+    def test_without_front_matter(self):
+        for markdown in ("# Title\n\n---\n", "---\ntitle: never closed\n\n# Title\n", ""):
+            self.assertEqual(parse_front_matter(markdown), ({}, markdown))
+
+    def test_block_list_and_comments(self):
+        meta = parse_fields(["# a comment", "tags:", "  - one", "  - two", "feed: feed.xml"])
+        self.assertEqual(meta, {"tags": ["one", "two"], "feed": "feed.xml"})
+
+    def test_invalid_values(self):
+        for lines in (["just text"], ["date: yesterday"], ["draft: maybe"]):
+            with self.assertRaises(ValueError):
+                parse_fields(lines)
+        for key in ("title", "date", "draft", "list", "feed"):
+            with self.assertRaisesRegex(ValueError, f"front matter {key}: expected a single"):
+                parse_fields([f"{key}:", "  - one"])
+
+    def test_split_front_matter_lines(self):
+        meta, lines = split_front_matter_lines(io.StringIO("---\ntitle: T\n---\n# H\n\nbody\n"))
+        self.assertEqual(meta, {"title": "T"})
+        self.assertEqual(list(lines), ["# H\n", "\n", "body\n"])
+
+        text = "---\ntitle: T\n# H\n"
+        meta, lines = split_front_matter_lines(io.StringIO(text))
+        self.assertEqual((meta, "".join(lines)), ({}, text))
+
+    def test_title_from_front_matter(self):
+        self.assertEqual(
+            render_markdown("---\ntitle: Front\n---\n# Heading\n"),
+            ("Front", "<div><h1>Heading</h1></div>"),
+        )
+        self.assertEqual(render_markdown("# Heading\n")[0], "Heading")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import unittest
+
+from html_events import (
+    CLOSE,
+    LEAF,
+    OPEN,
+    TEXT,
+    EventBuffer,
+    events_to_node,
+    intern_tag,
+    node_to_events,
+)
+from leafnode import LeafNode
+from markdown_to_html import markdown_to_events, markdown_to_html_node
+from parentnode import ParentNode
+
+
+def _tree():
+    return ParentNode(
+        "div",
+        [
+            ParentNode("p", [LeafNode(None, "Hello "), LeafNode("b", "world")]),
+            ParentNode(
+                "ul",
+                [
+                    ParentNode("li", [LeafNode("a", "link", {"href": "/x", "class": "y"})]),
+                    ParentNode("li", [LeafNode("img", "", {"src": "/i.png", "alt": "i"})]),
+                ],
+            ),
+        ],
+        {"id": "main"},
+    )
+
+
+class TestHtmlEvents(unittest.TestCase):
+    def test_node_to_events_renders_like_the_tree(self):
+        tree = _tree()
+        events = node_to_events(tree)
+        self.assertEqual(events.to_html(), tree.to_html())
+        self.assertEqual(list(events.iter_html()), list(tree.iter_html()))
+
+    def test_events_round_trip_to_nodes(self):
+        tree = _tree()
+        self.assertEqual(repr(events_to_node(node_to_events(tree))), repr(tree))
+
+    def test_events_lists_records(self):
+        events = EventBuffer()
+        events.open(intern_tag("p"))
+        events.text("a ")
+        events.leaf(intern_tag("a"), "b", {"href": "/"})
+        events.close(intern_tag("p"))
+        self.assertEqual(
+            list(events.events()),
+            [
+                (OPEN, "p", None, None),
+                (TEXT, None, None, "a "),
+                (LEAF, "a", {"href": "/"}, "b"),
+                (CLOSE, "p", None, None),
+            ],
+        )
+        self.assertEqual(events.to_html(), '<p>a <a href="/">b</a></p>')
+
+    def test_iter_html_without_single_root(self):
+        events = node_to_events(LeafNode(None, "x"))
+        node_to_events(ParentNode("p", [LeafNode("i", "y")]), events)
+        self.assertEqual(list(events.iter_html()), ["x", "<p><i>y</i></p>"])
+        out = io.StringIO()
+        self.assertEqual(events.write_to(out), len("x<p><i>y</i></p>"))
+
+    def test_invalid_nodes_and_unbalanced_events(self):
+        with self.assertRaises(ValueError):
+            node_to_events(LeafNode("b", None))
+        with self.assertRaises(ValueError):
+            node_to_events(ParentNode(None, []))
+        events = EventBuffer()
+        events.open(intern_tag("p"))
+        with self.assertRaises(ValueError):
+            events_to_node(events)
+
+    def test_markdown_to_events_matches_tree(self):
+        md = (
+            "# Title with [a link](/page)\n\n"
+            "Some **bold** and _italic_ text\nwith `code` and ![img](/i.png)\n\n"
+            "> quoted\n> lines\n\n"
+            "- one\n- two\n\n"
+            "1. first\n2. second\n\n"
+            "```\nraw **code**\n\nkept\n```"
+        )
+        tree = markdown_to_html_node(md, "/site/")
+        events = markdown_to_events(md, "/site/")
+        self.assertEqual(events.to_html(), tree.to_html())
+        self.assertEqual(list(events.iter_html()), list(tree.iter_html()))
+        self.assertEqual(repr(events_to_node(events)), repr(tree))
+
+
+if __name__ == "__main__":
+    unittest.main()
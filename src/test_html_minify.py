@@ -0,0 +1,91 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from build_manifest import BuildManifest
+from generate_page import generate_pages_recursive
+from html_minify import HtmlMinifier, MinifyReport, minify_html
+from test_support import read_file, write_file
+
+PAGE = """<!doctype html>
+<html>
+  <head>
+    <!-- analytics goes here -->
+    <title>Hi</title>
+  </head>
+  <body>
+    <p>Some   <b>bold</b> <i>text</i>
+    over two lines.</p>
+    <pre><code>def f():
+    return  1
+</code></pre>
+    <p>inline <code>a  =  b</code> code</p>
+  </body>
+</html>
+"""
+
+MINIFIED = (
+    "<!doctype html><html><head><title>Hi</title></head><body>"
+    "<p>Some <b>bold</b> <i>text</i> over two lines.</p>"
+    "<pre><code>def f():\n    return  1\n</code></pre>"
+    "<p>inline <code>a  =  b</code> code</p></body></html>"
+)
+
+
+class TestHtmlMinify(unittest.TestCase):
+    def test_minify_page(self):
+        self.assertEqual(minify_html(PAGE), MINIFIED)
+
+    def test_conditional_comments_are_kept(self):
+        html = "<head> <!--[if IE]><p>old</p><![endif]--> </head>"
+        self.assertEqual(minify_html(html), "<head><!--[if IE]><p>old</p><![endif]--></head>")
+
+    def test_text_that_looks_like_markup(self):
+        self.assertEqual(minify_html("<p>1 < 2  and 3 > 2</p>"), "<p>1 < 2 and 3 > 2</p>")
+
+    def test_chunked_input_matches_whole(self):
+        for size in (1, 2, 3, 7):
+            minifier = HtmlMinifier()
+            chunks = [PAGE[i : i + size] for i in range(0, len(PAGE), size)]
+            out = "".join(minifier.feed(chunk) for chunk in chunks) + minifier.close()
+            self.assertEqual(out, MINIFIED, size)
+            self.assertEqual(minifier.bytes_in, len(PAGE.encode("utf-8")))
+            self.assertEqual(minifier.bytes_out, len(MINIFIED.encode("utf-8")))
+
+    def test_minified_build(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            os.makedirs(content)
+            write_file(os.path.join(content, "index.md"), "# Title\n\n```\nkeep   this\n```\n")
+            template = os.path.join(tmp, "template.html")
+            write_file(template, "<html>\n  <body>\n    {{ Content }}\n  </body>\n</html>\n")
+            dest = os.path.join(tmp, "docs")
+            output = os.path.join(dest, "index.html")
+            manifest = BuildManifest(os.path.join(tmp, "cache"))
+
+            def build(report):
+                manifest.load()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = generate_pages_recursive(
+                        content, template, dest, "/", manifest, minify_report=report
+                    )
+                return stats, read_file(output)
+
+            report = MinifyReport()
+            stats, html = build(report)
+            self.assertEqual(
+                html,
+                "<html><body><div><h1>Title</h1>"
+                "<pre><code>keep   this\n</code></pre></div></body></html>",
+            )
+
+            stats, unminified = build(None)
+            self.assertEqual(stats.retemplated, 1)
+            self.assertIn("\n  <body>\n", unminified)
+            self.assertEqual(report.pages["index.md"], (len(unminified), len(html)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -28,6 +28,13 @@ class TestHTMLNode(unittest.TestCase):
             ' href="https://www.google.com" target="_blank"',
         )
 
+    def test_generic_node_keeps_all_fields(self):
+        node = HTMLNode("p", "text", None, {"class": "x"})
+        self.assertIsInstance(node, HTMLNode)
+        self.assertEqual(
+            repr(node), "HTMLNode(tag=p, value=text, children=None, props={'class': 'x'})"
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,163 @@
+import contextlib
+import io
+import os
+import struct
+import unittest
+import zlib
+
+from block_cache import BlockCache
+from block_markdown import markdown_to_blocks
+from build_manifest import BuildManifest
+from generate_page import generate_pages_recursive
+from image_index import ImageIndex, build_image_index, eager_first_image, read_image_size
+from test_support import TempDirTestCase, read_file, write_file
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+def png(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr))
+        + b"IHDR"
+        + ihdr
+        + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    )
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof0 + b"\xff\xd9"
+
+
+def webp(chunk, payload):
+    body = b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+class TestImageIndex(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp_dir, "static")
+        os.makedirs(os.path.join(self.static, "images"))
+
+    def _write(self, rel_path, data):
+        return write_file(os.path.join(self.static, rel_path), data)
+
+    def test_read_image_size(self):
+        vp8 = b"\x00" * 3 + b"\x9d\x01\x2a" + struct.pack("<HH", 640, 480)
+        vp8l = b"\x2f" + struct.pack("<I", (320 - 1) | ((200 - 1) << 14))
+        vp8x = b"\x00" * 4 + (99).to_bytes(3, "little") + (49).to_bytes(3, "little")
+        files = {
+            "a.png": (png(800, 600), (800, 600)),
+            "a.gif": (b"GIF89a" + struct.pack("<HH", 31, 17) + b"\x00" * 8, (31, 17)),
+            "a.jpg": (jpeg(1024, 768), (1024, 768)),
+            "lossy.webp": (webp(b"VP8 ", vp8), (640, 480)),
+            "lossless.webp": (webp(b"VP8L", vp8l), (320, 200)),
+            "extended.webp": (webp(b"VP8X", vp8x), (100, 50)),
+            "notes.txt": (b"not an image at all, just text", None),
+        }
+        for name, (data, size) in files.items():
+            self.assertEqual(read_image_size(self._write(name, data)), size, name)
+
+    def test_index_is_cached_by_mtime_and_size(self):
+        state = os.path.join(self.tmp_dir, "cache", "images.json")
+        path = self._write(os.path.join("images", "x.png"), png(10, 20))
+        self._write("index.css", b"body {}")
+        index = build_image_index(self.static, state)
+        self.assertEqual(index.sizes, {"/images/x.png": (10, 20)})
+
+        # Same size and mtime: the header is not read again.
+        st = os.stat(path)
+        self._write(os.path.join("images", "x.png"), png(30, 40))
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(build_image_index(self.static, state).digest, index.digest)
+
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+        self.assertEqual(build_image_index(self.static, state).sizes["/images/x.png"], (30, 40))
+
+    def test_image_node_props(self):
+        images = ImageIndex({"/images/x.png": (10, 20)})
+        node = TextNode("alt", TextType.IMAGE, "/images/x.png")
+        self.assertEqual(
+            text_node_to_html_node(node, "/site/", None, images).to_html(),
+            '<img src="/site/images/x.png" alt="alt" width="10" height="20" '
+            'loading="lazy" decoding="async"></img>',
+        )
+        unknown = TextNode("alt", TextType.IMAGE, "https://example.com/y.png")
+        self.assertEqual(
+            text_node_to_html_node(unknown, "/", None, images).props,
+            {
+                "src": "https://example.com/y.png",
+                "alt": "alt",
+                "loading": "lazy",
+                "decoding": "async",
+            },
+        )
+
+    def test_eager_first_image(self):
+        lazy = '<img src="/a" loading="lazy" decoding="async"></img>'
+        chunks = ["<div>", f"<p>{lazy}{lazy}</p>", f"<p>{lazy}</p>", "</div>"]
+        self.assertEqual(
+            "".join(eager_first_image(chunks)),
+            f'<div><p><img src="/a" decoding="async"></img>{lazy}</p><p>{lazy}</p></div>',
+        )
+
+    def test_build_sizes_images(self):
+        self._write(os.path.join("images", "x.png"), png(10, 20))
+        content = os.path.join(self.tmp_dir, "content")
+        os.makedirs(content)
+        write_file(
+            os.path.join(content, "index.md"),
+            "# Title\n\n![one](/images/x.png)\n\n![two](/images/x.png)\n",
+        )
+        template = os.path.join(self.tmp_dir, "template.html")
+        write_file(template, "{{ Content }}")
+        dest = os.path.join(self.tmp_dir, "docs")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(
+                content, template, dest, "/", images=build_image_index(self.static)
+            )
+        html = read_file(os.path.join(dest, "index.html"))
+        self.assertIn('alt="one" width="10" height="20" decoding="async">', html)
+        self.assertIn('alt="two" width="10" height="20" loading="lazy" decoding="async">', html)
+
+    def test_resize_rebuilds_only_pages_showing_the_image(self):
+        self._write(os.path.join("images", "x.png"), png(10, 20))
+        self._write(os.path.join("images", "y.png"), png(30, 40))
+        content = os.path.join(self.tmp_dir, "content")
+        os.makedirs(content)
+        for name, url in (("x.md", "/images/x.png"), ("y.md", "/images/y.png")):
+            write_file(os.path.join(content, name), f"# {name}\n\n![img]({url})\n")
+        template = os.path.join(self.tmp_dir, "template.html")
+        write_file(template, "{{ Content }}")
+        dest = os.path.join(self.tmp_dir, "docs")
+
+        def build():
+            manifest = BuildManifest(os.path.join(self.tmp_dir, "cache"))
+            manifest.load()
+            with contextlib.redirect_stdout(io.StringIO()):
+                return generate_pages_recursive(
+                    content, template, dest, "/", manifest, images=build_image_index(self.static)
+                )
+
+        build()
+        self._write(os.path.join("images", "x.png"), png(11, 22))
+        stats = build()
+        self.assertEqual((stats.rebuilt, stats.skipped), (1, 1))
+        self.assertIn('width="11" height="22"', read_file(os.path.join(dest, "x.html")))
+
+    def test_block_cache_keys_on_the_images_a_block_shows(self):
+        cache = BlockCache(os.path.join(self.tmp_dir, "blocks.sqlite3"))
+        blocks = markdown_to_blocks("![x](/x.png)\n\n![y](/y.png)\n\nno image")
+        cache.render_blocks(blocks, images=ImageIndex({"/x.png": (1, 2), "/y.png": (3, 4)}))
+        html = cache.render_blocks(
+            blocks, images=ImageIndex({"/x.png": (1, 2), "/y.png": (5, 6)})
+        )
+        self.assertIn('width="5" height="6"', html[1])
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
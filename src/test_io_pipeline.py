@@ -0,0 +1,140 @@
+import contextlib
+import io
+import os
+import threading
+import unittest
+
+from block_cache import BlockCache
+from build_manifest import BuildManifest
+from generate_page import BuildOptions, generate_pages_recursive
+from io_pipeline import PipelineStats, run_pipelined
+from parallel_build import BuildError, PageTask
+from test_support import TempDirTestCase, read_file, write_file
+
+
+class TestRunPipelined(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.tmp_dir
+        self.tasks = []
+        for i in range(20):
+            path = os.path.join(self.root, f"p{i}.md")
+            write_file(path, f"page {i}")
+            dest = os.path.join(self.root, "out", f"d{i % 3}", f"p{i}.html")
+            self.tasks.append(PageTask(f"p{i}.md", path, dest, None, 6))
+
+    def test_in_flight_limit_and_outputs(self):
+        stats = PipelineStats()
+
+        def render(task, source):
+            return len(source), [(task.dest_path, source.decode().upper())]
+
+        results, failures = run_pipelined(render, self.tasks, in_flight=3, stats=stats)
+        self.assertEqual(failures, [])
+        self.assertEqual(len(results), 20)
+        self.assertEqual((stats.read, stats.written), (20, 20))
+        self.assertLessEqual(stats.peak_in_flight, 3)
+        self.assertEqual(read_file(self.tasks[7].dest_path), "PAGE 7")
+
+    def test_failures_do_not_stop_the_pipeline(self):
+        os.remove(self.tasks[0].from_path)
+
+        def render(task, source):
+            if task.rel_path == "p1.md":
+                raise ValueError("bad page")
+            outputs = [(task.dest_path, "x")]
+            if task.rel_path == "p2.md":
+                # A directory where the page should be written.
+                os.makedirs(task.dest_path)
+            return None, outputs
+
+        results, failures = run_pipelined(render, self.tasks, in_flight=2)
+        self.assertEqual(len(results), 17)
+        self.assertEqual(
+            sorted(path for path, _ in failures),
+            sorted(task.from_path for task in self.tasks[:3]),
+        )
+        self.assertIn("ValueError: bad page", dict(failures)[self.tasks[1].from_path])
+
+    def test_read_limit(self):
+        seen = []
+        threads = set()
+
+        def render(task, source):
+            seen.append(source)
+            threads.add(threading.get_ident())
+            return None, []
+
+        run_pipelined(render, self.tasks, 4, 6)
+        self.assertEqual(seen, [None] * 20)
+        # Unread sources are left to render off the event loop thread.
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(len(threads), 1)
+
+
+class TestAsyncBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        root = self.tmp_dir
+        self.content = os.path.join(root, "content")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        for i in range(8):
+            rel_path = os.path.join("blog" if i % 2 else "", f"page{i}.md")
+            write_file(os.path.join(self.content, rel_path), f"# Page {i}\n\n" + "*text* " * i)
+        write_file(os.path.join(self.content, "big.md"), "# Big\n\n" + "> quote\n\n" * 200)
+        write_file(self.template, "<title>{{ Title }}</title>{{ Content }}")
+
+    def _read_tree(self, root):
+        tree = {}
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                tree[os.path.relpath(path, root)] = read_file(path)
+        return tree
+
+    def _build(self, name, in_flight=0, **kwargs):
+        dest = os.path.join(self.tmp_dir, name)
+        manifest = BuildManifest(os.path.join(self.tmp_dir, name + "-cache"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = generate_pages_recursive(
+                self.content,
+                self.template,
+                dest,
+                "/",
+                manifest,
+                BuildOptions(stream_threshold=1000, in_flight=in_flight),
+                **kwargs,
+            )
+        fragments = self._read_tree(manifest.fragments_dir)
+        return stats, self._read_tree(dest), fragments
+
+    def test_pipelined_output_matches_serial(self):
+        _, serial, serial_fragments = self._build("serial")
+        stats, pipelined, fragments = self._build("pipelined", in_flight=2)
+        self.assertEqual(stats.rebuilt, 9)
+        self.assertEqual(serial, pipelined)
+        self.assertEqual(serial_fragments, fragments)
+
+    def test_streamed_pages_with_block_cache(self):
+        _, serial, _ = self._build("serial")
+        block_cache = BlockCache(os.path.join(self.tmp_dir, "blocks.sqlite3"))
+        self.addCleanup(block_cache.close)
+        block_cache.begin()
+        # big.md is streamed on another thread, which needs its own connection.
+        stats, pipelined, _ = self._build("pipelined", in_flight=2, block_cache=block_cache)
+        self.assertEqual(stats.rebuilt, 9)
+        self.assertEqual(serial, pipelined)
+        cache_stats = block_cache.finish()
+        self.assertGreater(cache_stats.hits + cache_stats.misses, 200)
+
+    def test_pipelined_failures_are_aggregated(self):
+        write_file(os.path.join(self.content, "broken.md"), "no title here\n")
+        with self.assertRaises(BuildError) as ctx:
+            self._build("pipelined", in_flight=3)
+        self.assertEqual(len(ctx.exception.failures), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "pipelined", "broken.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
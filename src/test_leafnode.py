@@ -24,6 +24,13 @@ class TestLeafNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             node.to_html()
 
+    def test_leaf_is_slotted_without_children(self):
+        node = LeafNode("b", "bold")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIsNone(node.children)
+        with self.assertRaises(AttributeError):
+            node.children = []
+
 
 if __name__ == "__main__":
     unittest.main()
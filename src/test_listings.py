@@ -0,0 +1,137 @@
+import contextlib
+import io
+import os
+import unittest
+from unittest import mock
+
+from build_manifest import BuildManifest
+from generate_page import BuildOptions, generate_pages_recursive
+from listings import generate_listings
+from page_graph import PageGraph
+from page_index import PageIndex
+from parallel_build import BuildError
+from template_engine import load_template
+from test_support import TempDirTestCase, read_file, write_file
+
+
+class TestListings(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp_dir, "content")
+        self.dest = os.path.join(self.tmp_dir, "docs")
+        self.template = os.path.join(self.tmp_dir, "template.html")
+        write_file(self.template, "{{ Content }}")
+        cache = os.path.join(self.tmp_dir, "cache")
+        self.manifest = BuildManifest(cache)
+        self.index = PageIndex(os.path.join(cache, "pages.sqlite3"))
+        self.addCleanup(self.index.close)
+        self._write("blog.md", "---\ntitle: Posts\nlist: blog\nfeed: rss.xml\n---\n# Blog\n")
+        self._write("blog/old.md", "---\ndate: 2023-01-02\ntags: [x]\n---\n# Old & dusty\n")
+        self._write("blog/new/index.md", "---\ndate: 2024-06-01T08:30\n---\n# New\n")
+        self._write("blog/undated.md", "# Undated\n")
+        self._write("blog/wip.md", "---\ndraft: true\ndate: 2025-01-01\n---\n# WIP\n")
+
+    def _write(self, rel_path, text):
+        write_file(os.path.join(self.content, rel_path), text)
+
+    def _read(self, rel_path):
+        return read_file(os.path.join(self.dest, rel_path))
+
+    def _build(self, drafts=False, site_url="https://example.com"):
+        self.manifest.load()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = generate_pages_recursive(
+                self.content,
+                self.template,
+                self.dest,
+                "/site/",
+                self.manifest,
+                BuildOptions(drafts=drafts),
+                page_index=self.index,
+            )
+        template = load_template(self.template, "/site/")
+        listing_stats = generate_listings(
+            self.index, self.manifest, template, site_url, drafts
+        )
+        return stats, listing_stats
+
+    def test_listing_and_feed(self):
+        stats, listing_stats = self._build()
+        self.assertEqual((stats.rebuilt, stats.skipped), (4, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "wip.html")))
+        self.assertEqual(
+            self._read("blog.html"),
+            '<div><h1>Blog</h1><ul class="page-list">'
+            '<li><a href="/site/blog/new/">New</a> '
+            '<time datetime="2024-06-01T08:30">2024-06-01</time></li>'
+            '<li><a href="/site/blog/old.html">Old &amp; dusty</a> '
+            '<time datetime="2023-01-02">2023-01-02</time></li>'
+            '<li><a href="/site/blog/undated.html">Undated</a></li></ul></div>',
+        )
+        feed = self._read("rss.xml")
+        self.assertIn("<link>https://example.com/site/blog/new/</link>", feed)
+        self.assertIn("<pubDate>Sat, 01 Jun 2024 08:30:00 +0000</pubDate>", feed)
+        self.assertIn("<title>Old &amp; dusty</title>", feed)
+        self.assertNotIn("WIP", feed)
+        self.assertEqual((listing_stats.listings, listing_stats.written), (1, 2))
+
+        # Unchanged sources are listed from the index without being read.
+        with mock.patch("generate_page.read_page_meta") as read_page_meta:
+            stats, listing_stats = self._build()
+        read_page_meta.assert_not_called()
+        self.assertEqual((stats.skipped, listing_stats.written), (5, 0))
+
+    def test_drafts_and_stale_feeds(self):
+        self._build()
+        self._build(drafts=True)
+        self.assertIn("WIP", self._read("blog.html"))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "blog", "wip.html")))
+
+        self._write("blog.md", "---\nlist: blog\n---\n# Blog\n")
+        stats, listing_stats = self._build()
+        self.assertEqual(stats.removed, 1)
+        self.assertNotIn("WIP", self._read("blog.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "wip.html")))
+        self.assertEqual(listing_stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "rss.xml")))
+
+    def test_feeds_need_a_site_url(self):
+        self._build()
+        _, listing_stats = self._build(site_url="")
+        self.assertEqual(listing_stats.skipped_feeds, ["rss.xml"])
+        self.assertIn("1 feeds skipped", listing_stats.summary())
+        # The feed written with a site URL is stale now.
+        self.assertEqual(listing_stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "rss.xml")))
+
+    def test_feed_outside_the_output_directory(self):
+        self._build()
+        escape = os.path.join(self.tmp_dir, "escape.xml")
+        for feed in ("../escape.xml", escape, "sub/../../escape.xml"):
+            self._write("blog.md", f"---\nlist: blog\nfeed: {feed}\n---\n# Blog\n")
+            with self.assertRaises(BuildError) as ctx:
+                self._build()
+            self.assertEqual(ctx.exception.failures[0][0], "blog.md")
+            self.assertFalse(os.path.exists(escape))
+        self._write("blog.md", "---\nlist: blog\nfeed: feeds/blog.xml\n---\n# Blog\n")
+        self._build()
+        self.assertIn("<rss", self._read(os.path.join("feeds", "blog.xml")))
+
+    def test_listed_pages_are_in_the_page_graph(self):
+        self._build()
+        graph = PageGraph.from_manifest(self.manifest)
+        self.assertEqual(graph.referrers("/blog/new/"), ["blog.md"])
+        self.assertEqual(graph.check(set()), [])
+
+    def test_missing_index_is_rebuilt(self):
+        self._build()
+        self.index.close()
+        os.remove(self.index.path)
+        stats, _ = self._build()
+        self.assertEqual(stats.rebuilt, 0)
+        self.assertIn("Undated", self._read("blog.html"))
+        self.assertEqual(len(self.index.pages_under("blog")), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
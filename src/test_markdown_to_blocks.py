@@ -1,6 +1,14 @@
+import io
 import unittest
 
-from block_markdown import markdown_to_blocks
+from block_markdown import (
+    Block,
+    BlockType,
+    iter_markdown_blocks,
+    lex_blocks,
+    lex_markdown,
+    markdown_to_blocks,
+)
 
 
 class TestMarkdownToBlocks(unittest.TestCase):
@@ -32,6 +40,41 @@ This is the same paragraph on a new line
         md = "a\nb\nc\n\nx"
         self.assertEqual(markdown_to_blocks(md), ["a\nb\nc", "x"])
 
+    def test_iter_markdown_blocks_matches_split(self):
+        md = "\n\n# Heading\n\n\n\npara one\nline two\n  \nstill para\n\n- a\n- b\n"
+        self.assertEqual(list(iter_markdown_blocks(io.StringIO(md))), markdown_to_blocks(md))
+        self.assertEqual(list(iter_markdown_blocks(md.split("\n"))), markdown_to_blocks(md))
+
+    def test_fenced_code_keeps_blank_lines(self):
+        md = "intro\n\n```\ndef f():\n\n\n    return 1\n```\n\nafter"
+        self.assertEqual(
+            markdown_to_blocks(md), ["intro", "```\ndef f():\n\n\n    return 1\n```", "after"]
+        )
+        self.assertEqual(list(iter_markdown_blocks(io.StringIO(md))), markdown_to_blocks(md))
+
+    def test_unclosed_fence_splits_on_blank_lines(self):
+        md = "```\na\n\nb\n\n  \nc"
+        self.assertEqual(markdown_to_blocks(md), ["```\na", "b", "c"])
+        self.assertEqual(list(iter_markdown_blocks(md.split("\n"))), markdown_to_blocks(md))
+
+    def test_lex_markdown_strips_markers(self):
+        md = "## Title\n\n> a\n>b\n\n- x\n- \n- y\n\n1. one\n2. two\n\n```\ncode\n```\n\ntext"
+        self.assertEqual(
+            list(lex_markdown(md)),
+            [
+                Block(BlockType.HEADING, "## Title", ["Title"], 2),
+                Block(BlockType.QUOTE, "> a\n>b", ["a\nb"]),
+                Block(BlockType.UNORDERED_LIST, "- x\n- \n- y", ["x", "y"]),
+                Block(BlockType.ORDERED_LIST, "1. one\n2. two", ["one", "two"]),
+                Block(BlockType.CODE, "```\ncode\n```", ["code\n"]),
+                Block(BlockType.PARAGRAPH, "text", ["text"]),
+            ],
+        )
+
+    def test_lex_blocks_matches_lex_markdown(self):
+        md = "  ```py\nx = 1\n\n\n\ny = 2  \n```\nnot a new block\n\n- a\n-b\n\n```x```\n\nz"
+        self.assertEqual(list(lex_blocks(io.StringIO(md))), list(lex_markdown(md)))
+
 
 if __name__ == "__main__":
     unittest.main()
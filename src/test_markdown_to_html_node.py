@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from markdown_to_html import markdown_to_html_node
+from markdown_to_html import iter_markdown_html, markdown_to_html_node
 
 
 class TestMarkdownToHtmlNode(unittest.TestCase):
@@ -34,6 +35,13 @@ the **same** even with inline stuff
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+    def test_codeblock_with_blank_lines(self):
+        md = "```\nfirst _line_\n\nafter a blank line\n```\n\nText"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><pre><code>first _line_\n\nafter a blank line\n</code></pre><p>Text</p></div>",
+        )
+
     def test_heading_quote_and_lists_smoke(self):
         md = """
 # Hello **world**
@@ -53,6 +61,23 @@ the **same** even with inline stuff
             '<div><h1>Hello <b>world</b></h1><blockquote>a quote line and <i>another</i></blockquote><ul><li>first</li><li>second with a <a href="https://example.com">link</a></li></ul><ol><li>one</li><li>two</li></ol></div>',
         )
 
+    def test_iter_markdown_html_matches_tree(self):
+        md = "# Title\n\nSome **bold** text\n\n```\ncode\n```\n\n> quote\n\n1. one\n2. two\n"
+        chunks = list(iter_markdown_html(io.StringIO(md)))
+        self.assertEqual(len(chunks), 7)
+        self.assertEqual("".join(chunks), markdown_to_html_node(md).to_html())
+
+    def test_basepath_applied_to_urls_not_code(self):
+        md = '[home](/) ![logo](/logo.png) [ext](https://x.y)\n\n```\n<a href="/raw">\n```'
+        html = markdown_to_html_node(md, "/site/").to_html()
+        self.assertEqual(
+            html,
+            '<div><p><a href="/site/">home</a> <img src="/site/logo.png" alt="logo"></img> '
+            '<a href="https://x.y">ext</a></p><pre><code><a href="/raw">\n</code></pre></div>',
+        )
+        chunks = iter_markdown_html(io.StringIO(md), "/site/")
+        self.assertEqual("".join(chunks), html)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,165 @@
+import contextlib
+import io
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import main
+from generate_page import BuildOptions, generate_pages_recursive
+from output_tree import StagedOutput, _exchange, copy_if_changed, write_if_changed
+from test_support import TempDirTestCase, read_file
+
+
+class TestOutputTree(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.tmp_dir
+        self.docs = os.path.join(self.root, "docs")
+
+    def test_write_if_changed(self):
+        path = os.path.join(self.root, "out", "a.html")
+        self.assertTrue(write_if_changed(path, "<p>a</p>"))
+        inode = os.stat(path).st_ino
+        self.assertFalse(write_if_changed(path, "<p>a</p>"))
+        self.assertFalse(write_if_changed(path, b"<p>a</p>"))
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertTrue(write_if_changed(path, "<p>b</p>"))
+        self.assertEqual(read_file(path), "<p>b</p>")
+
+        copy = os.path.join(self.root, "copy", "a.html")
+        self.assertTrue(copy_if_changed(path, copy))
+        self.assertFalse(copy_if_changed(path, copy))
+
+    def test_concurrent_writers_of_one_path(self):
+        path = os.path.join(self.root, "out", "a.html")
+        copy = os.path.join(self.root, "copy.html")
+
+        def write(i):
+            write_if_changed(path, "ab"[i % 2] * 1000)
+            copy_if_changed(path, copy)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(write, range(400)))
+        self.assertIn(read_file(path), ("a" * 1000, "b" * 1000))
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["a.html"])
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o666 & ~umask)
+
+    def test_staged_build_leaves_live_tree_alone(self):
+        for name, text in (("keep.html", "keep"), ("edit.html", "old"), ("gone.html", "gone")):
+            write_if_changed(os.path.join(self.docs, name), text)
+        output = StagedOutput(self.docs)
+        staging = output.begin()
+
+        write_if_changed(os.path.join(staging, "keep.html"), "keep")
+        write_if_changed(os.path.join(staging, "edit.html"), "new")
+        write_if_changed(os.path.join(staging, "sub", "new.html"), "new")
+        os.remove(os.path.join(staging, "gone.html"))
+        # The live tree is untouched until commit, hardlinks notwithstanding.
+        self.assertEqual(read_file(os.path.join(self.docs, "edit.html")), "old")
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "gone.html")))
+
+        changes = output.commit()
+        self.assertEqual(
+            (changes.added, changes.modified, changes.deleted),
+            (["sub/new.html"], ["edit.html"], ["gone.html"]),
+        )
+        self.assertEqual(read_file(os.path.join(self.docs, "edit.html")), "new")
+        self.assertEqual(sorted(os.listdir(self.root)), ["docs"])
+
+    def test_swap_with_and_without_exchange(self):
+        # Without renameat2, commit falls back to two renames.
+        write_if_changed(os.path.join(self.docs, "a.html"), "old")
+        output = StagedOutput(self.docs)
+        with mock.patch("output_tree._exchange", return_value=False):
+            write_if_changed(os.path.join(output.begin(), "a.html"), "new")
+            self.assertEqual(output.commit().modified, ["a.html"])
+        self.assertEqual(read_file(os.path.join(self.docs, "a.html")), "new")
+        self.assertEqual(os.listdir(self.root), ["docs"])
+
+        a, b = os.path.join(self.root, "a"), os.path.join(self.root, "b")
+        write_if_changed(os.path.join(a, "x"), "a")
+        write_if_changed(os.path.join(b, "x"), "b")
+        if not _exchange(a, b):
+            self.skipTest("renameat2(RENAME_EXCHANGE) not supported here")
+        self.assertEqual(read_file(os.path.join(a, "x")), "b")
+        self.assertEqual(read_file(os.path.join(b, "x")), "a")
+
+    def test_fresh_stage_and_abort(self):
+        write_if_changed(os.path.join(self.docs, "a.html"), "a")
+        output = StagedOutput(self.docs)
+        staging = output.begin(fresh=True)
+        self.assertEqual(os.listdir(staging), [])
+        write_if_changed(os.path.join(staging, "a.html"), "a")
+        write_if_changed(os.path.join(staging, "b.html"), "b")
+        # Rewritten with the same bytes: not a modification.
+        self.assertEqual(output.changes().modified, [])
+        self.assertEqual(output.changes().added, ["b.html"])
+
+        output.abort()
+        self.assertEqual(sorted(os.listdir(self.root)), ["docs"])
+        self.assertEqual(os.listdir(self.docs), ["a.html"])
+
+    def test_unchanged_pages_are_not_rewritten(self):
+        content = os.path.join(self.root, "content")
+        os.makedirs(content)
+        for name in ("a", "b"):
+            write_if_changed(os.path.join(content, f"{name}.md"), f"# {name}\n\ntext\n")
+        template = os.path.join(self.root, "template.html")
+        write_if_changed(template, "{{ Title }}{{ Content }}")
+        names = ("a.html", "b.html")
+        inodes = []
+        # Streamed, then in memory: neither rewrites the unchanged page.
+        for stream_threshold in (0, 1 << 20):
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(
+                    content,
+                    template,
+                    self.docs,
+                    "/",
+                    options=BuildOptions(stream_threshold=stream_threshold),
+                )
+            inodes.append([os.stat(os.path.join(self.docs, name)).st_ino for name in names])
+            write_if_changed(os.path.join(content, "b.md"), "# b\n\nchanged\n")
+        self.assertEqual(inodes[1][0], inodes[0][0])
+        self.assertNotEqual(inodes[1][1], inodes[0][1])
+
+    def test_failed_build_does_not_poison_the_next(self):
+        content = os.path.join(self.root, "content")
+        write_if_changed(os.path.join(self.root, "template.html"), "{{ Content }}")
+        write_if_changed(os.path.join(content, "a.md"), "# a\n\nold\n")
+        write_if_changed(os.path.join(content, "b.md"), "# b\n")
+
+        def build():
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                with contextlib.redirect_stderr(io.StringIO()):
+                    main.main(["--project-root", self.root, "/"])
+            return out.getvalue()
+
+        build()
+        write_if_changed(os.path.join(content, "a.md"), "# a\n\nnew\n")
+        write_if_changed(os.path.join(content, "c.md"), "no title\n")
+        with self.assertRaises(SystemExit):
+            build()
+        self.assertIn("old", read_file(os.path.join(self.docs, "a.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "c.html")))
+
+        write_if_changed(os.path.join(content, "c.md"), "# c\n")
+        self.assertIn("2 rebuilt, 0 re-templated, 1 skipped", build())
+        self.assertIn("new", read_file(os.path.join(self.docs, "a.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "c.html")))
+
+        # Interrupted after the manifest was saved, outside any page.
+        write_if_changed(os.path.join(content, "a.md"), "# a\n\nnewer\n")
+        with mock.patch("main.remove_precompressed", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                build()
+        self.assertIn("<p>new</p>", read_file(os.path.join(self.docs, "a.html")))
+        self.assertIn("1 rebuilt, 0 re-templated, 2 skipped", build())
+        self.assertIn("newer", read_file(os.path.join(self.docs, "a.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from build_manifest import BuildManifest
+from generate_page import BuildOptions, generate_pages_recursive
+from page_graph import IMAGE, LINK, BrokenRef, PageGraph, PageRefs, page_url
+from test_support import write_file
+
+
+class TestPageGraph(unittest.TestCase):
+    def test_page_refs_skip_code(self):
+        refs = PageRefs()
+        for block in (
+            "# See [home](/)",
+            "- [one](/blog/one/)\n- ![pic](/images/a.png)",
+            "```\n[not a link](/code)\n```",
+            "> quote with [a link](https://example.com)",
+            "`[code](/x)` and [real](/y)",
+        ):
+            refs.add_block(block)
+        self.assertEqual(refs.links, ["/", "/blog/one/", "https://example.com", "/y"])
+        self.assertEqual(refs.images, ["/images/a.png"])
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.md"), "/")
+        self.assertEqual(page_url(os.path.join("blog", "tom", "index.md")), "/blog/tom/")
+        self.assertEqual(page_url("about.md"), "/about.html")
+
+    def test_resolve(self):
+        page = os.path.join("blog", "majesty", "index.md")
+        self.assertEqual(PageGraph.resolve("../tom/#top", page), "/blog/tom")
+        self.assertEqual(PageGraph.resolve("/images/a%20b.png?v=1", page), "/images/a b.png")
+        for url in ("https://example.com/", "//cdn.example.com/x.js", "mailto:a@b.c", "#top"):
+            self.assertIsNone(PageGraph.resolve(url, page))
+
+    def test_check_and_referrers(self):
+        graph = PageGraph(
+            {
+                "index.md": {"title": "Home", "links": ["/blog/a", "/gone"], "images": []},
+                "blog/a/index.md": {
+                    "title": "A",
+                    "links": ["../../", "https://example.com"],
+                    "images": ["/images/a.png", "/images/missing.png"],
+                },
+                "about.md": {"title": "About", "links": ["/blog/a/index.html"], "images": []},
+            }
+        )
+        self.assertEqual(
+            graph.check({"/images/a.png"}),
+            [
+                BrokenRef("blog/a/index.md", IMAGE, "/images/missing.png"),
+                BrokenRef("index.md", LINK, "/gone"),
+            ],
+        )
+        self.assertEqual(graph.referrers("/blog/a/"), ["about.md", "index.md"])
+        self.assertEqual(graph.referrers("/"), ["blog/a/index.md"])
+        self.assertEqual(graph.referrers("/images/a.png"), ["blog/a/index.md"])
+        self.assertEqual(graph.referrers("/about.html"), [])
+
+    def test_graph_recorded_by_build(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            os.makedirs(os.path.join(content, "blog"))
+            pages = {
+                "index.md": "# Home\n\n[blog](/blog/post.html)\n",
+                os.path.join("blog", "post.md"): "# Post\n\n![pic](/pic.png) [home](/)\n",
+            }
+            for rel_path, text in pages.items():
+                write_file(os.path.join(content, rel_path), text)
+            template = os.path.join(tmp, "template.html")
+            write_file(template, "{{ Content }}")
+            manifest = BuildManifest(os.path.join(tmp, "cache"))
+            dest = os.path.join(tmp, "docs")
+            for stream_threshold in (0, 1 << 20):
+                manifest.load()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_pages_recursive(
+                        content,
+                        template,
+                        dest,
+                        "/",
+                        manifest,
+                        BuildOptions(stream_threshold=stream_threshold),
+                        only={"index.md"} if stream_threshold else None,
+                    )
+                manifest.save()
+                graph = PageGraph.from_manifest(manifest)
+                self.assertEqual(graph.referrers("/blog/post.html"), ["index.md"])
+                self.assertEqual(graph.referrers("/pic.png"), [os.path.join("blog", "post.md")])
+                self.assertEqual(graph.check({"/pic.png"}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
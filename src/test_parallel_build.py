@@ -0,0 +1,106 @@
+import contextlib
+import io
+import os
+import unittest
+
+from block_cache import BlockCache
+from generate_page import BuildOptions, generate_pages_recursive
+from parallel_build import BuildError, PageTask, chunk_tasks
+from test_support import TempDirTestCase, read_file, write_file
+
+
+class TestChunkTasks(unittest.TestCase):
+    def test_largest_first_and_all_tasks_kept(self):
+        tasks = [
+            PageTask(f"p{i}.md", f"p{i}.md", f"p{i}.html", None, size)
+            for i, size in enumerate([5, 50, 1, 20])
+        ]
+        chunks = chunk_tasks(tasks, jobs=1)
+        ordered = [task.size for chunk in chunks for task in chunk]
+        self.assertEqual(ordered, [50, 20, 5, 1])
+
+
+class TestParallelBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        root = self.tmp_dir
+        self.content = os.path.join(root, "content")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(self.content)
+        for i in range(6):
+            write_file(os.path.join(self.content, f"page{i}.md"), f"# Page {i}\n\n" + "text " * i)
+        write_file(self.template, "<title>{{ Title }}</title>{{ Content }}")
+
+    def _read_tree(self, root):
+        tree = {}
+        for name in sorted(os.listdir(root)):
+            tree[name] = read_file(os.path.join(root, name))
+        return tree
+
+    def test_parallel_output_matches_serial(self):
+        serial = os.path.join(self.tmp_dir, "serial")
+        parallel = os.path.join(self.tmp_dir, "parallel")
+        generate_pages_recursive(self.content, self.template, serial, "/")
+        stats = generate_pages_recursive(
+            self.content, self.template, parallel, "/", options=BuildOptions(jobs=3)
+        )
+        self.assertEqual(stats.rebuilt, 6)
+        self.assertEqual(self._read_tree(serial), self._read_tree(parallel))
+
+    def test_parallel_messages_in_page_order(self):
+        def build(dest, jobs):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                generate_pages_recursive(
+                    self.content, self.template, dest, "/", options=BuildOptions(jobs=jobs)
+                )
+            return output.getvalue().replace(dest, "DEST")
+
+        serial = build(os.path.join(self.tmp_dir, "serial"), 1)
+        parallel = build(os.path.join(self.tmp_dir, "parallel"), 3)
+        self.assertEqual(serial.count("Generating page"), 6)
+        self.assertEqual(parallel, serial)
+
+    def test_streamed_output_matches_in_memory(self):
+        in_memory = os.path.join(self.tmp_dir, "in_memory")
+        streamed = os.path.join(self.tmp_dir, "streamed")
+        generate_pages_recursive(self.content, self.template, in_memory, "/")
+        generate_pages_recursive(
+            self.content, self.template, streamed, "/", options=BuildOptions(stream_threshold=0)
+        )
+        self.assertEqual(self._read_tree(in_memory), self._read_tree(streamed))
+
+    def test_block_cache_shared_by_workers(self):
+        serial = os.path.join(self.tmp_dir, "serial")
+        generate_pages_recursive(self.content, self.template, serial, "/")
+        cache = BlockCache(os.path.join(self.tmp_dir, "blocks.sqlite3"))
+        for name in ("cold", "warm"):
+            cache.begin()
+            docs = os.path.join(self.tmp_dir, name)
+            generate_pages_recursive(
+                self.content,
+                self.template,
+                docs,
+                "/",
+                options=BuildOptions(jobs=2),
+                block_cache=cache,
+            )
+            self.assertEqual(self._read_tree(serial), self._read_tree(docs))
+        stats = cache.finish()
+        self.assertEqual((stats.hits, stats.misses), (11, 0))
+
+    def test_failures_are_aggregated(self):
+        write_file(os.path.join(self.content, "bad1.md"), "no title here")
+        write_file(os.path.join(self.content, "bad2.md"), "# Title\n\nunclosed **bold")
+        docs = os.path.join(self.tmp_dir, "docs")
+        with self.assertRaises(BuildError) as ctx:
+            generate_pages_recursive(
+                self.content, self.template, docs, "/", options=BuildOptions(jobs=2)
+            )
+        failed = [os.path.basename(path) for path, _ in ctx.exception.failures]
+        self.assertEqual(failed, ["bad1.md", "bad2.md"])
+        self.assertEqual(len(os.listdir(docs)), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
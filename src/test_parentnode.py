@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from leafnode import LeafNode
@@ -56,6 +57,27 @@ class TestParentNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             parent_node.to_html()
 
+    def test_iter_html_yields_one_chunk_per_child(self):
+        node = ParentNode(
+            "div",
+            [ParentNode("p", [LeafNode("b", "x")]), LeafNode("p", "y")],
+            {"class": "c"},
+        )
+        chunks = list(node.iter_html())
+        self.assertEqual(chunks, ['<div class="c">', "<p><b>x</b></p>", "<p>y</p>", "</div>"])
+        self.assertEqual("".join(chunks), node.to_html())
+
+    def test_write_to_streams_html(self):
+        node = ParentNode("div", [LeafNode("span", "child")])
+        out = io.StringIO()
+        written = node.write_to(out)
+        self.assertEqual(out.getvalue(), "<div><span>child</span></div>")
+        self.assertEqual(written, len(out.getvalue()))
+
+    def test_iter_html_raises_when_no_tag(self):
+        with self.assertRaises(ValueError):
+            list(ParentNode(None, []).iter_html())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,81 @@
+import gzip
+import os
+import random
+import unittest
+from unittest import mock
+
+from precompress import precompress_directory, remove_precompressed
+from test_support import TempDirTestCase, write_file
+
+
+class TestPrecompress(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.tmp_dir, "docs")
+        self.state = os.path.join(self.tmp_dir, "cache", "precompressed.json")
+        os.makedirs(os.path.join(self.root, "blog"))
+        self._write("index.html", "<p>hello</p>" * 200)
+        self._write(os.path.join("blog", "index.html"), "<p>post</p>" * 200)
+        self._write("index.css", "body {}")
+        self._write("image.png", "x" * 4096)
+
+    def _write(self, rel_path, text):
+        write_file(os.path.join(self.root, rel_path), text)
+
+    def _gz(self, rel_path):
+        return os.path.join(self.root, rel_path + ".gz")
+
+    def test_compresses_text_files_above_threshold(self):
+        stats = precompress_directory(self.root, self.state, min_bytes=1024)
+        self.assertEqual((stats.compressed, stats.too_small), (2, 1))
+        with gzip.open(self._gz("index.html"), "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 200)
+        self.assertFalse(os.path.exists(self._gz("index.css")))
+        self.assertFalse(os.path.exists(self._gz("image.png")))
+
+    def test_up_to_date_files_are_skipped(self):
+        precompress_directory(self.root, self.state, threads=1)
+        stats = precompress_directory(self.root, self.state, threads=1)
+        self.assertEqual((stats.compressed, stats.skipped), (0, 2))
+
+        self._write("index.html", "<p>changed</p>" * 200)
+        os.utime(os.path.join(self.root, "index.html"), ns=(1, 1))
+        stats = precompress_directory(self.root, self.state, threads=1)
+        self.assertEqual((stats.compressed, stats.skipped), (1, 1))
+
+    def test_incompressible_file_gets_no_gz(self):
+        with open(os.path.join(self.root, "random.js"), "wb") as f:
+            f.write(random.Random(0).randbytes(2048))
+        precompress_directory(self.root, self.state, min_bytes=1024)
+        self.assertFalse(os.path.exists(self._gz("random.js")))
+
+        # Remembered as not worth compressing until it changes.
+        with mock.patch("precompress._compress_file") as compress_file:
+            stats = precompress_directory(self.root, self.state, threads=1)
+        compress_file.assert_not_called()
+        self.assertEqual((stats.skipped, stats.too_small), (2, 2))
+        os.utime(os.path.join(self.root, "random.js"), ns=(1, 1))
+        stats = precompress_directory(self.root, self.state, threads=1)
+        self.assertEqual(stats.too_small, 2)
+        with mock.patch("precompress._compress_file") as compress_file:
+            precompress_directory(self.root, self.state, threads=1)
+        compress_file.assert_not_called()
+
+    def test_stale_gz_is_removed(self):
+        precompress_directory(self.root, self.state)
+        os.remove(os.path.join(self.root, "blog", "index.html"))
+        stats = precompress_directory(self.root, self.state)
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(self._gz(os.path.join("blog", "index.html"))))
+
+    def test_remove_precompressed(self):
+        precompress_directory(self.root, self.state)
+        stats = remove_precompressed(self.root, self.state)
+        self.assertEqual(stats.removed, 2)
+        self.assertFalse(os.path.exists(self._gz("index.html")))
+        self.assertFalse(os.path.exists(self.state))
+        self.assertEqual(remove_precompressed(self.root, self.state).removed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from serve import PageRenderer, RenderCache, make_server
+from test_support import TempDirTestCase, write_file
+
+
+class TestRenderCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = RenderCache(max_bytes=10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.get("a")
+        cache.put("c", b"1234")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"1234")
+        self.assertEqual(cache.size, 8)
+
+    def test_oversized_value_not_cached(self):
+        cache = RenderCache(max_bytes=2)
+        cache.put("a", b"123")
+        self.assertEqual(len(cache), 0)
+
+
+class ServeTestCase(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        root = self.tmp_dir
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog", "post"))
+        os.makedirs(self.static)
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post)")
+        write_file(os.path.join(self.content, "blog", "post", "index.md"), "# Post\n\nbody")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(self.template, "<title>{{ Title }}</title>{{ Content }}")
+
+
+class TestPageRenderer(ServeTestCase):
+    def test_resolve(self):
+        renderer = PageRenderer(self.content, self.template, "/site/")
+        index = os.path.join(self.content, "index.md")
+        post = os.path.join(self.content, "blog", "post", "index.md")
+        self.assertEqual(renderer.resolve("/site/"), index)
+        self.assertEqual(renderer.resolve("/site/blog/post/"), post)
+        self.assertEqual(renderer.resolve("/site/blog/post/index.html?x=1"), post)
+        self.assertIsNone(renderer.resolve("/site/index.css"))
+        self.assertIsNone(renderer.resolve("/site/../../etc/passwd"))
+
+    def test_render_is_cached_until_source_changes(self):
+        renderer = PageRenderer(self.content, self.template, "/site/")
+        index = os.path.join(self.content, "index.md")
+        first = renderer.render(index)
+        self.assertIn(b'href="/site/blog/post"', first)
+        self.assertIs(renderer.render(index), first)
+        self.assertEqual(renderer.cache.hits, 1)
+
+        write_file(index, "# Home\n\nchanged text")
+        self.assertIn(b"changed text", renderer.render(index))
+
+
+class TestPreviewServer(ServeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = make_server(self.content, self.static, self.template, "/", "127.0.0.1", 0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def _get(self, path):
+        with urllib.request.urlopen(self.base + path) as response:
+            return response.read().decode("utf-8")
+
+    def test_serves_rendered_pages_and_static_files(self):
+        self.assertEqual(
+            self._get("/blog/post/"), "<title>Post</title><div><h1>Post</h1><p>body</p></div>"
+        )
+        self.assertEqual(self._get("/index.css"), "body {}")
+        self.assertIn("<h1>Post</h1>", self._get("/blog/post"))
+
+    def test_missing_page_is_404(self):
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self._get("/nope/")
+        self.assertEqual(ctx.exception.code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
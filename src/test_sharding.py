@@ -0,0 +1,147 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+
+from build_manifest import BuildManifest
+from generate_page import BuildOptions, generate_pages_recursive
+from sharding import (
+    SHARD_INFO_FILENAME,
+    ShardMergeError,
+    merge_shards,
+    parse_shard,
+    shard_dir,
+    shard_of,
+    write_shard_info,
+)
+from test_support import TempDirTestCase, read_file, write_file
+
+
+class TestShardOf(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/3"), (2, 3))
+        for value in ("0/3", "4/3", "1", "a/b", "1/0"):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_stable_and_spread(self):
+        paths = [os.path.join("blog", f"post{i}", "index.md") for i in range(300)]
+        shards = [shard_of(path, 4) for path in paths]
+        self.assertEqual(shards, [shard_of(path, 4) for path in paths])
+        self.assertEqual(shard_of("blog/post0/index.md", 4), shard_of(paths[0], 4))
+        for index in range(1, 5):
+            self.assertGreater(shards.count(index), 40)
+
+
+class TestMergeShards(TempDirTestCase):
+    COUNT = 3
+
+    def setUp(self):
+        super().setUp()
+        root = self.tmp_dir
+        self.content = os.path.join(root, "content")
+        self.template = os.path.join(root, "template.html")
+        self.shards = os.path.join(root, "shards")
+        self.rel_paths = set()
+        for i in range(12):
+            rel_path = os.path.join(f"section{i % 3}", f"page{i}.md")
+            path = os.path.join(self.content, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_file(path, f"# Page {i}\n\n[home](/)\n")
+            self.rel_paths.add(rel_path)
+        write_file(self.template, "<title>{{ Title }}</title>{{ Content }}")
+
+    def _build(self, dest, manifest, shard=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generate_pages_recursive(
+                self.content, self.template, dest, "/", manifest, BuildOptions(shard=shard)
+            )
+
+    def _build_shards(self):
+        for index in range(1, self.COUNT + 1):
+            root = shard_dir(self.shards, index, self.COUNT)
+            manifest = BuildManifest(os.path.join(root, "cache"))
+            self._build(os.path.join(root, "docs"), manifest, (index, self.COUNT))
+            write_shard_info(
+                os.path.join(root, SHARD_INFO_FILENAME), index, self.COUNT, manifest
+            )
+
+    def _read_tree(self, root):
+        tree = {}
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                tree[os.path.relpath(path, root)] = read_file(path)
+        return tree
+
+    def test_merge_matches_unsharded_build(self):
+        full = os.path.join(self.tmp_dir, "full")
+        self._build(full, None)
+        self._build_shards()
+
+        docs = os.path.join(self.tmp_dir, "docs")
+        manifest = BuildManifest(os.path.join(self.tmp_dir, "cache"))
+        stats = merge_shards(self.shards, self.COUNT, self.rel_paths, docs, manifest)
+        self.assertEqual(stats.pages, 12)
+        self.assertEqual(self._read_tree(docs), self._read_tree(full))
+
+        # The merged manifest makes a normal build skip every page.
+        manifest.load()
+        self.assertEqual(self._build(docs, manifest).skipped, 12)
+
+    def test_missing_and_duplicate_pages(self):
+        self._build_shards()
+        root = shard_dir(self.shards, 1, self.COUNT)
+        # Shard 1 also claims a page of shard 2, and shard 3 lost one.
+        shard_one = BuildManifest(os.path.join(root, "cache"))
+        shard_one.load()
+        shard_two = BuildManifest(os.path.join(shard_dir(self.shards, 2, self.COUNT), "cache"))
+        shard_two.load()
+        stolen = sorted(shard_two.pages)[0]
+        shard_one.pages[stolen] = shard_two.pages[stolen]
+        shard_one.save()
+        write_shard_info(os.path.join(root, SHARD_INFO_FILENAME), 1, self.COUNT, shard_one)
+        info_path = os.path.join(shard_dir(self.shards, 3, self.COUNT), SHARD_INFO_FILENAME)
+        shard_three = BuildManifest(os.path.join(os.path.dirname(info_path), "cache"))
+        shard_three.load()
+        lost = sorted(shard_three.pages)[0]
+        del shard_three.pages[lost]
+        shard_three.save()
+        write_shard_info(info_path, 3, self.COUNT, shard_three)
+
+        docs = os.path.join(self.tmp_dir, "docs")
+        manifest = BuildManifest(os.path.join(self.tmp_dir, "cache"))
+        with self.assertRaises(ShardMergeError) as ctx:
+            merge_shards(self.shards, self.COUNT, self.rel_paths, docs, manifest)
+        self.assertEqual(
+            ctx.exception.problems,
+            [
+                f"{stolen}: built by shards 1, 2",
+                f"{lost}: not built by any shard",
+                f"{stolen}: output missing from shard 1",
+            ],
+        )
+        self.assertFalse(os.path.exists(docs))
+
+    def test_shard_for_another_count(self):
+        self._build_shards()
+        info_path = os.path.join(shard_dir(self.shards, 2, self.COUNT), SHARD_INFO_FILENAME)
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        info["count"] = 4
+        with open(info_path, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        with self.assertRaises(ShardMergeError) as ctx:
+            merge_shards(
+                self.shards,
+                self.COUNT,
+                self.rel_paths,
+                os.path.join(self.tmp_dir, "docs"),
+                BuildManifest(os.path.join(self.tmp_dir, "cache")),
+            )
+        self.assertEqual(ctx.exception.problems, ["shard 2/3: directory holds shard 2/4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
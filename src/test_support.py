@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+
+
+def write_file(path: str, data) -> str:
+    """
+    Write text (or bytes) to path, creating its directory. Returns path.
+    """
+    os.makedirs(os.path.dirname(path) or os.curdir, exist_ok=True)
+    if isinstance(data, bytes):
+        with open(path, "wb") as f:
+            f.write(data)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+    return path
+
+
+def read_file(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class TempDirTestCase(unittest.TestCase):
+    """
+    A test case with a fresh temporary directory, tmp_dir, for every test.
+    Subclasses overriding setUp must call super().setUp() first.
+    """
+
+    def setUp(self):
+        self.tmp_dir = self.enterContext(tempfile.TemporaryDirectory())
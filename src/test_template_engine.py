@@ -0,0 +1,56 @@
+import io
+import os
+import tempfile
+import unittest
+
+from template_engine import CompiledTemplate, load_template, rewrite_urls
+from test_support import write_file
+
+
+class TestCompiledTemplate(unittest.TestCase):
+    def test_render_fills_placeholders(self):
+        template = CompiledTemplate("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(
+            template.render({"Title": "Hi", "Content": "<p>x</p>"}),
+            "<title>Hi</title><main><p>x</p></main>",
+        )
+
+    def test_placeholders_listed_in_order(self):
+        template = CompiledTemplate("{{ A }}-{{ B }}-{{ A }}")
+        self.assertEqual(template.placeholders, ["A", "B", "A"])
+
+    def test_additional_placeholder(self):
+        template = CompiledTemplate("<p>{{ Date }}</p>")
+        self.assertEqual(template.render({"Date": "2024-01-01"}), "<p>2024-01-01</p>")
+
+    def test_missing_placeholder_left_verbatim(self):
+        template = CompiledTemplate("{{ Title }} {{ Unknown }}")
+        self.assertEqual(template.render({"Title": "T"}), "T {{ Unknown }}")
+
+    def test_basepath_applied_to_literals_only(self):
+        template = CompiledTemplate('<link href="/index.css" />{{ Content }}', "/site/")
+        self.assertEqual(
+            template.render({"Content": '<code>src="/a.png"</code>'}),
+            '<link href="/site/index.css" /><code>src="/a.png"</code>',
+        )
+
+    def test_write_to_streams_chunked_values(self):
+        template = CompiledTemplate("<main>{{ Content }}</main>", "/site/")
+        out = io.StringIO()
+        template.write_to(out, {"Content": iter(['<a href="/a">', "x</a>"])})
+        self.assertEqual(out.getvalue(), '<main><a href="/a">x</a></main>')
+
+    def test_rewrite_urls_default_basepath_is_noop(self):
+        html = '<a href="/x">'
+        self.assertIs(rewrite_urls(html, "/"), html)
+
+    def test_load_template_reuses_compiled_template(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            write_file(path, "{{ Title }}")
+            self.assertIs(load_template(path, "/"), load_template(path, "/"))
+            self.assertIsNot(load_template(path, "/"), load_template(path, "/x/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
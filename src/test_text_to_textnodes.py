@@ -1,6 +1,6 @@
 import unittest
 
-from inline_markdown import text_to_textnodes
+from inline_markdown import _text_to_textnodes_multipass, text_to_textnodes
 from textnode import TextNode, TextType
 
 
@@ -31,6 +31,28 @@ class TestTextToTextNodes(unittest.TestCase):
         text = "just plain text"
         self.assertListEqual([TextNode("just plain text", TextType.TEXT)], text_to_textnodes(text))
 
+    def test_text_to_textnodes_empty(self):
+        self.assertListEqual([], text_to_textnodes(""))
+
+    def test_text_to_textnodes_unclosed_delimiter_raises(self):
+        for text in ["a **b", "a _b", "a `b", "**a _b** c_"]:
+            with self.assertRaises(Exception):
+                text_to_textnodes(text)
+
+    def test_text_to_textnodes_matches_multipass(self):
+        cases = [
+            "**a _b_** _c `d`_ `e` x",
+            "a ![img](u) and [link](v)!",
+            "![[a](b) and !![c](d)",
+            "[a](x![b](y) tail",
+            "[a_b](c_d)",
+            "***x*** and * single",
+            "****empty bold and __ empty italic",
+            "[link](**not bold**)",
+        ]
+        for text in cases:
+            self.assertListEqual(_text_to_textnodes_multipass(text), text_to_textnodes(text), text)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -44,5 +44,13 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", TextType.LINK, "https://www.example.com")
         self.assertNotEqual(node, node2)
 
+    def test_string_text_type_is_normalized(self):
+        node = TextNode("This is a text node", "bold")
+        self.assertIs(node.text_type, TextType.BOLD)
+        self.assertEqual(node, TextNode("This is a text node", TextType.BOLD))
+
+    def test_unknown_text_type_is_kept(self):
+        self.assertEqual(TextNode("x", "unknown").text_type, "unknown")
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
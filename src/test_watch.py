@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from build_manifest import BuildManifest
+from generate_page import generate_pages_recursive
+from test_support import TempDirTestCase, write_file
+from watch import (
+    EVERYTHING,
+    InotifyWatcher,
+    PollingWatcher,
+    classify_changes,
+    collect_changes,
+)
+
+
+class TestClassifyChanges(unittest.TestCase):
+    def test_classifies_pages_assets_and_template(self):
+        changes = classify_changes(
+            {"/site/content/blog/a.md", "/site/content/notes.txt", "/site/static/x.css"},
+            "/site/content",
+            "/site/static",
+            "/site/template.html",
+        )
+        self.assertEqual(changes.pages, {os.path.join("blog", "a.md")})
+        self.assertTrue(changes.assets)
+        self.assertFalse(changes.template)
+
+    def test_template_change(self):
+        changes = classify_changes(
+            {"/site/template.html", "/site/readme.md"},
+            "/site/content",
+            "/site/static",
+            "/site/template.html",
+        )
+        self.assertTrue(changes.template)
+        self.assertEqual(changes.pages, set())
+
+    def test_overflow_means_everything(self):
+        changes = classify_changes({EVERYTHING}, "/c", "/s", "/t.html")
+        self.assertTrue(changes.template and changes.assets)
+
+
+class WatcherTests:
+    def setUp(self):
+        super().setUp()
+        self.root = self.tmp_dir
+        os.makedirs(os.path.join(self.root, "blog"))
+        write_file(os.path.join(self.root, "blog", "a.md"), "one")
+        self.watcher = self.make_watcher([(self.root, True)])
+
+    def tearDown(self):
+        self.watcher.close()
+
+    def test_detects_modification_in_subdirectory(self):
+        path = os.path.join(self.root, "blog", "a.md")
+        write_file(path, "two, longer")
+        changed, first_event = collect_changes(self.watcher, debounce=0.05, timeout=5)
+        self.assertIn(path, changed)
+        self.assertIsNotNone(first_event)
+
+    def test_detects_files_in_new_directory(self):
+        os.makedirs(os.path.join(self.root, "new"))
+        path = os.path.join(self.root, "new", "b.md")
+        write_file(path, "b")
+        changed, _ = collect_changes(self.watcher, debounce=0.2, timeout=5)
+        self.assertIn(path, changed)
+
+    def test_times_out_without_changes(self):
+        self.assertEqual(collect_changes(self.watcher, debounce=0.05, timeout=0.1), (set(), None))
+
+
+class TestPollingWatcher(WatcherTests, TempDirTestCase):
+    def make_watcher(self, roots):
+        return PollingWatcher(roots, interval=0.02)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+class TestInotifyWatcher(WatcherTests, TempDirTestCase):
+    def make_watcher(self, roots):
+        return InotifyWatcher(roots)
+
+
+class TestTargetedRebuild(unittest.TestCase):
+    def test_only_rebuilds_listed_pages_and_keeps_others(self):
+        with tempfile.TemporaryDirectory() as root:
+            content = os.path.join(root, "content")
+            docs = os.path.join(root, "docs")
+            template = os.path.join(root, "template.html")
+            os.makedirs(content)
+            for name in ("a", "b"):
+                write_file(os.path.join(content, f"{name}.md"), f"# {name}")
+            write_file(template, "{{ Content }}")
+
+            manifest = BuildManifest(os.path.join(root, ".build-cache"))
+            generate_pages_recursive(content, template, docs, "/", manifest)
+            write_file(os.path.join(content, "a.md"), "# changed")
+            stats = generate_pages_recursive(content, template, docs, "/", manifest, only={"a.md"})
+
+            self.assertEqual((stats.rebuilt, stats.skipped, stats.removed), (1, 0, 0))
+            self.assertEqual(sorted(manifest.pages), ["a.md", "b.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
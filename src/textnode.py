@@ -1,5 +1,8 @@
 from enum import Enum
 
+from html_events import intern_tag
+from leafnode import LeafNode
+
 class TextType(Enum):
     # Boot.dev uses TextType.TEXT; keep PLAIN for backward compatibility.
     TEXT = "text"
@@ -11,10 +14,26 @@ class TextType(Enum):
     IMAGE = "image"
 
 
+_TEXT_TYPES_BY_VALUE = {text_type.value: text_type for text_type in TextType}
+
+
+def normalize_text_type(text_type):
+    """
+    Turn a TextType value string ("bold") into its TextType member. Members are
+    returned as they are, and unknown strings are kept so that
+    text_node_to_html_node can reject them.
+    """
+    if type(text_type) is TextType:
+        return text_type
+    return _TEXT_TYPES_BY_VALUE.get(text_type, text_type)
+
+
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text: str, text_type: str, url: str = None):
         self.text = text
-        self.text_type = text_type
+        self.text_type = normalize_text_type(text_type)
         self.url = url
 
     def __eq__(self, other):
@@ -24,22 +43,80 @@ class TextNode:
         return f"TextNode({self.text_type}, {self.url})"
 
 
-def text_node_to_html_node(text_node: "TextNode"):
-    from leafnode import LeafNode
+def apply_basepath(url: str, basepath: str, assets=None) -> str:
+    """
+    Prefix a root-relative URL with the site basepath. With an AssetManifest,
+    URLs of static files are first replaced by their fingerprinted names.
+
+    Example:
+        apply_basepath("/blog/", "/site/") -> "/site/blog/"
+    """
+    if assets is not None:
+        url = assets.resolve(url)
+    if basepath == "/" or not url.startswith("/"):
+        return url
+    return basepath + url[1:]
 
-    text_type = text_node.text_type.value if hasattr(text_node.text_type, "value") else text_node.text_type
 
-    if text_type in (TextType.TEXT.value, TextType.PLAIN.value):
+def text_node_to_html_node(
+    text_node: "TextNode", basepath: str = "/", assets=None, images=None
+):
+    """
+    Convert a TextNode to a LeafNode. Root-relative URLs go through
+    apply_basepath; with an ImageIndex, images also get their size and lazy
+    loading attributes.
+    """
+    text_type = text_node.text_type
+
+    if text_type is TextType.TEXT or text_type is TextType.PLAIN:
         return LeafNode(None, text_node.text)
-    if text_type == TextType.BOLD.value:
+    if text_type is TextType.BOLD:
         return LeafNode("b", text_node.text)
-    if text_type == TextType.ITALIC.value:
+    if text_type is TextType.ITALIC:
         return LeafNode("i", text_node.text)
-    if text_type == TextType.CODE.value:
+    if text_type is TextType.CODE:
         return LeafNode("code", text_node.text)
-    if text_type == TextType.LINK.value:
-        return LeafNode("a", text_node.text, {"href": text_node.url})
-    if text_type == TextType.IMAGE.value:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+    if text_type is TextType.LINK:
+        href = apply_basepath(text_node.url, basepath, assets)
+        return LeafNode("a", text_node.text, {"href": href})
+    if text_type is TextType.IMAGE:
+        src = apply_basepath(text_node.url, basepath, assets)
+        props = {"src": src, "alt": text_node.text}
+        if images is not None:
+            props.update(images.props(text_node.url))
+        return LeafNode("img", "", props)
+
+    raise Exception(f"Invalid text type: {text_node.text_type}")
+
+
+_B, _I, _CODE, _A, _IMG = map(intern_tag, ("b", "i", "code", "a", "img"))
+
+
+def text_node_to_events(
+    text_node: "TextNode", events, basepath: str = "/", assets=None, images=None
+) -> None:
+    """
+    Append a TextNode to an html_events.EventBuffer as the events of the
+    LeafNode text_node_to_html_node would return for it.
+    """
+    text_type = text_node.text_type
 
-    raise Exception(f"Invalid text type: {text_node.text_type}")
\ No newline at end of file
+    if text_type is TextType.TEXT or text_type is TextType.PLAIN:
+        events.text(text_node.text)
+    elif text_type is TextType.BOLD:
+        events.leaf(_B, text_node.text)
+    elif text_type is TextType.ITALIC:
+        events.leaf(_I, text_node.text)
+    elif text_type is TextType.CODE:
+        events.leaf(_CODE, text_node.text)
+    elif text_type is TextType.LINK:
+        href = apply_basepath(text_node.url, basepath, assets)
+        events.leaf(_A, text_node.text, {"href": href})
+    elif text_type is TextType.IMAGE:
+        src = apply_basepath(text_node.url, basepath, assets)
+        props = {"src": src, "alt": text_node.text}
+        if images is not None:
+            props.update(images.props(text_node.url))
+        events.leaf(_IMG, "", props)
+    else:
+        raise Exception(f"Invalid text type: {text_node.text_type}")
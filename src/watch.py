@@ -0,0 +1,308 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+DEFAULT_DEBOUNCE = 0.1
+DEFAULT_POLL_INTERVAL = 0.5
+
+# Marker returned by a watcher when it lost track of events (inotify queue
+# overflow); the caller should treat everything as changed.
+EVERYTHING = "*"
+
+# inotify(7) constants.
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """
+    Detect changes by comparing (mtime, size) snapshots of the watched trees.
+
+    roots is a list of (directory, recursive) pairs.
+    """
+
+    def __init__(self, roots: list[tuple[str, bool]], interval: float = DEFAULT_POLL_INTERVAL):
+        self.roots = roots
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for root, recursive in self.roots:
+            if not os.path.isdir(root):
+                continue
+            if recursive:
+                paths = (
+                    os.path.join(dirpath, filename)
+                    for dirpath, _, filenames in os.walk(root)
+                    for filename in filenames
+                )
+            else:
+                paths = (os.path.join(root, filename) for filename in os.listdir(root))
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if not os.path.isdir(path):
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self, timeout: float) -> list[str]:
+        """
+        Wait up to timeout seconds and return the paths that changed.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = [
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            ]
+            self._snapshot = snapshot
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return sorted(changed)
+            time.sleep(min(self.interval, remaining))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify watcher (through ctypes, no third-party modules). Recursive
+    roots get a watch per directory, and directories created later are added
+    as they appear.
+    """
+
+    def __init__(self, roots: list[tuple[str, bool]]):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        self._recursive = {}
+        for root, recursive in roots:
+            self._add_tree(root, recursive)
+
+    def _add_watch(self, directory: str, recursive: bool) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._dirs[wd] = directory
+        self._recursive[wd] = recursive
+
+    def _add_tree(self, root: str, recursive: bool) -> list[str]:
+        """
+        Watch root (and its subdirectories when recursive); returns the files
+        found in newly watched subdirectories.
+        """
+        if not os.path.isdir(root):
+            return []
+        self._add_watch(root, recursive)
+        if not recursive:
+            return []
+        found = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            found.extend(os.path.join(dirpath, filename) for filename in filenames)
+            for dirname in dirnames:
+                self._add_watch(os.path.join(dirpath, dirname), True)
+        return found
+
+    def poll(self, timeout: float) -> list[str]:
+        """
+        Wait up to timeout seconds and return the paths that changed.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                return [EVERYTHING]
+            if mask & _IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and self._recursive[wd]:
+                    changed.update(self._add_tree(path, True))
+                continue
+            changed.add(path)
+        return sorted(changed)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def create_watcher(roots: list[tuple[str, bool]], poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """
+    Use inotify on Linux and fall back to polling everywhere else (or when
+    inotify is unavailable, e.g. out of watches).
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, poll_interval)
+
+
+def collect_changes(watcher, debounce: float = DEFAULT_DEBOUNCE, timeout: float = None):
+    """
+    Block until something changes, then keep collecting until no event has
+    arrived for `debounce` seconds, so a burst of saves becomes one rebuild.
+
+    Returns:
+        (changed paths, monotonic time of the first event), or (set(), None)
+        if nothing changed within timeout seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    changed = set()
+    while not changed:
+        wait = 1.0 if deadline is None else deadline - time.monotonic()
+        if wait <= 0:
+            return set(), None
+        changed.update(watcher.poll(min(wait, 1.0)))
+    first_event = time.monotonic()
+
+    while True:
+        more = watcher.poll(debounce)
+        if not more:
+            return changed, first_event
+        changed.update(more)
+
+
+class ChangeSet:
+    def __init__(self):
+        self.pages = set()
+        self.assets = False
+        self.template = False
+
+    @property
+    def empty(self) -> bool:
+        return not (self.pages or self.assets or self.template)
+
+    def describe(self) -> str:
+        parts = []
+        if self.template:
+            parts.append("template")
+        if self.pages:
+            parts.append(f"{len(self.pages)} page(s)")
+        if self.assets:
+            parts.append("assets")
+        return ", ".join(parts)
+
+    def __repr__(self):
+        return (
+            f"ChangeSet(pages={sorted(self.pages)}, assets={self.assets}, "
+            f"template={self.template})"
+        )
+
+
+def _is_under(path: str, directory: str) -> bool:
+    return os.path.commonpath([path, directory]) == directory
+
+
+def classify_changes(
+    changed: set[str], content_dir: str, static_dir: str, template_path: str
+) -> ChangeSet:
+    """
+    Map changed file paths onto what has to be rebuilt: content pages (as paths
+    relative to content_dir), the static assets, or the template.
+    """
+    changes = ChangeSet()
+    if EVERYTHING in changed:
+        changes.template = True
+        changes.assets = True
+        return changes
+
+    content_dir = os.path.abspath(content_dir)
+    static_dir = os.path.abspath(static_dir)
+    template_path = os.path.abspath(template_path)
+    for path in changed:
+        path = os.path.abspath(path)
+        if path == template_path:
+            changes.template = True
+        elif _is_under(path, content_dir):
+            if path.endswith(".md"):
+                changes.pages.add(os.path.relpath(path, content_dir))
+        elif _is_under(path, static_dir):
+            changes.assets = True
+    return changes
+
+
+def watch(
+    content_dir: str,
+    static_dir: str,
+    template_path: str,
+    rebuild,
+    debounce: float = DEFAULT_DEBOUNCE,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> None:
+    """
+    Watch content_dir, static_dir and template_path forever, calling
+    rebuild(changes) with a ChangeSet after each debounced burst of edits and
+    reporting the time from the first save to the end of the rebuild.
+    """
+    roots = [
+        (content_dir, True),
+        (static_dir, True),
+        (os.path.dirname(os.path.abspath(template_path)), False),
+    ]
+    watcher = create_watcher(roots, poll_interval)
+    print(f"Watching {content_dir}, {static_dir} and {template_path} ({type(watcher).__name__})")
+    try:
+        while True:
+            changed, first_event = collect_changes(watcher, debounce)
+            changes = classify_changes(changed, content_dir, static_dir, template_path)
+            if changes.empty:
+                continue
+            try:
+                rebuild(changes)
+            except Exception as e:
+                print(f"rebuild failed: {e}", file=sys.stderr)
+                continue
+            latency_ms = (time.monotonic() - first_event) * 1000
+            print(f"rebuilt {changes.describe()} in {latency_ms:.0f} ms (save to rendered)")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()